@@ -0,0 +1,134 @@
+"""Pipeline throughput of several event loop threads, with and without the GIL.
+
+Usage:
+    python3.13t -m benchmark.free_threading                 # GIL and no-GIL, 1/2/4 loops
+    python3.13t -m benchmark.free_threading --loops 1,8 --streams 16 --output free_threading.json
+
+Every loop thread feeds `--streams` streams of test/data/42s_i16.pcm through one shared
+ThreeLayerRTSTTClient, as `run --loops` does. WebRTC VAD is real; layers 2 and 3 answer at
+once, so the numbers measure the Python-side orchestration that the GIL serializes. Every
+mode runs in a fresh interpreter started with `-X gil=0` or `-X gil=1`. On a regular build
+only the GIL mode is measured.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import sysconfig
+import threading
+import time
+from dataclasses import replace
+
+from benchmark.microbench import voice_chunks
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import STTClient
+from lite_rtstt.stt.vad_client import VADClient, WebRTCClient
+
+
+class InstantVADClient(VADClient):
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def is_active(self, audio_buffer: AudioBuffer) -> bool:
+        return True
+
+
+class InstantSTTClient(STTClient):
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        return ""
+
+
+async def feed_streams(client: ThreeLayerRTSTTClient, chunks: list[bytes], streams: int) -> None:
+    async def feed_stream() -> None:
+        _, connection_id = client.connect()
+        for chunk in chunks:
+            await client.feed(connection_id, chunk)
+        client.disconnect(connection_id)
+
+    await asyncio.gather(*(feed_stream() for _ in range(streams)))
+
+
+def child(loops: int, streams: int) -> None:
+    # Unbounded event queues, since nobody reads them.
+    config = replace(STTConfig.default(), max_streams=0, event_queue_size=0)
+    chunks = voice_chunks(config)
+    client = ThreeLayerRTSTTClient(config, WebRTCClient(config), InstantVADClient(), InstantSTTClient())
+    client.start()
+    barrier = threading.Barrier(loops + 1)
+
+    def run_loop() -> None:
+        barrier.wait()
+        asyncio.run(feed_streams(client, chunks, streams))
+
+    threads = [threading.Thread(target=run_loop) for _ in range(loops)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    client.close()
+    print(json.dumps({
+        "chunks_per_s": loops * streams * len(chunks) / elapsed,
+        # Extensions that do not support free threading turn the GIL back on at import unless told not to.
+        "gil_enabled": getattr(sys, "_is_gil_enabled", lambda: True)(),
+    }))
+
+
+def measure(gil: bool, loops: int, streams: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-X", f"gil={int(gil)}", "-m", "benchmark.free_threading", "--child", "--loops", str(loops), "--streams", str(streams)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return {"gil": gil, "loops": loops, **json.loads(output)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--loops", type=str, default="1,2,4", help="Comma-separated event loop thread counts")
+    parser.add_argument("--streams", type=int, default=8, help="Streams per event loop thread")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.child:
+        child(int(args.loops), args.streams)
+        return
+
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    if not free_threaded:
+        print("This is not a free-threaded build; only the GIL mode is measured. Run with python3.13t to compare.")
+    results = []
+    for gil in ((True, False) if free_threaded else (True,)):
+        baseline = None
+        for loops in (int(loops) for loops in args.loops.split(",")):
+            result = measure(gil, loops, args.streams)
+            baseline = baseline or result["chunks_per_s"]
+            result["speedup"] = round(result["chunks_per_s"] / baseline, 2)
+            results.append(result)
+            mode = "GIL" if result["gil_enabled"] else "no GIL"
+            print(f"{mode:7} loops={loops:<3} {result['chunks_per_s']:12.0f} chunks/s  x{result['speedup']:.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Memory held by idle connections.
+
+Usage:
+    python -m benchmark.idle_connections
+    python -m benchmark.idle_connections --connections 5000 --idle-s 30 --output idle.json
+
+Opens `--connections` streams on one ThreeLayerRTSTTClient, each with a task waiting on its
+event queue as the /rtstt route does, and feeds all of them `--idle-s` seconds of silence.
+It reports the Python heap per connection, traced with tracemalloc, for three settings: the
+silence kept in full (`pre_roll_ms` 0, as before pre-roll existed), a bounded pre-roll, and
+a pre-roll with hibernation. The WebRTC VAD state of every stream is allocated in C and not
+traced. Then every stream hears one voiced chunk, and the report gives how many streams were
+hibernating, how many of them that chunk made active and how long feeding it took.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import replace
+
+from benchmark.free_threading import InstantSTTClient, InstantVADClient
+from benchmark.microbench import voice_chunks
+from lite_rtstt.metrics import HIBERNATING_STREAMS, STATE_TRANSITIONS
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.vad_client import WebRTCClient
+
+
+async def first_voiced_chunk(config: STTConfig) -> bytes:
+    vad = WebRTCClient(config).create_stream()
+    for chunk in voice_chunks(config):
+        if await vad.is_active(AudioBuffer.from_bytes(chunk)):
+            return chunk
+    raise RuntimeError("The voice recording has no chunk that WebRTC VAD hears.")
+
+
+async def measure(config: STTConfig, connections: int, idle_s: float) -> dict:
+    client = ThreeLayerRTSTTClient(config, WebRTCClient(config), InstantVADClient(), InstantSTTClient())
+    client.start()
+    chunk_bytes = config.sample_rate * config.chunk_size_ms // 1000 * 2
+    voiced = await first_voiced_chunk(config)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    connection_ids, readers = [], []
+    for _ in range(connections):
+        queue, connection_id = client.connect()
+        connection_ids.append(connection_id)
+        readers.append(asyncio.create_task(queue.get()))
+    await asyncio.sleep(0)
+    connected = tracemalloc.get_traced_memory()[0]
+    chunks = int(idle_s * 1000 / config.chunk_size_ms)
+    started = time.perf_counter()
+    for _ in range(chunks):
+        for connection_id in connection_ids:
+            # A fresh object per chunk, as the network delivers it.
+            await client.feed(connection_id, bytes(chunk_bytes))
+    idle_feed_s = time.perf_counter() - started
+    gc.collect()
+    idle = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    hibernating = HIBERNATING_STREAMS.labels().get()
+    activations = sum(STATE_TRANSITIONS.labels(state, "active").get() for state in ("silence", "hibernating"))
+    started = time.perf_counter()
+    for connection_id in connection_ids:
+        await client.feed(connection_id, voiced)
+    wake_feed_s = time.perf_counter() - started
+    woken = sum(STATE_TRANSITIONS.labels(state, "active").get() for state in ("silence", "hibernating")) - activations
+
+    for reader in readers:
+        reader.cancel()
+    for connection_id in connection_ids:
+        client.disconnect(connection_id)
+    client.close()
+    return {
+        "pre_roll_ms": config.pre_roll_ms,
+        "hibernate_after_ms": config.hibernate_after_ms,
+        "connected_bytes_per_connection": round((connected - before) / connections),
+        "idle_bytes_per_connection": round((idle - before) / connections),
+        "idle_feed_us_per_chunk": round(idle_feed_s / (chunks * connections) * 1e6, 1),
+        "hibernating": int(hibernating),
+        "woken": int(woken),
+        "wake_feed_us": round(wake_feed_s / connections * 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=1000, help="Open streams")
+    parser.add_argument("--idle-s", type=float, default=12, help="Seconds of silence fed to every stream")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    default = replace(STTConfig.default(), max_streams=0, admission_queue_wait_ms=0)
+    settings = [
+        replace(default, pre_roll_ms=0, hibernate_after_ms=0),
+        replace(default, hibernate_after_ms=0),
+        replace(default, hibernate_after_ms=min(default.hibernate_after_ms, int(args.idle_s * 1000))),
+    ]
+    results = []
+    for config in settings:
+        result = asyncio.run(measure(config, args.connections, args.idle_s))
+        results.append(result)
+        print(
+            f"pre_roll_ms={result['pre_roll_ms']:<5} hibernate_after_ms={result['hibernate_after_ms']:<6} "
+            f"{result['idle_bytes_per_connection']:>9} B/connection idle "
+            f"({result['connected_bytes_per_connection']} B connected)  "
+            f"{result['idle_feed_us_per_chunk']:6.1f} us/chunk  "
+            f"{result['hibernating']} hibernating, {result['woken']} woken in {result['wake_feed_us']:.1f} us/connection"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
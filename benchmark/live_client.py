@@ -0,0 +1,119 @@
+"""Latency, jitter and CPU use of the live microphone client.
+
+Usage:
+    python -m benchmark.live_client
+    python -m benchmark.live_client --seconds 30 --batch-ms 30,60,120 --output live_client.json
+
+A thread stands in for PortAudio: every `batch_ms` it hands audio of test/data/42s_i16.pcm
+to the event loop, stamped with its capture time, as the PyAudio callback of `lite-rtstt live`
+does. The server runs in a child process with WebRTC VAD and instant layers 2 and 3, so the
+CPU time of this process is the client's own. The report gives the capture-to-server latency
+and jitter that `lite-rtstt live` prints on exit, and CPU milliseconds per second of audio.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import threading
+import time
+
+from benchmark.microbench import voice_chunks
+from lite_rtstt.cli.client import AudioQueue, SendStats, _stream_audio
+from lite_rtstt.stt.config import STTConfig
+
+
+def serve(port: int) -> None:
+    import uvicorn
+    from fastapi import FastAPI
+
+    from benchmark.free_threading import InstantSTTClient, InstantVADClient
+    from lite_rtstt.network.route import create_router
+    from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+    from lite_rtstt.stt.vad_client import WebRTCClient
+
+    config = STTConfig.default()
+    rtstt = ThreeLayerRTSTTClient(config, WebRTCClient(config), InstantVADClient(), InstantSTTClient())
+    rtstt.start()
+    app = FastAPI()
+    app.include_router(create_router(rtstt, config))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port: int, timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+async def measure(uri: str, audio: bytes, seconds: float, batch_ms: int) -> dict:
+    loop = asyncio.get_running_loop()
+    backlog, stats = AudioQueue(10000), SendStats(window=100000)
+    piece_bytes = 32 * batch_ms
+    stop = threading.Event()
+
+    def capture() -> None:
+        started = time.monotonic()
+        for i in range(int(seconds * 1000 / batch_ms)):
+            # Paced by the clock, as a sound card is, so a late wake-up does not add up.
+            if stop.wait(max(0.0, started + (i + 1) * batch_ms / 1000 - time.monotonic())):
+                return
+            offset = i * piece_bytes % (len(audio) - piece_bytes)
+            loop.call_soon_threadsafe(backlog.put, audio[offset:offset + piece_bytes], time.monotonic() - batch_ms / 1000)
+
+    client = asyncio.create_task(_stream_audio(uri, backlog, stats, 10000))
+    cpu_started = time.process_time()
+    capturer = threading.Thread(target=capture)
+    capturer.start()
+    await asyncio.to_thread(capturer.join)
+    # Let the last piece go out before stopping.
+    await asyncio.sleep(0.1)
+    cpu_s = time.process_time() - cpu_started
+    client.cancel()
+    try:
+        await client
+    except asyncio.CancelledError:
+        pass
+    return {"batch_ms": batch_ms, "summary": stats.describe(), "cpu_ms_per_audio_s": round(cpu_s * 1000 / seconds, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20, help="Audio streamed per batch size")
+    parser.add_argument("--batch-ms", type=str, default="30,60,120", help="Comma-separated capture buffer lengths")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    audio = b"".join(voice_chunks(STTConfig.default()))
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    results = []
+    try:
+        wait_for_server(port)
+        for batch_ms in (int(batch_ms) for batch_ms in args.batch_ms.split(",")):
+            result = asyncio.run(measure(f"ws://127.0.0.1:{port}/rtstt", audio, args.seconds, batch_ms))
+            results.append(result)
+            print(f"batch_ms={batch_ms:<4} {result['cpu_ms_per_audio_s']:6.2f} CPU ms per audio s  {result['summary']}")
+    finally:
+        server.terminate()
+        server.join()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Per-layer microbenchmarks with saved baselines.
+
+Usage:
+    python -m benchmark.microbench --save                   # record benchmark/baseline.json
+    python -m benchmark.microbench                          # compare against it, exit 1 on regression
+    python -m benchmark.microbench --filter silero --whisper-models tiny,base
+
+Every case reports the median time per operation over several rounds. The state machine
+case drives AudioStreamStateMachine with the mock clients and no pacing: simulated audio
+time advances by one chunk per feed, so a minute of audio takes milliseconds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import MockVADClient, WebRTCClient
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+VOICE_PATH = "test/data/42s_i16.pcm"
+
+
+@dataclass
+class Result:
+    name: str
+    seconds_per_op: float
+    note: str = ""
+
+
+async def measure(operation: Callable[[], Awaitable[None]], number: int, rounds: int) -> float:
+    """Median seconds per call of `operation` over `rounds` rounds of `number` calls."""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            await operation()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def voice_chunks(config: STTConfig) -> list[bytes]:
+    chunk_bytes = config.sample_rate * config.chunk_size_ms // 1000 * 2
+    with open(VOICE_PATH, "rb") as f:
+        audio = f.read()
+    return [audio[i:i + chunk_bytes] for i in range(0, len(audio) - chunk_bytes + 1, chunk_bytes)]
+
+
+def buffer_of(chunks: list[bytes], count: int) -> AudioBuffer:
+    audio_buffer = AudioBuffer()
+    for i in range(count):
+        audio_buffer.append(chunks[i % len(chunks)])
+    return audio_buffer
+
+
+async def bench_audio_buffer(config: STTConfig, rounds: int, args) -> list[Result]:
+    chunks = voice_chunks(config)
+    results = []
+    for count in (30, 500):
+        audio_buffer = buffer_of(chunks, count)
+
+        async def to_bytes():
+            audio_buffer.to_bytes()
+
+        async def to_float32():
+            audio_buffer.to_float32_ndarray()
+
+        results.append(Result(f"audio_buffer.to_bytes[{count} chunks]", await measure(to_bytes, 200, rounds)))
+        results.append(Result(f"audio_buffer.to_float32_ndarray[{count} chunks]", await measure(to_float32, 200, rounds)))
+    return results
+
+
+async def bench_webrtc(config: STTConfig, rounds: int, args) -> list[Result]:
+    chunks = voice_chunks(config)
+    client = WebRTCClient(config)
+    client.start()
+    buffers = [AudioBuffer.from_bytes(chunk) for chunk in chunks[:200]]
+    index = 0
+
+    async def is_active():
+        nonlocal index
+        await client.is_active(buffers[index % len(buffers)])
+        index += 1
+
+    try:
+        return [Result("webrtc.is_active[30 ms]", await measure(is_active, 2000, rounds))]
+    finally:
+        client.close()
+
+
+async def bench_silero(config: STTConfig, rounds: int, args) -> list[Result]:
+    from lite_rtstt.stt.vad_client import SileroClient
+
+    chunks = voice_chunks(config)
+    results = []
+    for threads in (1, 4):
+        client = SileroClient(STTConfig(**{**config.__dict__, "vad_threads": threads}))
+        client.start()
+        try:
+            for seconds in (0.9, 3, 10):
+                audio_buffer = buffer_of(chunks, int(seconds * 1000 / config.chunk_size_ms))
+                for concurrency in sorted({1, threads}):
+                    async def is_active():
+                        await asyncio.gather(*(client.is_active(audio_buffer) for _ in range(concurrency)))
+
+                    seconds_per_op = await measure(is_active, 5, rounds) / concurrency
+                    results.append(Result(
+                        f"silero.is_active[{seconds}s, threads={threads}, concurrency={concurrency}]",
+                        seconds_per_op,
+                        "per buffer",
+                    ))
+        finally:
+            client.close()
+    return results
+
+
+async def bench_whisper(config: STTConfig, rounds: int, args) -> list[Result]:
+    from lite_rtstt.stt.stt_client import WhisperClient
+
+    if not args.whisper_models:
+        return []
+    audio_buffer = buffer_of(voice_chunks(config), int(7000 / config.chunk_size_ms))
+    results = []
+    for model in args.whisper_models.split(","):
+        client = WhisperClient(STTConfig(**{**config.__dict__, "whisper_model": model}), args.model_dir)
+        client.start()
+        try:
+            async def transcribe():
+                await client.transcribe(audio_buffer)
+
+            results.append(Result(f"whisper.transcribe[{model}, 7s]", await measure(transcribe, 1, rounds)))
+        finally:
+            client.close()
+    return results
+
+
+async def bench_state_machine(config: STTConfig, rounds: int, args) -> list[Result]:
+    chunk_count = 20000
+    # 0.6 s silence, 1.8 s speech, 1.35 s trailing silence per cycle.
+    pattern = [False] * 20 + [True] * 60 + [False] * 45
+    silence = b"\x00" * (config.sample_rate * config.chunk_size_ms // 1000 * 2)
+    samples = []
+    for _ in range(rounds):
+        first_vad, second_vad, stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        for client in (first_vad, second_vad, stt):
+            client.start()
+        await first_vad.append_results(*(pattern[i % len(pattern)] for i in range(chunk_count)))
+        await second_vad.append_results(*[True] * chunk_count)
+        await stt.append_results(*["text"] * chunk_count)
+        state_machine = ThreeLayerRTSTTClient.AudioStreamStateMachine(
+            first_vad, second_vad, stt,
+            config.duration_time_ms // config.chunk_size_ms,
+            config.active_to_detection_ms // config.chunk_size_ms,
+            config.max_buffered_chunks,
+        )
+        tasks = []
+        start = time.perf_counter()
+        for _ in range(chunk_count):
+            _, _, task = await state_machine.feed(silence)
+            if task is not None:
+                tasks.append(task)
+        await asyncio.gather(*tasks)
+        samples.append((time.perf_counter() - start) / chunk_count)
+    seconds_per_op = statistics.median(samples)
+    simulated_speed = config.chunk_size_ms / 1000 / seconds_per_op
+    return [Result("state_machine.feed[30 ms]", seconds_per_op, f"{simulated_speed:.0f}x real time")]
+
+
+CASES = {
+    "audio_buffer": bench_audio_buffer,
+    "webrtc": bench_webrtc,
+    "silero": bench_silero,
+    "whisper": bench_whisper,
+    "state_machine": bench_state_machine,
+}
+
+
+def compare(results: list[Result], baseline: dict[str, float], threshold: float) -> list[str]:
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous and result.seconds_per_op > previous * (1 + threshold):
+            regressions.append(f"{result.name}: {previous * 1e6:.1f} us -> {result.seconds_per_op * 1e6:.1f} us")
+    return regressions
+
+
+async def run(args) -> list[Result]:
+    config = STTConfig.default()
+    results = []
+    for name, case in CASES.items():
+        if args.filter and args.filter not in name:
+            continue
+        results.extend(await case(config, args.rounds, args))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-layer microbenchmarks")
+    parser.add_argument("--filter", type=str, help="Only run cases whose name contains this")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per case; the median is reported")
+    parser.add_argument("--whisper-models", type=str, help="Comma separated Whisper sizes, e.g. tiny,base")
+    parser.add_argument("--model-dir", type=str, default="./whisper", help="Whisper download root")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--save", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before a case fails")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for result in results:
+        print(f"{result.name:<60} {result.seconds_per_op * 1e6:>12.1f} us  {result.note}")
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline.update({result.name: result.seconds_per_op for result in results})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with. Run with --save first.")
+        return
+    with open(args.baseline, "r") as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Opus decode cost per stream, for sizing ingest nodes.
+
+Usage:
+    python -m benchmark.opus_decode --file test/data/42s_i16.pcm --bitrate 24000
+"""
+import argparse
+import json
+import time
+
+from lite_rtstt.stt.audio_format import AudioConverter, AudioEncoding, AudioFormat
+from lite_rtstt.stt.config import STTConfig
+
+
+def encode(pcm: bytes, sample_rate: int, frame_ms: int, bitrate: int) -> list[bytes]:
+    import opuslib
+
+    encoder = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_VOIP)
+    encoder.bitrate = bitrate
+    frame_samples = sample_rate * frame_ms // 1000
+    frame_bytes = frame_samples * 2
+    return [
+        encoder.encode(pcm[i:i + frame_bytes], frame_samples)
+        for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Opus decode CPU cost per stream")
+    parser.add_argument("--file", type=str, default="test/data/42s_i16.pcm", help="16 kHz mono int16 PCM")
+    parser.add_argument("--frame-ms", type=int, default=20, help="Opus frame duration")
+    parser.add_argument("--bitrate", type=int, default=24000, help="Encoder bitrate in bit/s")
+    parser.add_argument("--rounds", type=int, default=5, help="How many times the file is decoded")
+    args = parser.parse_args()
+
+    config = STTConfig.default()
+    with open(args.file, "rb") as f:
+        pcm = f.read()
+    packets = encode(pcm, config.sample_rate, args.frame_ms, args.bitrate)
+    audio_seconds = len(packets) * args.frame_ms / 1000 * args.rounds
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(args.rounds):
+        converter = AudioConverter(AudioFormat(AudioEncoding.OPUS, config.sample_rate, 1), config)
+        for packet in packets:
+            converter.convert(packet)
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.perf_counter() - wall_start
+
+    compressed_bytes = sum(len(packet) for packet in packets) * args.rounds
+    print(json.dumps({
+        "audio_seconds": audio_seconds,
+        "bitrate_kbps": compressed_bytes * 8 / audio_seconds / 1000,
+        "cpu_seconds": cpu_seconds,
+        "cpu_ms_per_stream_second": cpu_seconds / audio_seconds * 1000,
+        "streams_per_core": audio_seconds / cpu_seconds,
+        "real_time_factor": wall_seconds / audio_seconds,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Startup time and memory of every CLI command.
+
+Usage:
+    python -m benchmark.startup                    # all commands
+    python -m benchmark.startup --filter live,transcribe --rounds 10
+
+Every round starts a fresh interpreter that imports the CLI and the module of one command,
+which is what the command costs before it does any work. The report has the median wall
+time of the whole process, the import time and the peak RSS. Client commands must not load
+the server or model stack; the run exits 1 if one does.
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+CLIENT_COMMANDS = ("live", "transcribe")
+HEAVY_MODULES = ("torch", "whisper", "silero_vad", "fastapi", "uvicorn")
+
+
+def child(command: str) -> None:
+    started = time.perf_counter()
+    from lite_rtstt.main import load_command
+
+    load_command(command)
+    print(json.dumps({
+        "import_ms": (time.perf_counter() - started) * 1000,
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def measure(command: str, rounds: int) -> dict:
+    walls, imports, rss = [], [], []
+    heavy_modules = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmark.startup", "--child", command],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        walls.append((time.perf_counter() - started) * 1000)
+        result = json.loads(output)
+        imports.append(result["import_ms"])
+        rss.append(result["peak_rss_mb"])
+        heavy_modules = result["heavy_modules"]
+    return {
+        "command": command,
+        "wall_ms": round(statistics.median(walls), 1),
+        "import_ms": round(statistics.median(imports), 1),
+        "peak_rss_mb": round(statistics.median(rss), 1),
+        "heavy_modules": heavy_modules,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--filter", type=str, help="Comma-separated commands to measure")
+    parser.add_argument("--rounds", type=int, default=5, help="Processes started per command")
+    parser.add_argument("--output", type=str, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    from lite_rtstt.main import COMMANDS
+
+    commands = args.filter.split(",") if args.filter else list(COMMANDS)
+    results = []
+    for command in commands:
+        result = measure(command, args.rounds)
+        results.append(result)
+        heavy = ", ".join(result["heavy_modules"]) or "-"
+        print(f"{command:12} {result['wall_ms']:8.1f} ms  import {result['import_ms']:8.1f} ms  {result['peak_rss_mb']:7.1f} MB  heavy: {heavy}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    offenders = [result["command"] for result in results if result["command"] in CLIENT_COMMANDS and result["heavy_modules"]]
+    if offenders:
+        print(f"Client commands load the server stack: {', '.join(offenders)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
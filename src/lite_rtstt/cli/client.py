@@ -0,0 +1,357 @@
+"""Client commands. They only need websockets, plus PyAudio for the microphone."""
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import statistics
+import time
+from collections import deque
+
+import websockets
+
+SAMPLE_RATE = 16000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+MIN_RECONNECT_S = 0.5
+MAX_RECONNECT_S = 8.0
+FIRST_CREDIT_TIMEOUT_S = 5.0
+PACED_PIECE_MS = 30
+PACED_TAIL_MS = 3000
+
+
+class AudioQueue:
+
+    def __init__(self, max_ms: int) -> None:
+        """Timestamped audio pieces in capture order, bounded by their duration.
+
+        When full, the oldest audio is dropped. Only the event loop may touch it; PyAudio's
+        callback thread hands pieces over with `loop.call_soon_threadsafe(queue.put, ...)`.
+        """
+        self.__pieces: deque[tuple[bytes, float]] = deque()
+        self.__bytes = 0
+        self.__max_bytes = max_ms * BYTES_PER_MS
+        self.__waiter: asyncio.Future | None = None
+        self.dropped_ms = 0.0
+
+    def put(self, audio: bytes, captured: float) -> None:
+        self.__pieces.append((audio, captured))
+        self.__bytes += len(audio)
+        self.__trim()
+        if self.__waiter is not None and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+    def put_front(self, pieces: list[tuple[bytes, float]]) -> None:
+        """Queue older pieces ahead of the queued ones."""
+        self.__pieces.extendleft(reversed(pieces))
+        self.__bytes += sum(len(audio) for audio, _ in pieces)
+        self.__trim()
+
+    def pop_all(self) -> list[tuple[bytes, float]]:
+        pieces = list(self.__pieces)
+        self.clear()
+        return pieces
+
+    def clear(self) -> None:
+        self.__pieces.clear()
+        self.__bytes = 0
+
+    def get_ms(self) -> float:
+        return self.__bytes / BYTES_PER_MS
+
+    async def take(self) -> list[tuple[bytes, float]]:
+        """Wait for audio and take all of it."""
+        while not self.__pieces:
+            self.__waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.__waiter
+            finally:
+                self.__waiter = None
+        return self.pop_all()
+
+    def __trim(self) -> None:
+        while self.__bytes > self.__max_bytes and len(self.__pieces) > 1:
+            audio, _ = self.__pieces.popleft()
+            self.__bytes -= len(audio)
+            self.dropped_ms += len(audio) / BYTES_PER_MS
+
+
+class SendStats:
+
+    def __init__(self, window: int = 1000) -> None:
+        """Capture-to-send latency of live audio, with a bounded memory for long sessions.
+
+        Args:
+            window: Recent latencies kept for the percentiles.
+        """
+        self.__latencies_ms: deque[float] = deque(maxlen=window)
+        self.__last_ms: float | None = None
+        self.__jitter_ms = 0.0
+        self.__max_ms = 0.0
+        self.network_ms = 0.0
+        self.replayed_ms = 0.0
+        self.reconnects = 0
+
+    def record(self, latency_ms: float) -> None:
+        self.__latencies_ms.append(latency_ms)
+        self.__max_ms = max(self.__max_ms, latency_ms)
+        if self.__last_ms is not None:
+            # The RFC 3550 interarrival jitter estimator.
+            self.__jitter_ms += (abs(latency_ms - self.__last_ms) - self.__jitter_ms) / 16
+        self.__last_ms = latency_ms
+
+    def describe(self) -> str:
+        if not self.__latencies_ms:
+            return "No audio was sent."
+        latencies = sorted(self.__latencies_ms)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        return (
+            f"Capture to server: median {statistics.median(latencies) + self.network_ms:.1f} ms, "
+            f"p95 {p95 + self.network_ms:.1f} ms, max {self.__max_ms + self.network_ms:.1f} ms, "
+            f"jitter {self.__jitter_ms:.1f} ms (network {self.network_ms:.1f} ms one way). "
+            f"{self.reconnects} reconnects, {self.replayed_ms / 1000:.1f} s replayed."
+        )
+
+
+def _capture_time(time_info: dict) -> float:
+    """`time.monotonic()` of the first sample of a PyAudio callback buffer."""
+    now = time.monotonic()
+    # PortAudio's clock is not the monotonic clock, but the delay it reports is usable where it is known.
+    delay = time_info.get("current_time", 0.0) - time_info.get("input_buffer_adc_time", 0.0)
+    return now - delay if 0.0 < delay < 1.0 else now
+
+
+async def _print_live_events(websocket, retained: AudioQueue) -> None:
+    try:
+        async for message in websocket:
+            data = json.loads(message)
+            if data["type"] == "text":
+                print(f"\rUser: {data['text']}")
+                print("> ", end="", flush=True)
+            elif data["type"] == "start speaking":
+                print(f"\r[Listening...]", end="", flush=True)
+            elif data["type"] == "stop speaking":
+                # The utterance is with the server; a reconnect no longer needs its audio.
+                retained.clear()
+                print(f"\r[Thinking...]", end="", flush=True)
+            elif data["type"] == "overload":
+                print(f"\r[Server overloaded: {data['reason']}]")
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def _send_audio(websocket, backlog: AudioQueue, retained: AudioQueue, stats: SendStats, connected: float) -> None:
+    """Send whatever was captured while the previous message was sent as one binary message."""
+    try:
+        while True:
+            pieces = await backlog.take()
+            # Retained before the send, so audio of a send that fails is replayed.
+            for audio, captured in pieces:
+                retained.put(audio, captured)
+            await websocket.send(b"".join(audio for audio, _ in pieces))
+            sent = time.monotonic()
+            for audio, captured in pieces:
+                if captured >= connected:
+                    stats.record((sent - captured) * 1000)
+            stats.network_ms = websocket.latency * 1000 / 2
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+async def _stream_audio(uri: str, backlog: AudioQueue, stats: SendStats, replay_ms: int, min_reconnect_s: float = MIN_RECONNECT_S) -> None:
+    """Stream `backlog` to the server until cancelled, reconnecting whenever the connection is lost.
+
+    Audio sent since the server last reported the end of an utterance is kept, up to
+    `replay_ms`, and sent again after a reconnect along with the audio captured meanwhile,
+    so an utterance cut by a disconnect is still transcribed.
+    """
+    retained = AudioQueue(replay_ms)
+    delay = min_reconnect_s
+    while True:
+        try:
+            # Audio does not compress; deflate would only cost CPU.
+            async with websockets.connect(uri, compression=None) as websocket:
+                connected = time.monotonic()
+                delay = min_reconnect_s
+                if retained.get_ms():
+                    stats.replayed_ms += retained.get_ms()
+                    backlog.put_front(retained.pop_all())
+                # Measure the network latency now instead of at the first keepalive ping.
+                await websocket.ping()
+                receiver = asyncio.create_task(_print_live_events(websocket, retained))
+                sender = asyncio.create_task(_send_audio(websocket, backlog, retained, stats, connected))
+                try:
+                    await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    sender.cancel()
+                    if not receiver.done():
+                        # Stopping: let the server finish the utterance in progress.
+                        with contextlib.suppress(websockets.exceptions.ConnectionClosed):
+                            await websocket.send(json.dumps({"type": "EOF"}))
+                        await receiver
+            reason = websocket.close_reason or ""
+            if websocket.close_code == 1013 and reason.startswith("retry-after="):
+                delay = max(delay, float(reason.removeprefix("retry-after=")))
+            print(f"\nServer disconnected; reconnecting in {delay:.1f} s.")
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            print(f"\nCannot reach the server ({e}); retrying in {delay:.1f} s.")
+        await asyncio.sleep(delay)
+        stats.reconnects += 1
+        delay = min(delay * 2, MAX_RECONNECT_S)
+
+
+async def _stream_microphone(uri: str, batch_ms: int = 30, replay_ms: int = 10000):
+    import pyaudio
+
+    loop = asyncio.get_running_loop()
+    backlog = AudioQueue(replay_ms)
+    stats = SendStats()
+
+    def on_audio(in_data: bytes, frame_count: int, time_info: dict, status: int):
+        # PortAudio's thread only stamps the buffer and hands it to the event loop.
+        loop.call_soon_threadsafe(backlog.put, in_data, _capture_time(time_info))
+        return None, pyaudio.paContinue
+
+    p = pyaudio.PyAudio()
+    stream = p.open(format=pyaudio.paInt16,
+                    channels=1,
+                    rate=SAMPLE_RATE,
+                    input=True,
+                    frames_per_buffer=SAMPLE_RATE * batch_ms // 1000,
+                    stream_callback=on_audio)
+    try:
+        await _stream_audio(uri, backlog, stats, replay_ms)
+    finally:
+        stream.stop_stream()
+        stream.close()
+        p.terminate()
+        if backlog.dropped_ms:
+            print(f"\n{backlog.dropped_ms / 1000:.1f} s of audio were dropped while the server was unreachable.")
+        print(f"\n{stats.describe()}")
+
+def run_live(args):
+    target_url = args.url or "ws://localhost:8766/rtstt"
+    try:
+        asyncio.run(_stream_microphone(target_url, args.batch_ms, args.replay_ms))
+    except KeyboardInterrupt:
+        pass
+
+class Credit:
+
+    def __init__(self) -> None:
+        """Milliseconds of audio the server allows in flight, as granted by its `credit` messages."""
+        self.__available_ms = 0.0
+        self.__waiter: asyncio.Future | None = None
+
+    def grant(self, ms: float) -> None:
+        self.__available_ms += ms
+        if self.__waiter is not None and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+    async def take(self, max_ms: float) -> float:
+        """Wait for credit and take up to `max_ms` of it."""
+        while self.__available_ms <= 0:
+            self.__waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.__waiter
+            finally:
+                self.__waiter = None
+        taken = min(self.__available_ms, max_ms)
+        self.__available_ms -= taken
+        return taken
+
+
+def _with_credits(uri: str) -> str:
+    return uri + ("&" if "?" in uri else "?") + "credits=1"
+
+
+async def _transcribe_file(uri: str, file_path: str, max_message_ms: int = 1000, first_credit_timeout_s: float = FIRST_CREDIT_TIMEOUT_S):
+    """Stream a file as fast as the server takes it and print its transcripts.
+
+    The server grants credit as it consumes audio, so at most its credit window is in flight,
+    and it reports the end of processing once the last transcript of the file was sent.
+    A server that grants no credit within `first_credit_timeout_s` predates flow control, or a
+    proxy dropped the query; the file is then sent in real time as JSON `audio chunk` messages,
+    which every server accepts, followed by silence that ends the last utterance, and the client
+    waits for the server to close.
+    """
+    if not os.path.exists(file_path):
+        print(f"Error: File not found: {file_path}")
+        return
+
+    credit = Credit()
+    paced = False
+
+    async def receive_loop(ws) -> bool:
+        try:
+            async for message in ws:
+                data = json.loads(message)
+                msg_type = data.get("type")
+                if msg_type == "text":
+                    print(f"\rUser: {data['text']}")
+                elif msg_type == "credit":
+                    credit.grant(data["ms"])
+                elif msg_type == "overload":
+                    print(f"\r[Server overloaded: {data['reason']}]")
+                elif msg_type == "end":
+                    return True
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        return False
+
+    async def send_paced(ws, audio_data: bytes) -> None:
+        piece_bytes = PACED_PIECE_MS * BYTES_PER_MS
+        audio_data += bytes(PACED_TAIL_MS * BYTES_PER_MS)
+        started = time.monotonic()
+        for i, offset in enumerate(range(0, len(audio_data), piece_bytes)):
+            await asyncio.sleep(max(0.0, started + i * PACED_PIECE_MS / 1000 - time.monotonic()))
+            data = base64.b64encode(audio_data[offset:offset + piece_bytes]).decode("utf-8")
+            await ws.send(json.dumps({"type": "audio chunk", "data": data}))
+
+    async def send_loop(ws, audio_data: bytes) -> None:
+        nonlocal paced
+        offset = 0
+        try:
+            try:
+                first_ms = await asyncio.wait_for(credit.take(max_message_ms), first_credit_timeout_s)
+            except TimeoutError:
+                paced = True
+                print(f"The server granted no credit in {first_credit_timeout_s:.0f} s; it may predate flow control. Sending in real time instead.")
+                await send_paced(ws, audio_data)
+            else:
+                size = int(first_ms * BYTES_PER_MS)
+                while True:
+                    await ws.send(audio_data[offset:offset + size])
+                    offset += size
+                    if offset >= len(audio_data):
+                        break
+                    # The server grants whole chunks, so a piece is whole samples too.
+                    size = int(await credit.take(max_message_ms) * BYTES_PER_MS)
+            await ws.send(json.dumps({"type": "EOF"}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    with open(file_path, "rb") as f:
+        audio_data = f.read()
+    started = time.monotonic()
+    async with websockets.connect(_with_credits(uri), compression=None) as websocket:
+        recv_task = asyncio.create_task(receive_loop(websocket))
+        send_task = asyncio.create_task(send_loop(websocket, audio_data))
+        try:
+            ended = await recv_task
+        finally:
+            send_task.cancel()
+    elapsed_s = time.monotonic() - started
+    audio_s = len(audio_data) / BYTES_PER_MS / 1000
+    if not ended and not paced:
+        print("The server closed the connection before the end of the file was processed.")
+    print(f"{audio_s:.1f} s of audio in {elapsed_s:.1f} s ({audio_s / max(elapsed_s, 1e-9):.1f}x real time).")
+
+def run_transcribe(args):
+    target_url = args.url or "ws://localhost:8766/rtstt"
+    if not args.file:
+        print("Error: Please provide a file path using --file")
+        return
+    try:
+        asyncio.run(_transcribe_file(target_url, args.file))
+    except KeyboardInterrupt:
+        pass
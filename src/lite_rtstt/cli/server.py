@@ -0,0 +1,97 @@
+"""Server commands, which load the models and the web stack."""
+import asyncio
+import json
+import logging
+import os
+from dataclasses import replace
+
+import uvicorn
+from fastapi import FastAPI
+
+from lite_rtstt.cpu_plan import pin_event_loop, plan_cpus
+from lite_rtstt.network import loops, prefork
+from lite_rtstt.network.route import create_router
+from lite_rtstt.network.worker import WorkerServer
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.remote import RemoteInferencePool, RemoteSTTClient, RemoteVADClient, parse_addresses
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient, start_clients
+from lite_rtstt.stt.stt_client import WhisperClient
+from lite_rtstt.stt.vad_client import WebRTCClient, SileroClient
+
+
+def load_service_config(base_dir: str) -> STTConfig:
+    file_name = "stt_config.json"
+    path = os.path.join(base_dir, file_name)
+    default_config = STTConfig.default()
+    if not os.path.exists(path):
+        return default_config
+    with open(path, "r") as f:
+        content = json.load(f)
+        config = replace(default_config, **content)
+        return config
+
+def create_clients(config: STTConfig, data_dir: str) -> tuple[WebRTCClient, SileroClient, WhisperClient]:
+    logging.info(plan_cpus(config).describe())
+    rtc = WebRTCClient(config)
+    silero = SileroClient(config)
+    download_root = os.path.join(data_dir, "whisper")
+    whisper = WhisperClient(config, download_root)
+    return rtc, silero, whisper
+
+def run_server(args):
+    if args.debug:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+
+    # Load environmental variables
+    DATA_DIR = os.environ.get("SNAP_DATA", "./")
+    config = load_service_config(DATA_DIR)
+    admin_token = os.environ.get("LITE_RTSTT_ADMIN_TOKEN")
+
+    if args.workers > 1 and args.remote_workers:
+        raise SystemExit("--workers and --remote-workers cannot be combined.")
+    if args.loops > 1 and (args.workers > 1 or args.remote_workers):
+        # Their channels and worker connections belong to the one loop that opened them.
+        raise SystemExit("--loops cannot be combined with --workers or --remote-workers.")
+    if args.workers > 1:
+        router_options = {"capture_dir": args.capture_dir, "latency_log": args.latency_log, "admin_token": admin_token}
+        prefork.serve(config, DATA_DIR, args.workers, "0.0.0.0", 8766, router_options, logging.getLogger().level)
+        return
+
+    if args.remote_workers:
+        pool = RemoteInferencePool(parse_addresses(args.remote_workers), config.remote_connections_per_worker, config.remote_health_interval_ms / 1000)
+        rtstt = ThreeLayerRTSTTClient(config, WebRTCClient(config), RemoteVADClient(pool), RemoteSTTClient(pool))
+    else:
+        rtstt = ThreeLayerRTSTTClient(config, *create_clients(config, DATA_DIR))
+    rtstt.start()
+    # The model workers have pinned themselves by now; only the loop and its helpers move.
+    pin_event_loop(plan_cpus(config))
+
+    if args.latency_log:
+        logging.getLogger("lite_rtstt.latency").setLevel(logging.INFO)
+    router = create_router(rtstt, config, args.capture_dir, args.latency_log, admin_token)
+    app = FastAPI()
+    app.include_router(router)
+    if args.loops > 1:
+        loops.serve(app, "0.0.0.0", 8766, args.loops)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8766)
+
+def run_worker(args):
+    if args.debug:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+
+    DATA_DIR = os.environ.get("SNAP_DATA", "./")
+    config = load_service_config(DATA_DIR)
+    _, silero, whisper = create_clients(config, DATA_DIR)
+    start_clients(silero, whisper)
+    try:
+        asyncio.run(WorkerServer(silero, whisper, config).serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        silero.close()
+        whisper.close()
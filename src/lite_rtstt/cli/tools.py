@@ -0,0 +1,155 @@
+"""Offline and load-testing commands."""
+import asyncio
+import json
+import logging
+import os
+from dataclasses import replace
+
+from lite_rtstt.cli.server import create_clients, load_service_config
+from lite_rtstt.network.trace import TRACE_EXTENSION, read_trace
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.tools.batch import BatchTranscriber, collect_inputs, load_completed
+from lite_rtstt.tools.bench import (
+    InProcessSession,
+    LoadGenerator,
+    WebSocketSession,
+    get_metrics_url,
+    load_corpus,
+    read_local_process,
+    scrape_process,
+)
+from lite_rtstt.tools.replay import ConvertingSession, Replayer
+from lite_rtstt.tools.evaluate import Evaluator, OBJECTIVES, format_table, load_labelled_corpus, parse_grid
+
+
+def run_batch(args):
+    if args.debug:
+        logging.basicConfig(level=logging.INFO)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+
+    DATA_DIR = os.environ.get("SNAP_DATA", "./")
+    # Offline work may queue for as long as it takes, so nothing is shed.
+    config = replace(load_service_config(DATA_DIR), shed_queue_wait_ms=0)
+    paths = collect_inputs(args.inputs, args.list)
+    completed = load_completed(args.output) if args.resume else set()
+    paths = [path for path in paths if path not in completed]
+    if not paths:
+        print("Nothing to transcribe.")
+        return
+
+    rtstt = ThreeLayerRTSTTClient(config, *create_clients(config, DATA_DIR))
+    rtstt.start()
+    jobs = args.jobs or 2 * config.whisper_threads
+    try:
+        with open(args.output, "a" if args.resume else "w") as output:
+            transcriber = BatchTranscriber(rtstt, config, output, jobs, 2 * config.whisper_threads)
+            asyncio.run(transcriber.run(paths))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rtstt.close()
+
+def run_bench(args):
+    logging.basicConfig(level=logging.WARNING)
+    DATA_DIR = os.environ.get("SNAP_DATA", "./")
+    config = load_service_config(DATA_DIR)
+    corpus = load_corpus(args.corpus, config)
+
+    rtstt = None
+    queue_depths = {}
+    server_process = read_local_process
+    if args.url:
+        async def open_session():
+            return await WebSocketSession.open(args.url)
+
+        metrics_url = get_metrics_url(args.url)
+
+        async def server_process():
+            return await scrape_process(metrics_url)
+
+        try:
+            asyncio.run(server_process())
+        except (OSError, KeyError, ValueError) as e:
+            logging.warning(f"Cannot read the server's CPU and memory from {metrics_url} ({e!r}); only the benchmark process is reported.")
+            server_process = None
+    else:
+        rtc, silero, whisper = create_clients(config, DATA_DIR)
+        rtstt = ThreeLayerRTSTTClient(config, rtc, silero, whisper)
+        rtstt.start()
+        queue_depths = {"silero": silero.get_queue_depth, "whisper": whisper.get_queue_depth}
+
+        async def open_session():
+            return InProcessSession(rtstt)
+
+    generator = LoadGenerator(open_session, corpus, config, args.clients, args.stagger_ms, args.tail_ms, args.speed, queue_depths, server_process)
+    try:
+        report = asyncio.run(generator.run())
+    finally:
+        if rtstt is not None:
+            rtstt.close()
+    report["target"] = args.url or "in-process"
+    report["corpus"] = [recording.name for recording in corpus]
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+def run_replay(args):
+    logging.basicConfig(level=logging.WARNING)
+    DATA_DIR = os.environ.get("SNAP_DATA", "./")
+    config = load_service_config(DATA_DIR)
+    paths = []
+    for path in args.traces:
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(TRACE_EXTENSION))
+        else:
+            paths.append(path)
+    traces = [read_trace(path) for path in paths]
+    if not traces:
+        print("No traces to replay.")
+        return
+
+    rtstt = None
+    if args.url:
+        async def open_session(trace):
+            return await WebSocketSession.open(f"{args.url}?{trace.query}" if trace.query else args.url)
+    else:
+        rtstt = ThreeLayerRTSTTClient(config, *create_clients(config, DATA_DIR))
+        rtstt.start()
+
+        async def open_session(trace):
+            return ConvertingSession.open(rtstt, trace.query, config)
+
+    replayer = Replayer(open_session, traces, args.speed, args.simultaneous)
+    try:
+        report = asyncio.run(replayer.run())
+    finally:
+        if rtstt is not None:
+            rtstt.close()
+    report["target"] = args.url or "in-process"
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+def run_evaluate(args):
+    logging.basicConfig(level=logging.WARNING)
+    DATA_DIR = os.environ.get("SNAP_DATA", "./")
+    config = replace(load_service_config(DATA_DIR), shed_queue_wait_ms=0)
+    corpus = load_labelled_corpus(args.corpus)
+    configs = parse_grid(args.grid, config)
+    swept = [axis.partition("=")[0].strip() for axis in args.grid]
+
+    evaluator = Evaluator(corpus, lambda candidate: create_clients(candidate, DATA_DIR))
+    report = asyncio.run(evaluator.run(configs, swept))
+    columns = swept + list(OBJECTIVES) + ["layer1_calls", "layer2_calls", "layer3_calls"]
+    if "endpointing" in swept or config.endpointing != "fixed":
+        columns += ["early_endpoints", "split_rate", "saved_ms_per_utterance"]
+    columns += ["pareto"]
+    print(format_table(report["results"], columns))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,152 @@
+"""Split the CPUs of this process between the event loop, Silero and Whisper.
+
+Left alone, torch gives every thread that runs a model an intra-op pool as large as the
+machine, so `vad_threads` Silero workers and the Whisper workers oversubscribe the CPU many
+times over. The plan gives each layer a core budget and each worker a torch thread count
+that fits it, and can pin workers to their cores or NUMA nodes.
+"""
+import glob
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum
+
+from lite_rtstt.stt.config import STTConfig
+
+
+class CPUPinning(Enum):
+    OFF = "off"
+    # Every worker runs on its own cores only.
+    CORES = "cores"
+    # Every worker runs on the NUMA nodes of its cores, so the kernel still balances within a node.
+    NUMA = "numa"
+
+
+@dataclass(frozen=True)
+class WorkerPlan:
+    torch_threads: int
+    cpus: frozenset[int] | None
+
+
+@dataclass(frozen=True)
+class CPUPlan:
+    pinning: CPUPinning
+    event_loop_cpus: tuple[int, ...]
+    silero: tuple[WorkerPlan, ...]
+    whisper: tuple[WorkerPlan, ...]
+
+    def describe(self) -> str:
+        def workers(plans: tuple[WorkerPlan, ...]) -> str:
+            return ", ".join(
+                f"{plan.torch_threads} threads on {_format_cpus(plan.cpus) if plan.cpus is not None else 'any cpu'}" for plan in plans
+            )
+
+        return (
+            f"CPU plan: event loop on {_format_cpus(self.event_loop_cpus)}; "
+            f"silero workers: {workers(self.silero)}; whisper workers: {workers(self.whisper)}."
+        )
+
+
+def get_available_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def get_numa_nodes() -> dict[int, frozenset[int]]:
+    """CPUs of every NUMA node. Empty where the kernel does not report nodes."""
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(os.path.basename(os.path.dirname(path))[len("node"):])
+        with open(path, "r") as f:
+            nodes[node] = _parse_cpus(f.read())
+    return nodes
+
+
+def plan_cpus(config: STTConfig, cpus: list[int] | None = None, numa_nodes: dict[int, frozenset[int]] | None = None) -> CPUPlan:
+    """Plan the CPUs of this process. The plan only depends on its arguments, so every client computes the same one.
+
+    Args:
+        config: STT config.
+        cpus: CPUs to plan, the affinity of this process by default.
+        numa_nodes: CPUs of every NUMA node, read from sysfs by default.
+    """
+    pinning = CPUPinning(config.cpu_pinning)
+    cpus = cpus if cpus is not None else get_available_cpus()
+    if config.cpu_cores:
+        cpus = cpus[:config.cpu_cores]
+    # The event loop keeps its cores only if the models are left at least one.
+    reserved = config.event_loop_cores if len(cpus) > config.event_loop_cores else 0
+    event_loop_cpus, model_cpus = tuple(cpus[:reserved] or cpus), cpus[reserved:]
+
+    # A Silero inference is a few milliseconds on one core, so Silero workers get one thread
+    # each and share a quarter of the model cores. Whisper gets the rest.
+    silero_count = min(config.vad_threads, max(1, len(model_cpus) // 4)) if len(model_cpus) > 1 else 0
+    silero_cpus, whisper_cpus = model_cpus[:silero_count] or model_cpus, model_cpus[silero_count:]
+    whisper_share = max(1, len(whisper_cpus) // config.whisper_threads)
+
+    if pinning == CPUPinning.NUMA:
+        numa_nodes = numa_nodes if numa_nodes is not None else get_numa_nodes()
+        if not numa_nodes:
+            logging.warning("cpu_pinning is numa, but the kernel reports no NUMA nodes; workers are not pinned.")
+            pinning = CPUPinning.OFF
+
+    def pin(worker_cpus: list[int]) -> frozenset[int] | None:
+        if pinning == CPUPinning.OFF:
+            return None
+        if pinning == CPUPinning.CORES:
+            return frozenset(worker_cpus)
+        return frozenset().union(*(node for node in numa_nodes.values() if node & set(worker_cpus)))
+
+    silero = tuple(WorkerPlan(1, pin([silero_cpus[i % len(silero_cpus)]])) for i in range(config.vad_threads))
+    whisper = []
+    for i in range(config.whisper_threads):
+        # Workers beyond the cores share them round robin.
+        start = i * whisper_share % len(whisper_cpus) if whisper_cpus else 0
+        worker_cpus = whisper_cpus[start:start + whisper_share] or model_cpus
+        whisper.append(WorkerPlan(len(worker_cpus), pin(worker_cpus)))
+    return CPUPlan(pinning, event_loop_cpus, silero, tuple(whisper))
+
+
+def apply_worker_plan(plan: WorkerPlan) -> None:
+    """Apply `plan` to the calling thread, before it runs a model."""
+    import torch
+
+    # The first parallel op of a thread resets its thread count to the one most recently set by
+    # any thread, so the count is only this thread's own once torch has initialised it here.
+    torch.get_num_threads()
+    torch.set_num_threads(plan.torch_threads)
+    if plan.cpus is not None:
+        if hasattr(os, "sched_setaffinity"):
+            # On Linux, pid 0 is the calling thread.
+            os.sched_setaffinity(0, plan.cpus)
+        else:
+            logging.warning("This platform cannot pin threads to CPUs; cpu_pinning is ignored.")
+
+
+def get_torch_threads() -> int:
+    """Intra-op thread count torch uses on the calling thread."""
+    import torch
+
+    return torch.get_num_threads()
+
+
+def pin_event_loop(plan: CPUPlan) -> None:
+    """Pin the calling thread, which runs the event loop, to its cores. Threads it starts later inherit them."""
+    if plan.pinning != CPUPinning.OFF and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, plan.event_loop_cpus)
+
+
+def _parse_cpus(cpulist: str) -> frozenset[int]:
+    """Parse a kernel CPU list such as `0-3,8-11`."""
+    cpus = set()
+    for part in cpulist.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return frozenset(cpus)
+
+
+def _format_cpus(cpus) -> str:
+    return "cpu " + ",".join(str(cpu) for cpu in sorted(cpus))
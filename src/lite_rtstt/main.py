@@ -1,155 +1,29 @@
+"""Command line entry point.
+
+Only argparse is imported up front. Each command's module is imported when the command runs,
+so client commands never pay for torch, Whisper or the web server.
+"""
 import argparse
-import asyncio
-import base64
-import json
-import os
-import logging
+import importlib
 import sys
-from dataclasses import replace
-
-import pyaudio
-import uvicorn
-import websockets
-from fastapi import FastAPI
-
-from lite_rtstt.network.route import create_router
-from lite_rtstt.stt.config import STTConfig
-from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
-from lite_rtstt.stt.stt_client import WhisperClient
-from lite_rtstt.stt.vad_client import WebRTCClient, SileroClient
-
-
-def load_service_config(base_dir: str) -> STTConfig:
-    file_name = "stt_config.json"
-    path = os.path.join(base_dir, file_name)
-    default_config = STTConfig.default()
-    if not os.path.exists(path):
-        return default_config
-    with open(path, "r") as f:
-        content = json.load(f)
-        config = replace(default_config, **content)
-        return config
-
-def run_server(args):
-    if args.debug:
-        logging.basicConfig(level=logging.INFO)
-    else:
-        logging.basicConfig(level=logging.WARNING)
-
-    # Load environmental variables
-    DATA_DIR = os.environ.get("SNAP_DATA", "./")
-    config = load_service_config(DATA_DIR)
-
-    rtc = WebRTCClient(config)
-    silero = SileroClient(config)
-    download_root = os.path.join(DATA_DIR, "whisper")
-    whisper = WhisperClient(config, download_root)
-    rtstt = ThreeLayerRTSTTClient(config, rtc, silero, whisper)
-    rtstt.start()
-
-    router = create_router(rtstt)
-    app = FastAPI()
-    app.include_router(router)
-    uvicorn.run(app, host="0.0.0.0", port=8766)
-
-async def _stream_microphone(uri: str):
-    FORMAT = pyaudio.paInt16
-    CHANNELS = 1
-    RATE = 16000
-    CHUNK = 480  # 30ms @ 16kHz
-
-    p = pyaudio.PyAudio()
-    stream = p.open(format=FORMAT,
-                    channels=CHANNELS,
-                    rate=RATE,
-                    input=True,
-                    frames_per_buffer=CHUNK)
-
-    async with websockets.connect(uri) as websocket:
-        async def receive():
-            try:
-                async for message in websocket:
-                    data = json.loads(message)
-                    if data["type"] == "text":
-                        print(f"\rUser: {data['text']}")
-                        print("> ", end="", flush=True)
-                    elif data["type"] == "start speaking":
-                        print(f"\r[Listening...]", end="", flush=True)
-                    elif data["type"] == "stop speaking":
-                        print(f"\r[Thinking...]", end="", flush=True)
-            except websockets.exceptions.ConnectionClosed:
-                print("\nServer disconnected.")
-
-        recv_task = asyncio.create_task(receive())
-
-        try:
-            while True:
-                data = stream.read(CHUNK, exception_on_overflow=False)
-                b64 = base64.b64encode(data).decode("utf-8")
-                message = {"type": "audio chunk", "data": b64}
-                await websocket.send(json.dumps(message))
-                await asyncio.sleep(0)
-        except KeyboardInterrupt:
-            print("\nStopping...")
-        finally:
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
-            await websocket.send(json.dumps({"type": "EOF"}))
-            await recv_task
-
-def run_live(args):
-    target_url = args.url or "ws://localhost:8766/rtstt"
-    try:
-        asyncio.run(_stream_microphone(target_url))
-    except KeyboardInterrupt:
-        pass
-
-async def _transcribe_file(uri: str, file_path: str):
-    if not os.path.exists(file_path):
-        print(f"Error: File not found: {file_path}")
-        return
-
-    async def receive_loop(ws):
-        try:
-            async for message in ws:
-                data = json.loads(message)
-                msg_type = data.get("type")
-                if msg_type == "text":
-                    print(f"\rUser: {data['text']}")
-        except websockets.exceptions.ConnectionClosed:
-            pass
-
-    chunk_size = 960  # 30ms @ 16kHz (16000 * 0.03 * 2 bytes)
-
-    async with websockets.connect(uri) as websocket:
-        recv_task = asyncio.create_task(receive_loop(websocket))
-        with open(file_path, "rb") as f:
-            audio_data = f.read()
-        for i in range(0, len(audio_data), chunk_size):
-            chunk = audio_data[i: i + chunk_size]
-            b64 = base64.b64encode(chunk).decode("utf-8")
-            message = {"type": "audio chunk", "data": b64}
-            await websocket.send(json.dumps(message))
-
-        silence = b'\x00' * chunk_size
-        b64 = base64.b64encode(silence).decode("utf-8")
-        message = {"type": "audio chunk", "data": b64}
-        for _ in range(100):
-            await websocket.send(json.dumps(message))
-
-        await websocket.send(json.dumps({"type": "EOF"}))
-        await recv_task
-
-def run_transcribe(args):
-    target_url = args.url or "ws://localhost:8766/rtstt"
-    if not args.file:
-        print("Error: Please provide a file path using --file")
-        return
-    try:
-        asyncio.run(_transcribe_file(target_url, args.file))
-    except KeyboardInterrupt:
-        pass
+from typing import Callable
+
+COMMANDS = {
+    "run": "lite_rtstt.cli.server:run_server",
+    "worker": "lite_rtstt.cli.server:run_worker",
+    "live": "lite_rtstt.cli.client:run_live",
+    "transcribe": "lite_rtstt.cli.client:run_transcribe",
+    "batch": "lite_rtstt.cli.tools:run_batch",
+    "bench": "lite_rtstt.cli.tools:run_bench",
+    "replay": "lite_rtstt.cli.tools:run_replay",
+    "evaluate": "lite_rtstt.cli.tools:run_evaluate",
+}
+
+
+def load_command(command: str) -> Callable:
+    """Import the module of a command and return its function."""
+    module, _, function = COMMANDS[command].partition(":")
+    return getattr(importlib.import_module(module), function)
 
 def main():
     parser = argparse.ArgumentParser(description="Lite Real-time Speech to Text")
@@ -162,24 +36,61 @@ def main():
 
     server_parser = subparsers.add_parser("run", help="Start the RTSTT server")
     server_parser.add_argument("--debug", action="store_true", help="Enable debug mode")
-    server_parser.set_defaults(func=run_server)
+    server_parser.add_argument("--capture-dir", type=str, help="Record every /rtstt connection to a trace in this directory")
+    server_parser.add_argument("--latency-log", action="store_true", help="Log the per-stage latency of every utterance as JSON")
+    server_parser.add_argument("--workers", type=int, default=1, help="Front-end processes that share one inference process")
+    server_parser.add_argument("--loops", type=int, default=1, help="Event loop threads sharing the models; run in parallel on free-threaded Python")
+    server_parser.add_argument("--remote-workers", type=str, help="Run Silero and Whisper on inference workers, e.g. host1:8767,host2:8767")
+
+    worker_parser = subparsers.add_parser("worker", help="Serve Silero and Whisper to remote servers")
+    worker_parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+    worker_parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on. The protocol has no authentication; only listen on a trusted network")
+    worker_parser.add_argument("--port", type=int, default=8767, help="Port to listen on")
 
     live_parser = subparsers.add_parser("live", help="Transcribe from microphone")
     live_parser.add_argument("--url", type=str, help="Server to connect to")
-    live_parser.set_defaults(func=run_live)
+    live_parser.add_argument("--batch-ms", type=int, default=30, help="Audio per capture callback and message; larger uses less CPU")
+    live_parser.add_argument("--replay-ms", type=int, default=10000, help="Audio kept to send again after a reconnect")
 
     transcribe_parser = subparsers.add_parser("transcribe", help="Transcribe from a file")
     transcribe_parser.add_argument("--url", type=str, help="Server to connect to")
     transcribe_parser.add_argument("--file", type=str, help="File to transcribe")
-    transcribe_parser.set_defaults(func=run_transcribe)
+
+    batch_parser = subparsers.add_parser("batch", help="Transcribe recordings in-process, without a server")
+    batch_parser.add_argument("inputs", nargs="*", help="Recordings or directories of .pcm/.wav files")
+    batch_parser.add_argument("--list", type=str, help="File with one recording path per line")
+    batch_parser.add_argument("--output", type=str, required=True, help="JSONL output file")
+    batch_parser.add_argument("--resume", action="store_true", help="Skip files finished by an earlier run")
+    batch_parser.add_argument("--jobs", type=int, help="Files segmented at the same time")
+    batch_parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+
+    bench_parser = subparsers.add_parser("bench", help="Replay concurrent streams and report latency")
+    bench_parser.add_argument("--clients", type=int, default=8, help="Concurrent simulated speakers")
+    bench_parser.add_argument("--stagger-ms", type=int, default=500, help="Delay between client starts")
+    bench_parser.add_argument("--corpus", nargs="+", default=["test/data"], help="16 kHz int16 .pcm files or directories")
+    bench_parser.add_argument("--url", type=str, help="Benchmark a running server instead of an in-process client")
+    bench_parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, 1.0 is real time")
+    bench_parser.add_argument("--tail-ms", type=int, default=2000, help="Silence appended to each recording")
+    bench_parser.add_argument("--output", type=str, help="Write the JSON report to this file")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay captured /rtstt traces with their original timing")
+    replay_parser.add_argument("traces", nargs="+", help="Trace files or directories")
+    replay_parser.add_argument("--url", type=str, help="Replay against a running server instead of an in-process client")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, 1.0 keeps the captured timing")
+    replay_parser.add_argument("--simultaneous", action="store_true", help="Start all traces at once")
+    replay_parser.add_argument("--output", type=str, help="Write the JSON report to this file")
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="Compare WER and speed over a grid of configs")
+    evaluate_parser.add_argument("--corpus", nargs="+", default=["test/data"], help="Recordings with .txt references, or directories")
+    evaluate_parser.add_argument("--grid", action="append", default=[], help="Swept config field, e.g. whisper_model=tiny,base")
+    evaluate_parser.add_argument("--output", type=str, help="Write the JSON report to this file")
 
     if len(sys.argv) == 1:
         parser.print_help(sys.stderr)
         sys.exit(1)
 
     args = parser.parse_args()
-    if hasattr(args, "func"):
-        args.func(args)
+    load_command(args.command)(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,357 @@
+"""Process-wide metrics in the Prometheus text format.
+
+The metric types are deliberately small: an update is a lock acquisition and an addition
+(plus a bisect for histograms), so they can stay on in the state machine and in the Silero
+and Whisper worker threads. Gauges that mirror a value owned elsewhere, like a queue depth,
+read it only when /metrics is scraped.
+"""
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from lite_rtstt.process_stats import get_cpu_seconds, get_rss_bytes
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.__children: dict[tuple[str, ...], object] = {}
+        self.__lock = threading.Lock()
+        if not label_names:
+            self.__children[()] = self._create_child()
+
+    @abstractmethod
+    def _create_child(self):
+        """A new child holding the value of one combination of label values."""
+        pass
+
+    def labels(self, *values: str):
+        """Return the child for these label values. Hot paths should keep the child."""
+        child = self.__children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}.")
+            with self.__lock:
+                child = self.__children.setdefault(values, self._create_child())
+        return child
+
+    def children(self) -> list[tuple[tuple[str, ...], object]]:
+        with self.__lock:
+            return list(self.__children.items())
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in self.children():
+            lines.extend(child.render(self.name, self.label_names, values))
+        return lines
+
+
+class _CounterChild:
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__value = 0
+
+    def inc(self, amount: int | float = 1) -> None:
+        with self.__lock:
+            self.__value += amount
+
+    def get(self) -> int | float:
+        return self.__value
+
+    def render(self, name: str, label_names: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        return [f"{name}{_format_labels(label_names, values)} {_format_value(self.__value)}"]
+
+
+class _GaugeChild:
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__value = 0
+        self.__function: Callable[[], float] | None = None
+
+    def inc(self, amount: int | float = 1) -> None:
+        with self.__lock:
+            self.__value += amount
+
+    def dec(self, amount: int | float = 1) -> None:
+        with self.__lock:
+            self.__value -= amount
+
+    def set(self, value: int | float) -> None:
+        self.__value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from `function` at scrape time instead."""
+        self.__function = function
+
+    def get(self) -> int | float:
+        return self.__function() if self.__function is not None else self.__value
+
+    def render(self, name: str, label_names: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        return [f"{name}{_format_labels(label_names, values)} {_format_value(self.get())}"]
+
+
+class _HistogramChild:
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.__lock = threading.Lock()
+        self.__buckets = buckets
+        self.__counts = [0] * (len(buckets) + 1)
+        self.__sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.__buckets, value)
+        with self.__lock:
+            self.__counts[index] += 1
+            self.__sum += value
+
+    def get_count(self) -> int:
+        return sum(self.__counts)
+
+    def render(self, name: str, label_names: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        with self.__lock:
+            counts = list(self.__counts)
+            total = self.__sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.__buckets + (float("inf"),), counts):
+            cumulative += count
+            bound_label = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{name}_bucket{_format_labels(label_names, values, bound_label)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(label_names, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(label_names, values)} {cumulative}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _create_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: int | float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _create_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: int | float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: int | float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        self.__buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names)
+
+    def _create_child(self) -> _HistogramChild:
+        return _HistogramChild(self.__buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+
+    def __init__(self) -> None:
+        self.__metrics: list[_Metric] = []
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self.__register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        return self.__register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.__register(Histogram(name, documentation, label_names, buckets))
+
+    def __register(self, metric):
+        self.__metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.__metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+ACTIVE_CONNECTIONS = REGISTRY.gauge("rtstt_active_connections", "Open /rtstt WebSocket connections.")
+HIBERNATING_STREAMS = REGISTRY.gauge(
+    "rtstt_hibernating_streams",
+    "Open streams that were silent for hibernate_after_ms and hold no audio until layer 1 hears voice again.",
+)
+STATE_TRANSITIONS = REGISTRY.counter(
+    "rtstt_state_transitions_total",
+    "Audio stream state machine transitions.",
+    ("from_state", "to_state"),
+)
+ENDPOINTS = REGISTRY.counter(
+    "rtstt_endpoints_total",
+    "Utterances ended, by what ended them: the silence timeout, an early adaptive cut or the buffer limit.",
+    ("reason",),
+)
+ENDPOINT_SAVED = REGISTRY.counter(
+    "rtstt_endpoint_saved_seconds_total",
+    "Silence the fixed timeout would still have waited for at early adaptive cuts.",
+)
+ENDPOINT_SPLITS = REGISTRY.counter(
+    "rtstt_endpoint_splits_total",
+    "Early adaptive cuts after which speech resumed before the fixed timeout would have ended the utterance.",
+)
+TUNED_STREAMS_BY_AGGRESSIVENESS = REGISTRY.gauge(
+    "rtstt_tuned_streams_by_aggressiveness",
+    "Open streams with self-tuning gates, by their current WebRTC VAD aggressiveness.",
+    ("aggressiveness",),
+)
+TUNED_STREAMS_BY_DETECTION_WINDOW = REGISTRY.gauge(
+    "rtstt_tuned_streams_by_detection_window",
+    "Open streams with self-tuning gates, by the milliseconds of layer 1 activity they buffer before asking Silero.",
+    ("window_ms",),
+)
+GATE_ADJUSTMENTS = REGISTRY.counter(
+    "rtstt_gate_adjustments_total",
+    "Per-stream gate changes, stricter after many layer 2 rejections and looser after few.",
+    ("direction",),
+)
+VAD_CHECKS = REGISTRY.counter(
+    "rtstt_vad_checks_total",
+    "Layer 1 checks of silent streams and layer 2 checks of active streams, by whether they passed the audio on.",
+    ("layer", "result"),
+)
+LAYER_PASS_RATIO = REGISTRY.gauge(
+    "rtstt_layer_pass_ratio",
+    "Share of checks that passed the audio on: layer 1 to 2 and layer 2 to 3.",
+    ("transition",),
+)
+INFERENCE_QUEUE_DEPTH = REGISTRY.gauge("rtstt_inference_queue_depth", "Work waiting for a model worker.", ("model",))
+INFERENCE_QUEUE_WAIT = REGISTRY.histogram(
+    "rtstt_inference_queue_wait_seconds",
+    "Time work waited in the queue before a model worker took it.",
+    ("model",),
+)
+INFERENCE_TIME = REGISTRY.histogram("rtstt_inference_seconds", "Model inference time per batch of work items.", ("model",))
+INFERENCE_BATCH_SIZE = REGISTRY.histogram(
+    "rtstt_inference_batch_size",
+    "Work items run by one model call.",
+    ("model",),
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+INFERENCE_CANCELLED = REGISTRY.counter(
+    "rtstt_inference_cancelled_total",
+    "Work dropped because the coroutine waiting for it was cancelled.",
+    ("model",),
+)
+REJECTED_CONNECTIONS = REGISTRY.counter(
+    "rtstt_rejected_connections_total",
+    "Connections refused by admission control.",
+    ("reason",),
+)
+SHED_WORK = REGISTRY.counter("rtstt_shed_work_total", "Work dropped because it waited too long in a model queue.", ("model",))
+DROPPED_EVENTS = REGISTRY.counter(
+    "rtstt_dropped_events_total",
+    "Events dropped for clients that read too slowly, by slow consumer policy.",
+    ("policy",),
+)
+SLOW_CONSUMER_DISCONNECTS = REGISTRY.counter(
+    "rtstt_slow_consumer_disconnects_total",
+    "Connections closed because the client read too slowly.",
+    ("reason",),
+)
+SPEECH_END_TO_TEXT = REGISTRY.histogram(
+    "rtstt_speech_end_to_text_seconds",
+    "Time from the last voiced chunk of an utterance to its text event, including the silence timeout.",
+)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "rtstt_event_loop_lag_seconds",
+    "How late the event loop wakes up a sleeping task.",
+    buckets=LAG_BUCKETS,
+)
+# Read at scrape time, so a load generator in another process can tell what the server used.
+PROCESS_CPU_SECONDS = REGISTRY.gauge("rtstt_process_cpu_seconds", "User plus system CPU time of this process.")
+PROCESS_CPU_SECONDS.set_function(get_cpu_seconds)
+PROCESS_RSS_BYTES = REGISTRY.gauge("rtstt_process_resident_memory_bytes", "Resident set size of this process.")
+PROCESS_RSS_BYTES.set_function(get_rss_bytes)
+
+
+def _pass_ratio(layer: str) -> Callable[[], float]:
+    passed, rejected = VAD_CHECKS.labels(layer, "pass"), VAD_CHECKS.labels(layer, "reject")
+
+    def ratio() -> float:
+        total = passed.get() + rejected.get()
+        return passed.get() / total if total else 0.0
+
+    return ratio
+
+
+LAYER_PASS_RATIO.labels("1_to_2").set_function(_pass_ratio("1"))
+LAYER_PASS_RATIO.labels("2_to_3").set_function(_pass_ratio("2"))
+
+
+class EventLoopLagMonitor:
+
+    def __init__(self, interval_s: float = 0.1) -> None:
+        """Measure how late a periodic timer fires on every event loop it is started on."""
+        self.__interval_s = interval_s
+        self.__lock = threading.Lock()
+        self.__tasks: dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+
+    def start(self) -> None:
+        """Start on the running loop. Does nothing when it is already running there."""
+        loop = asyncio.get_running_loop()
+        with self.__lock:
+            task = self.__tasks.get(loop)
+            if task is not None and not task.done():
+                return
+            # Loops of other threads are left alone; a loop that is gone takes its task with it.
+            self.__tasks = {other: other_task for other, other_task in self.__tasks.items() if not other.is_closed()}
+            self.__tasks[loop] = loop.create_task(self.__run())
+
+    def stop(self) -> None:
+        """Stop on the running loop."""
+        with self.__lock:
+            task = self.__tasks.pop(asyncio.get_running_loop(), None)
+        if task is not None:
+            task.cancel()
+
+    async def __run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.__interval_s
+            await asyncio.sleep(self.__interval_s)
+            EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - expected))
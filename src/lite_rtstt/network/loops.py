@@ -0,0 +1,44 @@
+"""Serve one app from several event loop threads of one process.
+
+Every thread runs its own uvicorn server on its own SO_REUSEPORT socket, so the kernel spreads
+connections across the loops, while the app, the RTSTT client and its model pools are shared.
+On a free-threaded Python (3.13t) the loops run in parallel; with the GIL they only take turns.
+"""
+import logging
+import sys
+import threading
+
+import uvicorn
+from fastapi import FastAPI
+
+from lite_rtstt.network.prefork import bind_reuseport
+
+
+def is_gil_enabled() -> bool:
+    # sys._is_gil_enabled only exists since 3.13.
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def serve(app: FastAPI, host: str, port: int, loops: int) -> None:
+    """Serve `app` from `loops` event loop threads until the main thread's server stops.
+
+    The main thread runs the first loop, so Ctrl-C and SIGTERM stop the server as usual.
+    """
+    if loops > 1 and is_gil_enabled():
+        logging.warning(f"The GIL is enabled, so the {loops} event loops take turns instead of running in parallel.")
+    # Bound here, so a port in use fails the command instead of a thread.
+    sockets = [bind_reuseport(host, port) for _ in range(loops)]
+    servers = [uvicorn.Server(uvicorn.Config(app)) for _ in range(loops)]
+    threads = [
+        threading.Thread(target=server.run, kwargs={"sockets": [sock]}, name=f"event-loop-{i}")
+        for i, (server, sock) in enumerate(zip(servers[1:], sockets[1:]), start=1)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        servers[0].run(sockets=[sockets[0]])
+    finally:
+        for server in servers[1:]:
+            server.should_exit = True
+        for thread in threads:
+            thread.join()
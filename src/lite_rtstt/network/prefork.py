@@ -0,0 +1,160 @@
+"""Serve /rtstt from several front-end processes that share one inference process.
+
+Every front-end process runs its own event loop, WebSocket handling, WebRTC VAD and state
+machines, and listens on the same port with SO_REUSEPORT, so the kernel spreads connections
+across them. Silero and Whisper run once, in the inference process, which reads the audio of
+each front-end from that front-end's shared-memory ring.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+from lite_rtstt.stt.config import STTConfig
+
+_STOP_TIMEOUT_S = 5.0
+
+
+def _interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def bind_reuseport(host: str, port: int) -> socket.socket:
+    """A listening socket that other sockets of this or other processes may bind to the same port."""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("Front-end workers need SO_REUSEPORT, which this platform lacks.")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def run_inference(config: STTConfig, data_dir: str, channels: list[tuple[Connection, str]], log_level: int) -> None:
+    """Entry point of the inference process."""
+    from lite_rtstt.cpu_plan import plan_cpus
+    from lite_rtstt.stt.rtstt_client import start_clients
+    from lite_rtstt.stt.shared_memory import InferenceServer
+    from lite_rtstt.stt.stt_client import WhisperClient
+    from lite_rtstt.stt.vad_client import SileroClient
+
+    logging.basicConfig(level=log_level)
+    # The parent handles Ctrl-C and closes the pipes, which ends serve().
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    memories = [SharedMemory(name, track=False) for _, name in channels]
+    logging.info(plan_cpus(config).describe())
+    silero = SileroClient(config)
+    whisper = WhisperClient(config, os.path.join(data_dir, "whisper"))
+    start_clients(silero, whisper)
+    server = InferenceServer(silero, whisper, [(connection, memory) for (connection, _), memory in zip(channels, memories)])
+    try:
+        asyncio.run(server.serve())
+    finally:
+        silero.close()
+        whisper.close()
+        for memory in memories:
+            memory.close()
+
+
+def run_frontend(
+    config: STTConfig,
+    host: str,
+    port: int,
+    connection: Connection,
+    memory_name: str,
+    router_options: dict,
+    log_level: int,
+) -> None:
+    """Entry point of a front-end process."""
+    import uvicorn
+    from fastapi import FastAPI
+
+    from lite_rtstt.network.route import create_router
+    from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+    from lite_rtstt.stt.shared_memory import InferenceChannel, SharedMemorySTTClient, SharedMemoryVADClient
+    from lite_rtstt.stt.vad_client import WebRTCClient
+
+    logging.basicConfig(level=log_level)
+    if router_options.get("latency_log"):
+        logging.getLogger("lite_rtstt.latency").setLevel(logging.INFO)
+    memory = SharedMemory(memory_name, track=False)
+    channel = InferenceChannel(connection, memory)
+    rtstt = ThreeLayerRTSTTClient(config, WebRTCClient(config), SharedMemoryVADClient(channel), SharedMemorySTTClient(channel))
+    rtstt.start()
+    app = FastAPI()
+    app.include_router(create_router(rtstt, config, **router_options))
+    try:
+        uvicorn.Server(uvicorn.Config(app, log_level=log_level)).run(sockets=[bind_reuseport(host, port)])
+    finally:
+        rtstt.close()
+        memory.close()
+
+
+def serve(
+    config: STTConfig,
+    data_dir: str,
+    workers: int,
+    host: str,
+    port: int,
+    router_options: dict,
+    log_level: int = logging.WARNING,
+) -> None:
+    """Start one inference process and `workers` front-end processes and wait for them.
+
+    Args:
+        config: STT config of every process. Per-stream limits such as max_streams apply per front-end.
+        data_dir: Directory of the Whisper model cache.
+        workers: Number of front-end processes.
+        host: Address to listen on.
+        port: Port every front-end listens on.
+        router_options: Keyword arguments of create_router.
+        log_level: Logging level of the child processes.
+    """
+    signal.signal(signal.SIGTERM, _interrupt)
+    context = multiprocessing.get_context("spawn")
+    ring_bytes = config.shared_ring_mb * 1024 * 1024
+    memories = [SharedMemory(create=True, size=ring_bytes) for _ in range(workers)]
+    pipes = [context.Pipe() for _ in range(workers)]
+    processes = []
+    try:
+        inference = context.Process(
+            target=run_inference,
+            args=(config, data_dir, [(inference_end, memory.name) for (_, inference_end), memory in zip(pipes, memories)], log_level),
+            name="inference",
+        )
+        inference.start()
+        processes.append(inference)
+        for i, ((frontend_end, inference_end), memory) in enumerate(zip(pipes, memories)):
+            # Only the children keep their ends open, so either side sees EOF when the other exits.
+            inference_end.close()
+            frontend = context.Process(
+                target=run_frontend,
+                args=(config, host, port, frontend_end, memory.name, router_options, log_level),
+                name=f"frontend-{i}",
+            )
+            frontend.start()
+            frontend_end.close()
+            processes.append(frontend)
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the front-ends too. Those that a SIGTERM of this process did not reach
+        # are stopped here; the inference process stops once every front-end pipe is closed.
+        for process in processes[1:]:
+            process.join(_STOP_TIMEOUT_S)
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(_STOP_TIMEOUT_S)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for memory in memories:
+            memory.close()
+            memory.unlink()
@@ -1,23 +1,123 @@
 """Speech to text route."""
 import base64
+import contextlib
+from dataclasses import asdict
 from datetime import datetime
 import asyncio
+import hmac
+import json
 import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+from starlette.websockets import WebSocketState
 
-from lite_rtstt.stt.event import StartSpeakingEvent, StopSpeakingEvent, TextEvent
+from lite_rtstt.metrics import ACTIVE_CONNECTIONS, REGISTRY, SLOW_CONSUMER_DISCONNECTS, EventLoopLagMonitor
+from lite_rtstt.profiling import profile
+from lite_rtstt.network.trace import FrameKind, TraceWriter
+from lite_rtstt.stt.audio_format import AudioConverter, AudioFormat, parse_wav_header
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import OverloadEvent, StartSpeakingEvent, StopSpeakingEvent, TextEvent
 from lite_rtstt.stt.rtstt_client import RTSTTClient
 
+_MAX_WAV_HEADER_BYTES = 1 << 20
+_LATENCY_LOGGER = logging.getLogger("lite_rtstt.latency")
+_MAX_PROFILE_SECONDS = 60.0
+_UPLOAD_QUEUE_PIECES = 16
 
-def create_router(rtstt_client: RTSTTClient) -> APIRouter:
+
+class _UploadStreamingResponse(StreamingResponse):
+    """A streaming response to a request whose body is still read by `reader`.
+
+    Its disconnect listener only starts receiving once the body was read, so it cannot take body messages.
+    """
+
+    def __init__(self, reader: asyncio.Task, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.__reader = reader
+
+    async def __call__(self, scope, receive, send) -> None:
+        async def receive_after_body():
+            await asyncio.wait([self.__reader])
+            return await receive()
+
+        await super().__call__(scope, receive_after_body, send)
+
+
+def create_router(
+    rtstt_client: RTSTTClient,
+    config: STTConfig = STTConfig.default(),
+    capture_dir: str | None = None,
+    latency_log: bool = False,
+    admin_token: str | None = None,
+) -> APIRouter:
+    """Create the STT routes.
+
+    Args:
+        rtstt_client: Client that serves every connection.
+        config: STT config.
+        capture_dir: When set, every /rtstt connection is recorded to a trace in this directory.
+        latency_log: Log the per-stage latency of every utterance as JSON to the `lite_rtstt.latency` logger.
+        admin_token: Enables the admin routes, which require `Authorization: Bearer <admin_token>`.
+    """
     router = APIRouter()
+    if capture_dir is not None:
+        os.makedirs(capture_dir, exist_ok=True)
+    # Compressed streams are decoded here so codec work never blocks the event loop.
+    decode_executor = ThreadPoolExecutor(max_workers=config.decode_threads, thread_name_prefix="audio-decode")
+    loop_lag_monitor = EventLoopLagMonitor()
+    send_timeout_s = config.event_send_timeout_ms / 1000 if config.event_send_timeout_ms else None
+    # The window must outlast what the server holds back: a partial chunk and the credit not yet granted.
+    credit_window_ms = max(config.credit_window_ms, 4 * config.chunk_size_ms)
+    credit_grant_ms = credit_window_ms // 4
 
     @router.websocket("/rtstt")
     async def real_time_speech_to_text(websocket: WebSocket) -> None:
+        # The input format is declared in the handshake, e.g. /rtstt?encoding=mulaw&sample_rate=8000
+        try:
+            audio_format = AudioFormat.from_query(websocket.query_params, config)
+            converter = AudioConverter(audio_format, config)
+        except (ValueError, RuntimeError) as e:
+            await websocket.close(code=1003, reason=str(e))
+            return
+        # /rtstt?timings=1 adds the latency breakdown of each utterance to its text message.
+        send_timings = websocket.query_params.get("timings", "0").lower() in ("1", "true")
+        # /rtstt?credits=1 opts into flow control: the client sends no more audio than it was granted.
+        use_credits = websocket.query_params.get("credits", "0").lower() in ("1", "true")
         await websocket.accept()
+        loop_lag_monitor.start()
+        try:
+            queue, connection_id = rtstt_client.connect()
+        except OverloadedError as e:
+            # 1013 is "try again later"; the reason tells the client how long to back off.
+            logging.warning(f"Rejected WebSocket connection from host {websocket.client.host}: {e}")
+            await websocket.close(code=1013, reason=f"retry-after={math.ceil(e.retry_after_s)}")
+            return
+        ACTIVE_CONNECTIONS.inc()
         logging.info(f"WebSocket connection established at {datetime.now()} from host {websocket.client.host}.")
-        queue, connection_id = rtstt_client.connect()
+        capture: TraceWriter | None = None
+
+        send_lock = asyncio.Lock()
+
+        async def send(message: dict) -> None:
+            # Credits are sent by the receive loop and events by their own task; a send cut by its timeout must not interleave.
+            async with send_lock:
+                # A client that stopped reading must not hold this task and its events forever.
+                await asyncio.wait_for(websocket.send_json(message), send_timeout_s)
+
+        async def drop_slow_consumer(reason: str) -> None:
+            SLOW_CONSUMER_DISCONNECTS.labels(reason).inc()
+            logging.warning(f"Closing WebSocket connection {connection_id}: the client reads too slowly ({reason}).")
+            if websocket.application_state != WebSocketState.DISCONNECTED:
+                await websocket.close(code=1008, reason="slow consumer")
 
         async def handle_event():
             try:
@@ -26,35 +126,212 @@ def create_router(rtstt_client: RTSTTClient) -> APIRouter:
                     if event is None:
                         break
                     if isinstance(event, StartSpeakingEvent):
-                        await websocket.send_json({"type": "start speaking"})
+                        await send({"type": "start speaking"})
                     elif isinstance(event, StopSpeakingEvent):
-                        await websocket.send_json({"type": "stop speaking"})
+                        await send({"type": "stop speaking"})
+                    elif isinstance(event, OverloadEvent):
+                        await send({"type": "overload", "reason": event.reason})
                     elif isinstance(event, TextEvent):
-                        await websocket.send_json({"type": "text", "text": event.text})
+                        message = {"type": "text", "text": event.text}
+                        if send_timings and event.timeline is not None:
+                            message["timings"] = {"offsets_ms": event.timeline.offsets_ms(), "stages_ms": event.timeline.stages_ms()}
+                        await send(message)
+                        if latency_log and event.timeline is not None:
+                            event.timeline.event_sent = time.monotonic()
+                            _LATENCY_LOGGER.info(json.dumps({
+                                "connection_id": connection_id,
+                                "text_length": len(event.text),
+                                "offsets_ms": event.timeline.offsets_ms(),
+                                "stages_ms": event.timeline.stages_ms(),
+                            }))
                     else:
                         logging.error(f"Unknown event type: {event}", stack_info=True)
             except asyncio.QueueShutDown:
+                if queue.is_overflowed():
+                    await drop_slow_consumer("overflow")
+            except TimeoutError:
+                await drop_slow_consumer("send_timeout")
+
+        # A binary message carries audio of any length, so native audio is split into chunks too.
+        frame_converter = AudioConverter(audio_format, config, allow_passthrough=False) if converter.is_passthrough() else converter
+
+        consumed_ms = 0
+
+        async def feed(audio: bytes, audio_converter: AudioConverter) -> None:
+            nonlocal consumed_ms
+            if audio_format.is_compressed():
+                chunks = await asyncio.get_running_loop().run_in_executor(decode_executor, audio_converter.convert, audio)
+            else:
+                chunks = audio_converter.convert(audio)
+            for chunk in chunks:
+                await rtstt_client.feed(connection_id, chunk)
+            if not use_credits:
                 return
+            # Granted only once fed, so a client never has more than the window in flight.
+            consumed_ms += len(chunks) * config.chunk_size_ms
+            if consumed_ms >= credit_grant_ms:
+                await send({"type": "credit", "ms": consumed_ms})
+                consumed_ms = 0
 
         task = asyncio.create_task(handle_event())
+        ended = False
 
         try:
+            # Created in here, so a capture_dir that cannot be written still releases the connection.
+            if capture_dir is not None:
+                capture = TraceWriter.create(capture_dir, connection_id, websocket.url.query)
+            if use_credits:
+                await send({"type": "credit", "ms": credit_window_ms})
             while True:
-                message = await websocket.receive_json()
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                if frame.get("bytes") is not None:
+                    if capture is not None:
+                        capture.write(FrameKind.BINARY_AUDIO, frame["bytes"])
+                    await feed(frame["bytes"], frame_converter)
+                    continue
+                message = json.loads(frame["text"])
                 if message["type"] == "audio chunk":
-                    bytes = base64.b64decode(message["data"])
-                    await rtstt_client.feed(connection_id, bytes)
+                    audio = base64.b64decode(message["data"])
+                    if capture is not None:
+                        capture.write(FrameKind.AUDIO, audio)
+                    await feed(audio, converter)
                 elif message["type"] == "EOF":
-                    # Since ThreeLayerRTSTTClient#feed is blocking, closing here is safe
+                    if capture is not None:
+                        capture.write(FrameKind.EOF)
+                    # Speech still in progress is transcribed; feed and flush await every transcription.
+                    await rtstt_client.flush(connection_id)
+                    ended = True
                     break
         except WebSocketDisconnect:
             pass
+        except TimeoutError:
+            await drop_slow_consumer("send_timeout")
         except Exception as e:
             logging.error(e, stack_info=True)
         finally:
+            if capture is not None:
+                capture.close()
             rtstt_client.disconnect(connection_id)
+            ACTIVE_CONNECTIONS.dec()
             await queue.put(None)
             await task
-            await websocket.close()
+            if ended and websocket.application_state != WebSocketState.DISCONNECTED:
+                # Every event of the stream was sent; the client can stop listening.
+                with contextlib.suppress(TimeoutError, WebSocketDisconnect):
+                    await send({"type": "end"})
+            if websocket.application_state != WebSocketState.DISCONNECTED:
+                await websocket.close()
+
+    @router.post("/transcribe")
+    async def batch_speech_to_text(request: Request) -> StreamingResponse:
+        """Transcribe a whole PCM or WAV upload and stream segment texts as NDJSON as they finish.
+
+        Raw PCM declares its format with the same query parameters as /rtstt.
+        """
+        body = request.stream().__aiter__()
+        head = b""
+        try:
+            async for piece in body:
+                head += piece
+                if len(head) >= 12:
+                    break
+            if head.startswith(b"RIFF"):
+                header = parse_wav_header(head)
+                while header is None and len(head) < _MAX_WAV_HEADER_BYTES:
+                    try:
+                        head += await anext(body)
+                    except StopAsyncIteration:
+                        break
+                    header = parse_wav_header(head)
+                if header is None:
+                    raise ValueError("Incomplete WAV header.")
+                audio_format, offset = header
+                head = head[offset:]
+            else:
+                audio_format = AudioFormat.from_query(request.query_params, config)
+            if audio_format.is_compressed():
+                raise ValueError("Compressed audio is only accepted on /rtstt.")
+        except ValueError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        converter = AudioConverter(audio_format, config, allow_passthrough=False)
+        # Read by a task of its own from here on: once the response starts, Starlette's
+        # disconnect listener would otherwise take the body messages that are still to come.
+        pieces: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=_UPLOAD_QUEUE_PIECES)
+
+        async def read_body() -> None:
+            try:
+                async for piece in body:
+                    await pieces.put(piece)
+            except ClientDisconnect:
+                pass
+            await pieces.put(None)
+
+        async def chunks() -> AsyncIterator[bytes]:
+            for chunk in converter.convert(head):
+                yield chunk
+            while (piece := await pieces.get()) is not None:
+                for chunk in converter.convert(piece):
+                    yield chunk
+
+        try:
+            segments = rtstt_client.transcribe(chunks())
+        except OverloadedError as e:
+            logging.warning(f"Rejected upload from host {request.client.host}: {e}")
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after_s))})
+        reader = asyncio.create_task(read_body())
+
+        async def lines() -> AsyncIterator[str]:
+            try:
+                async for segment in segments:
+                    yield json.dumps(asdict(segment)) + "\n"
+            finally:
+                reader.cancel()
+                await segments.aclose()
+
+        return _UploadStreamingResponse(reader, lines(), media_type="application/x-ndjson")
+
+    @router.get("/metrics")
+    async def metrics() -> PlainTextResponse:
+        """Prometheus metrics of this process."""
+        loop_lag_monitor.start()
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    @router.get("/ready")
+    async def ready() -> JSONResponse:
+        """200 once every model is loaded and warmed up, 503 before."""
+        is_ready = rtstt_client.is_ready()
+        return JSONResponse({"ready": is_ready}, status_code=200 if is_ready else 503)
+
+    if admin_token:
+        # A thread lock, because the event loops of `run --loops` share this router.
+        profile_lock = threading.Lock()
+
+        @router.get("/admin/profile", response_model=None)
+        async def profile_process(
+            seconds: float = 10.0,
+            interval_ms: float = 10.0,
+            format: str = "json",
+            authorization: str | None = Header(default=None),
+        ) -> dict | PlainTextResponse:
+            """Sample the stacks of every thread for a while.
+
+            `format=collapsed` returns only the collapsed stacks, ready for flamegraph.pl.
+            """
+            if authorization is None or not hmac.compare_digest(authorization.encode(), f"Bearer {admin_token}".encode()):
+                raise HTTPException(status_code=401, detail="Admin token required.")
+            if not 0 < seconds <= _MAX_PROFILE_SECONDS or interval_ms < 1 or format not in ("json", "collapsed"):
+                raise HTTPException(status_code=400, detail=f"Use 0 < seconds <= {_MAX_PROFILE_SECONDS}, interval_ms >= 1 and format json or collapsed.")
+            if not profile_lock.acquire(blocking=False):
+                raise HTTPException(status_code=409, detail="A profile is already running.")
+            try:
+                # The sampler sleeps in its own thread, so the loop it profiles keeps serving.
+                result = await asyncio.to_thread(profile, seconds, interval_ms / 1000)
+            finally:
+                profile_lock.release()
+            if format == "collapsed":
+                return PlainTextResponse(result["collapsed"])
+            return result
 
-    return router
\ No newline at end of file
+    return router
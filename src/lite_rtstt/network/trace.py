@@ -0,0 +1,105 @@
+"""Compact binary traces of /rtstt connections.
+
+A trace starts with a header and is followed by one record per incoming frame:
+
+    header: magic b"RTTR" | version u8 | start time u64 (unix us) | query length u16 | query (utf-8)
+    record: delay u32 (us since the previous record) | kind u8 | payload length u32 | payload
+
+The payload is the decoded audio of one "audio chunk" message or the audio of one binary
+message, before any format conversion,
+and the query is the handshake query string, so a replay declares the same input format.
+Records are only appended, so the trace of a server that crashed is readable up to its last
+complete record.
+"""
+import os
+import struct
+import time
+from dataclasses import dataclass
+from enum import IntEnum
+
+MAGIC = b"RTTR"
+VERSION = 1
+TRACE_EXTENSION = ".rttr"
+
+_HEADER = struct.Struct("<4sBQH")
+_RECORD = struct.Struct("<IBI")
+_MAX_DELAY_US = (1 << 32) - 1
+
+
+class FrameKind(IntEnum):
+    AUDIO = 0
+    EOF = 1
+    # Audio of any length from a binary message.
+    BINARY_AUDIO = 2
+
+
+@dataclass(frozen=True)
+class Frame:
+    offset_s: float
+    kind: FrameKind
+    data: bytes
+
+
+@dataclass(frozen=True)
+class Trace:
+    name: str
+    query: str
+    start_time_s: float
+    frames: list[Frame]
+
+
+class TraceWriter:
+
+    __BUFFER_BYTES = 1 << 16
+
+    def __init__(self, path: str, query: str) -> None:
+        """Append the frames of one connection to `path`.
+
+        Writes go through a user-space buffer, so recording a frame costs a memory copy on
+        the event loop and a write syscall only every 64 KiB.
+        """
+        self.__file = open(path, "ab", buffering=self.__BUFFER_BYTES)
+        encoded = query.encode("utf-8")
+        self.__file.write(_HEADER.pack(MAGIC, VERSION, time.time_ns() // 1000, len(encoded)) + encoded)
+        self.__last = time.monotonic_ns()
+
+    @staticmethod
+    def create(directory: str, connection_id: int, query: str) -> "TraceWriter":
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{connection_id}{TRACE_EXTENSION}"
+        return TraceWriter(os.path.join(directory, name), query)
+
+    def write(self, kind: FrameKind, data: bytes = b"") -> None:
+        now = time.monotonic_ns()
+        delay_us = min((now - self.__last) // 1000, _MAX_DELAY_US)
+        self.__last = now
+        self.__file.write(_RECORD.pack(delay_us, kind, len(data)))
+        self.__file.write(data)
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+def read_trace(path: str) -> Trace:
+    """Read a trace. A record cut off by a crash ends the trace."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is not a trace.")
+    magic, version, start_us, query_length = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} trace.")
+    position = _HEADER.size
+    query = data[position:position + query_length].decode("utf-8")
+    position += query_length
+
+    frames = []
+    offset_us = 0
+    while position + _RECORD.size <= len(data):
+        delay_us, kind, length = _RECORD.unpack_from(data, position)
+        position += _RECORD.size
+        if position + length > len(data):
+            break
+        offset_us += delay_us
+        frames.append(Frame(offset_us / 1e6, FrameKind(kind), data[position:position + length]))
+        position += length
+    return Trace(os.path.basename(path), query, start_us / 1e6, frames)
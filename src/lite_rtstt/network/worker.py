@@ -0,0 +1,139 @@
+"""Inference worker: serves Silero and Whisper to remote front-ends over TCP.
+
+Every frame is a `<IBI` header (request id, kind or status, payload length) and a payload.
+Requests carry raw 16 kHz int16 audio, no longer than the longest utterance the state machine
+buffers; a connection that sends a longer one is closed before its payload is read. Responses
+carry JSON. Requests on one connection are
+answered as they finish, not in order. Every response reports the load of the worker, so
+clients balance on fresh numbers without extra round trips.
+
+The protocol has no authentication: anyone who reaches the port can run the models.
+"""
+import asyncio
+import json
+import logging
+import struct
+import time
+
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.stt_client import STTClient
+from lite_rtstt.stt.vad_client import VADClient
+
+HEADER = struct.Struct("<IBI")
+
+KIND_PING = 0
+KIND_SILERO = 1
+KIND_WHISPER = 2
+
+STATUS_OK = 0
+STATUS_OVERLOADED = 1
+STATUS_ERROR = 2
+
+MODELS = {KIND_SILERO: "silero", KIND_WHISPER: "whisper"}
+
+# Slack over the longest utterance, for pre-roll and the chunk that ends it.
+_PAYLOAD_MARGIN_MS = 1000
+
+
+def get_max_payload_bytes(config: STTConfig) -> int:
+    """Size of the longest audio a front-end with `config` sends in one request."""
+    max_ms = config.max_buffered_chunks * config.chunk_size_ms + config.pre_roll_ms + _PAYLOAD_MARGIN_MS
+    return max_ms * config.sample_rate // 1000 * 2
+
+
+async def read_frame(reader: asyncio.StreamReader, max_length: int | None = None) -> tuple[int, int, bytes]:
+    """Read one frame.
+
+    Raises:
+        ValueError: If the payload is longer than `max_length`. Its bytes are left unread.
+    """
+    request_id, code, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if max_length is not None and length > max_length:
+        raise ValueError(f"Frame of {length} bytes exceeds the limit of {max_length} bytes.")
+    return request_id, code, await reader.readexactly(length)
+
+
+def write_frame(writer: asyncio.StreamWriter, request_id: int, code: int, payload: bytes) -> None:
+    writer.write(HEADER.pack(request_id, code, len(payload)))
+    writer.write(payload)
+
+
+class WorkerServer:
+
+    def __init__(self, vad_client: VADClient, stt_client: STTClient, config: STTConfig = STTConfig.default()) -> None:
+        """Answer Silero and Whisper requests with started clients."""
+        self.__vad_client = vad_client
+        self.__stt_client = stt_client
+        self.__max_payload_bytes = get_max_payload_bytes(config)
+        self.__in_flight = {model: 0 for model in MODELS.values()}
+
+    def get_load(self) -> dict:
+        """Requests received and not yet answered, and the queue wait of every model."""
+        return {
+            "silero": self.__in_flight["silero"],
+            "whisper": self.__in_flight["whisper"],
+            "silero_wait_ms": round(self.__vad_client.get_queue_wait_ms(), 1),
+            "whisper_wait_ms": round(self.__stt_client.get_queue_wait_ms(), 1),
+        }
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.__serve_connection, host, port)
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        server = await self.start(host, port)
+        logging.info(f"Inference worker listening on {host}:{port}.")
+        async with server:
+            await server.serve_forever()
+
+    async def __serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                request_id, kind, payload = await read_frame(reader, self.__max_payload_bytes)
+                task = asyncio.create_task(self.__answer(writer, request_id, kind, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            # A corrupt or hostile header; nothing after it can be framed.
+            logging.warning(f"Closing connection from {writer.get_extra_info('peername')}: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def __answer(self, writer: asyncio.StreamWriter, request_id: int, kind: int, payload: bytes) -> None:
+        model = MODELS.get(kind)
+        if model is not None:
+            self.__in_flight[model] += 1
+        try:
+            if kind == KIND_PING:
+                result = {}
+            elif kind == KIND_SILERO:
+                result = {"active": await self.__vad_client.is_active(AudioBuffer.from_bytes(payload))}
+            elif kind == KIND_WHISPER:
+                timeline = UtteranceTimeline()
+                result = {"text": await self.__stt_client.transcribe(AudioBuffer.from_bytes(payload), timeline)}
+                if timeline.stt_started is not None and timeline.stt_ended is not None:
+                    result["inference_s"] = timeline.stt_ended - timeline.stt_started
+            else:
+                raise ValueError(f"Unknown request kind {kind}.")
+            status = STATUS_OK
+        except OverloadedError as e:
+            status, result = STATUS_OVERLOADED, {"error": str(e)}
+        except Exception as e:
+            logging.error(e, stack_info=True)
+            status, result = STATUS_ERROR, {"error": str(e)}
+        finally:
+            if model is not None:
+                self.__in_flight[model] -= 1
+        result["load"] = self.get_load()
+        try:
+            write_frame(writer, request_id, status, json.dumps(result).encode("utf-8"))
+            await writer.drain()
+        except ConnectionError:
+            pass
@@ -0,0 +1,23 @@
+"""Cheap readings of this process's CPU time and memory."""
+import os
+import resource
+
+
+def get_cpu_seconds() -> float:
+    """User plus system CPU time of all threads of this process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def get_rss_bytes() -> int:
+    """Current resident set size. Falls back to the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return get_peak_rss_bytes()
+
+
+def get_peak_rss_bytes() -> int:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
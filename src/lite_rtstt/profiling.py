@@ -0,0 +1,101 @@
+"""Sampling profiler for the running server.
+
+Stacks of every Python thread are sampled with `sys._current_frames()` from a separate thread,
+so the event loop and the Silero/Whisper workers are profiled as they run. Samples are
+aggregated as collapsed stacks (`thread;outer;...;inner count`), the input format of
+flamegraph.pl and speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(thread_name: str, frame: FrameType | None) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(duration_s: float, interval_s: float) -> tuple[Counter[str], int]:
+    """Sample the stacks of all other threads for `duration_s`.
+
+    Returns:
+        The count of every collapsed stack and the number of sampling rounds.
+    """
+    own = threading.get_ident()
+    stacks: Counter[str] = Counter()
+    rounds = 0
+    deadline = time.monotonic() + duration_s
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                stacks[_collapse(names.get(ident, f"thread-{ident}"), frame)] += 1
+        rounds += 1
+        time.sleep(interval_s)
+    return stacks, rounds
+
+
+def format_collapsed(stacks: Counter[str]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def get_thread_cpu_seconds() -> dict[str, float]:
+    """CPU time of every Python thread by name, read from /proc. Empty where /proc is missing."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu = {}
+    for thread in threading.enumerate():
+        try:
+            with open(f"/proc/self/task/{thread.native_id}/stat", "r") as f:
+                # The command name may contain spaces; the fields after it are fixed.
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError, TypeError):
+            continue
+        cpu[thread.name] = (int(fields[11]) + int(fields[12])) / ticks
+    return cpu
+
+
+def get_torch_settings() -> dict:
+    try:
+        import torch
+    except ImportError:
+        return {"available": False}
+    return {
+        "available": True,
+        "version": torch.__version__,
+        "num_threads": torch.get_num_threads(),
+        "num_interop_threads": torch.get_num_interop_threads(),
+        "parallel_info": torch.__config__.parallel_info(),
+    }
+
+
+def profile(duration_s: float, interval_s: float) -> dict:
+    """Profile the process for `duration_s`. Blocks the calling thread, so run it off the loop."""
+    cpu_before = get_thread_cpu_seconds()
+    stacks, rounds = sample_stacks(duration_s, interval_s)
+    cpu_after = get_thread_cpu_seconds()
+    return {
+        "duration_s": duration_s,
+        "interval_s": interval_s,
+        "rounds": rounds,
+        "collapsed": format_collapsed(stacks),
+        "threads": {
+            name: {
+                "cpu_seconds": round(total, 3),
+                "cpu_seconds_during_profile": round(total - cpu_before.get(name, 0.0), 3),
+            }
+            for name, total in cpu_after.items()
+        },
+        "torch": get_torch_settings(),
+    }
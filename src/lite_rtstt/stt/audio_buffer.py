@@ -3,6 +3,8 @@ import numpy
 
 class AudioBuffer:
 
+    __slots__ = ("__buffer",)
+
     @staticmethod
     def from_bytes(buffer: bytes) -> 'AudioBuffer':
         audio_buffer = AudioBuffer()
@@ -16,6 +18,11 @@ class AudioBuffer:
     def append(self, buffer: bytes):
         self.__buffer.append(buffer)
 
+    def keep_last(self, count: int) -> None:
+        """Drop all but the newest `count` chunks."""
+        if len(self.__buffer) > count:
+            del self.__buffer[:len(self.__buffer) - count]
+
     def get_chunks_count(self) -> int:
         return len(self.__buffer)
 
@@ -26,5 +33,7 @@ class AudioBuffer:
         return b"".join(self.__buffer)
 
     def to_float32_ndarray(self) -> numpy.ndarray:
-        int16_data = numpy.frombuffer(b"".join(self.__buffer), dtype=numpy.int16)
-        return int16_data.astype(numpy.float32) / 32768.0
\ No newline at end of file
+        # A single chunk, e.g. a view of shared memory, is read in place instead of joined first.
+        data = self.__buffer[0] if len(self.__buffer) == 1 else b"".join(self.__buffer)
+        # Dividing by a float32 converts and scales in one pass, so the result is the only new array.
+        return numpy.frombuffer(data, dtype=numpy.int16) / numpy.float32(32768.0)
\ No newline at end of file
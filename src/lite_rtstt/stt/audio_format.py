@@ -0,0 +1,271 @@
+"""Input audio formats and per-connection conversion to the pipeline format."""
+from dataclasses import dataclass
+from enum import Enum
+from math import gcd
+import struct
+from typing import Mapping
+
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lite_rtstt.stt.config import STTConfig
+
+
+class AudioEncoding(Enum):
+    PCM_S16LE = "pcm_s16le"
+    PCM_F32LE = "pcm_f32le"
+    MULAW = "mulaw"
+    OPUS = "opus"
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    encoding: AudioEncoding
+    sample_rate: int
+    channels: int
+
+    MAX_CHANNELS = 8
+    SUPPORTED_SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+    OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+    @staticmethod
+    def native(config: STTConfig) -> "AudioFormat":
+        """The format the VAD and STT layers consume: 16-bit mono at the configured rate."""
+        return AudioFormat(AudioEncoding.PCM_S16LE, config.sample_rate, 1)
+
+    @staticmethod
+    def from_query(params: Mapping[str, str], config: STTConfig) -> "AudioFormat":
+        """Parse the format declared in the handshake query string.
+
+        Missing parameters fall back to the native format.
+
+        Raises:
+            ValueError: If the declared format is not supported.
+        """
+        native = AudioFormat.native(config)
+        try:
+            encoding = AudioEncoding(params.get("encoding", native.encoding.value))
+        except ValueError:
+            raise ValueError(f"Unsupported encoding {params.get('encoding')!r}.")
+        try:
+            sample_rate = int(params.get("sample_rate", native.sample_rate))
+            channels = int(params.get("channels", native.channels))
+        except ValueError:
+            raise ValueError("sample_rate and channels must be integers.")
+        return AudioFormat(encoding, sample_rate, channels).validated()
+
+    def validated(self) -> "AudioFormat":
+        """Return self if the server can convert this format, otherwise raise ValueError."""
+        if self.sample_rate not in AudioFormat.SUPPORTED_SAMPLE_RATES:
+            raise ValueError(f"Unsupported sample rate {self.sample_rate}.")
+        if not 1 <= self.channels <= AudioFormat.MAX_CHANNELS:
+            raise ValueError(f"Unsupported channel count {self.channels}.")
+        if self.encoding == AudioEncoding.OPUS and (self.sample_rate not in AudioFormat.OPUS_SAMPLE_RATES or self.channels > 2):
+            raise ValueError(f"Opus streams must be mono or stereo at one of {AudioFormat.OPUS_SAMPLE_RATES} Hz.")
+        return self
+
+    def is_compressed(self) -> bool:
+        """Compressed streams carry one packet per message and should be decoded off the event loop."""
+        return self.encoding == AudioEncoding.OPUS
+
+    def bytes_per_sample(self) -> int:
+        if self.encoding == AudioEncoding.PCM_S16LE:
+            return 2
+        if self.encoding == AudioEncoding.PCM_F32LE:
+            return 4
+        return 1
+
+
+def parse_wav_header(data: bytes) -> tuple[AudioFormat, int] | None:
+    """Parse a RIFF/WAVE header.
+
+    Returns:
+        tuple[AudioFormat, int] | None: The format and the offset of the sample data,
+        or None if `data` does not contain the whole header yet.
+
+    Raises:
+        ValueError: If the header is malformed or the sample format is not supported.
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file.")
+    audio_format = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", data, offset)
+        body = offset + 8
+        if chunk_id == b"data":
+            if audio_format is None:
+                raise ValueError("WAV data chunk precedes the fmt chunk.")
+            return audio_format, body
+        if body + chunk_size > len(data):
+            return None
+        if chunk_id == b"fmt ":
+            code, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if code == 0xFFFE and chunk_size >= 26:
+                code = struct.unpack_from("<H", data, body + 24)[0]
+            encodings = {(1, 16): AudioEncoding.PCM_S16LE, (3, 32): AudioEncoding.PCM_F32LE, (7, 8): AudioEncoding.MULAW}
+            if (code, bits) not in encodings:
+                raise ValueError(f"Unsupported WAV sample format {code} with {bits} bits.")
+            audio_format = AudioFormat(encodings[(code, bits)], sample_rate, channels).validated()
+        offset = body + chunk_size + chunk_size % 2
+    return None
+
+
+def _mulaw_table() -> numpy.ndarray:
+    """G.711 mu-law to linear 16-bit lookup table."""
+    codes = ~numpy.arange(256, dtype=numpy.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return numpy.where(sign != 0, -magnitude, magnitude).astype(numpy.float32) / 32768.0
+
+
+class PolyphaseResampler:
+
+    __ZERO_CROSSINGS = 16
+    __KAISER_BETA = 8.0
+    __ROLLOFF = 0.9
+
+    def __init__(self, source_rate: int, target_rate: int) -> None:
+        """A streaming rational resampler.
+
+        The anti-aliasing filter is split into `up` polyphase branches, so every output
+        sample costs one dot product over `taps` input samples. The input history and the
+        output phase are carried between calls, so resampling a stream chunk by chunk gives
+        the same samples as resampling it in one piece.
+
+        Args:
+            source_rate (int): Input sample rate.
+            target_rate (int): Output sample rate.
+        """
+        divisor = gcd(source_rate, target_rate)
+        self.__up = target_rate // divisor
+        self.__down = source_rate // divisor
+
+        length = 2 * self.__ZERO_CROSSINGS * max(self.__up, self.__down) + 1
+        cutoff = self.__ROLLOFF * 0.5 / max(self.__up, self.__down)
+        n = numpy.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * numpy.sinc(2 * cutoff * n) * numpy.kaiser(length, self.__KAISER_BETA)
+        # Each branch sees one of every `up` taps, so unity gain needs a total of `up`.
+        prototype *= self.__up / prototype.sum()
+
+        self.__taps = -(-length // self.__up)
+        padded = numpy.zeros(self.__taps * self.__up)
+        padded[:length] = prototype
+        # bank[phase, j] multiplies x[i - (taps - 1 - j)], matching a sliding window over the input.
+        self.__bank = padded.reshape(self.__taps, self.__up).T[:, ::-1].astype(numpy.float32).copy()
+        self.__history = numpy.zeros(self.__taps - 1, dtype=numpy.float32)
+        self.__offset = 0
+
+    def process(self, samples: numpy.ndarray) -> numpy.ndarray:
+        """Resample the next float32 mono block of the stream."""
+        if len(samples) == 0:
+            return numpy.zeros(0, dtype=numpy.float32)
+        extended = numpy.concatenate([self.__history, samples.astype(numpy.float32, copy=False)])
+        span = len(samples) * self.__up
+        count = max(0, -(-(span - self.__offset) // self.__down))
+        positions = self.__offset + numpy.arange(count, dtype=numpy.int64) * self.__down
+        windows = sliding_window_view(extended, self.__taps)[positions // self.__up]
+        output = numpy.einsum("ij,ij->i", windows, self.__bank[positions % self.__up])
+        self.__offset += count * self.__down - span
+        self.__history = extended[len(extended) - (self.__taps - 1):]
+        return output
+
+
+class OpusDecoder:
+
+    __MAX_FRAME_MS = 120
+
+    def __init__(self, sample_rate: int) -> None:
+        """A streaming Opus decoder producing mono int16 PCM at `sample_rate`.
+
+        libopus decodes any Opus stream directly to the requested rate and channel count,
+        so no resampling or down-mixing is needed afterwards. Requires the optional
+        `opuslib` package and the system libopus.
+        """
+        try:
+            import opuslib
+        except Exception as e:
+            raise RuntimeError("Opus support requires the opuslib package and libopus.") from e
+        self.__decoder = opuslib.Decoder(sample_rate, 1)
+        self.__max_frame_samples = sample_rate * self.__MAX_FRAME_MS // 1000
+
+    def decode(self, packet: bytes) -> numpy.ndarray:
+        pcm = self.__decoder.decode(packet, self.__max_frame_samples)
+        return numpy.frombuffer(pcm, dtype=numpy.int16)
+
+
+class AudioConverter:
+
+    __MULAW = _mulaw_table()
+
+    def __init__(self, input_format: AudioFormat, config: STTConfig, allow_passthrough: bool = True) -> None:
+        """Convert one connection's audio to native chunks of `chunk_size_ms`.
+
+        Decoding, down-mixing and resampling are vectorized. The converter keeps the
+        resampler state and any partial sample or frame between calls, so it must not be
+        shared between connections.
+
+        Args:
+            input_format (AudioFormat): The declared input format.
+            config (STTConfig): STT config.
+            allow_passthrough (bool): Forward native audio as is. Disable it when the
+                input is not already split into native chunks, e.g. an uploaded file.
+        """
+        self.__format = input_format
+        self.__native = input_format == AudioFormat.native(config)
+        self.__passthrough = self.__native and allow_passthrough
+        self.__frame_bytes = input_format.bytes_per_sample() * input_format.channels
+        self.__chunk_samples = config.sample_rate * config.chunk_size_ms // 1000
+        self.__resampler = None
+        self.__opus = None
+        if input_format.encoding == AudioEncoding.OPUS:
+            self.__opus = OpusDecoder(config.sample_rate)
+        elif input_format.sample_rate != config.sample_rate:
+            self.__resampler = PolyphaseResampler(input_format.sample_rate, config.sample_rate)
+        self.__partial_bytes = b""
+        self.__pending = numpy.zeros(0, dtype=numpy.int16)
+
+    def is_passthrough(self) -> bool:
+        return self.__passthrough
+
+    def __decode(self, data: bytes) -> numpy.ndarray:
+        if self.__format.encoding == AudioEncoding.PCM_S16LE:
+            return numpy.frombuffer(data, dtype="<i2").astype(numpy.float32) / 32768.0
+        if self.__format.encoding == AudioEncoding.PCM_F32LE:
+            return numpy.frombuffer(data, dtype="<f4")
+        return self.__MULAW[numpy.frombuffer(data, dtype=numpy.uint8)]
+
+    def convert(self, data: bytes) -> list[bytes]:
+        """Convert the next piece of the stream.
+
+        Returns:
+            list[bytes]: Zero or more complete native chunks.
+        """
+        if self.__passthrough:
+            return [data]
+        if self.__opus is not None:
+            return self.__split(self.__opus.decode(data))
+        if self.__partial_bytes:
+            data = self.__partial_bytes + data
+        usable = len(data) - len(data) % self.__frame_bytes
+        self.__partial_bytes = data[usable:]
+        if self.__native:
+            return self.__split(numpy.frombuffer(data[:usable], dtype="<i2"))
+        samples = self.__decode(data[:usable])
+        if self.__format.channels > 1:
+            samples = samples.reshape(-1, self.__format.channels).mean(axis=1, dtype=numpy.float32)
+        if self.__resampler is not None:
+            samples = self.__resampler.process(samples)
+        pcm = numpy.clip(numpy.rint(samples * 32768.0), -32768, 32767).astype(numpy.int16)
+        return self.__split(pcm)
+
+    def __split(self, pcm: numpy.ndarray) -> list[bytes]:
+        if len(self.__pending):
+            pcm = numpy.concatenate([self.__pending, pcm])
+        full = len(pcm) - len(pcm) % self.__chunk_samples
+        self.__pending = pcm[full:]
+        return [chunk.tobytes() for chunk in numpy.split(pcm[:full], full // self.__chunk_samples)] if full else []
@@ -4,22 +4,70 @@ from dataclasses import dataclass
 class STTConfig:
     vad_threads: int
     whisper_model: str
+    whisper_threads: int
     duration_time_ms: int
     aggresiveness: int
     sample_rate: int
     chunk_size_ms: int
     active_to_detection_ms: int
     max_buffered_chunks: int
+    decode_threads: int
+    max_streams: int
+    admission_queue_wait_ms: int
+    memory_budget_mb: int
+    shed_queue_wait_ms: int
+    event_queue_size: int
+    slow_consumer_policy: str
+    event_send_timeout_ms: int
+    shared_ring_mb: int
+    remote_connections_per_worker: int
+    remote_health_interval_ms: int
+    warm_up_ms: int
+    cpu_cores: int
+    event_loop_cores: int
+    cpu_pinning: str
+    endpointing: str
+    endpointing_floor_ms: int
+    gate_tuning: bool
+    max_aggresiveness: int
+    max_active_to_detection_ms: int
+    pre_roll_ms: int
+    hibernate_after_ms: int
+    credit_window_ms: int
 
     @staticmethod
     def default() -> "STTConfig":
         return STTConfig(
             vad_threads=4,
             whisper_model="base",
+            whisper_threads=1,
             duration_time_ms=1200,
             aggresiveness=1,
             sample_rate=16000,
             chunk_size_ms=30,
             active_to_detection_ms=900,
             max_buffered_chunks=500,
+            decode_threads=2,
+            max_streams=0,
+            admission_queue_wait_ms=2000,
+            memory_budget_mb=0,
+            shed_queue_wait_ms=5000,
+            event_queue_size=64,
+            slow_consumer_policy="coalesce",
+            event_send_timeout_ms=5000,
+            shared_ring_mb=16,
+            remote_connections_per_worker=2,
+            remote_health_interval_ms=1000,
+            warm_up_ms=1000,
+            cpu_cores=0,
+            event_loop_cores=1,
+            cpu_pinning="off",
+            endpointing="fixed",
+            endpointing_floor_ms=300,
+            gate_tuning=False,
+            max_aggresiveness=3,
+            max_active_to_detection_ms=2400,
+            pre_roll_ms=300,
+            hibernate_after_ms=10000,
+            credit_window_ms=3000,
         )
@@ -0,0 +1,52 @@
+"""Adaptive end-of-speech detection.
+
+With fixed endpointing an utterance ends after `duration_time_ms` of silence. Adaptive
+endpointing learns the pauses a speaker makes inside utterances and ends an utterance once a
+pause is clearly longer than those, if Silero confirms that the pause holds no speech that
+WebRTC VAD missed. The silence timeout stays between `endpointing_floor_ms` and
+`duration_time_ms`.
+"""
+import math
+from collections import deque
+from enum import Enum
+
+
+class EndpointingMode(Enum):
+    FIXED = "fixed"
+    ADAPTIVE = "adaptive"
+
+
+class Endpointer:
+
+    __slots__ = ("__floor_chunks", "__ceiling_chunks", "__pauses", "__timeout_chunks")
+
+    # Pauses needed before the timeout is lowered below the ceiling.
+    MIN_PAUSES = 4
+    # The timeout is this much longer than the 90th percentile pause.
+    MARGIN = 1.25
+
+    def __init__(self, floor_chunks: int, ceiling_chunks: int, history: int = 32) -> None:
+        """Learn the pause lengths of one stream.
+
+        Args:
+            floor_chunks: Shortest silence timeout in chunks.
+            ceiling_chunks: Longest silence timeout in chunks, the fixed timeout.
+            history: Number of recent pauses the timeout is based on.
+        """
+        self.__floor_chunks = min(floor_chunks, ceiling_chunks)
+        self.__ceiling_chunks = ceiling_chunks
+        self.__pauses: deque[int] = deque(maxlen=history)
+        self.__timeout_chunks = ceiling_chunks
+
+    def get_timeout_chunks(self) -> int:
+        """Silent chunks after which a pause probably ends the utterance."""
+        return self.__timeout_chunks
+
+    def add_pause(self, chunks: int) -> None:
+        """Record a pause after which the speaker went on with the same utterance."""
+        self.__pauses.append(chunks)
+        if len(self.__pauses) < self.MIN_PAUSES:
+            return
+        pauses = sorted(self.__pauses)
+        typical = pauses[int(0.9 * (len(pauses) - 1))]
+        self.__timeout_chunks = max(self.__floor_chunks, min(self.__ceiling_chunks, math.ceil(typical * self.MARGIN) + 1))
@@ -0,0 +1,6 @@
+class OverloadedError(RuntimeError):
+    """The server is saturated and refused or dropped work."""
+
+    def __init__(self, message: str, retry_after_s: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
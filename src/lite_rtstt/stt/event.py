@@ -1,16 +1,65 @@
 import asyncio
 import queue
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, fields
+from enum import Enum
 from typing import Any, Coroutine
 
+from lite_rtstt.metrics import DROPPED_EVENTS
+
+
+@dataclass(slots=True)
+class UtteranceTimeline:
+    """`time.monotonic()` timestamps of one utterance on its way through the pipeline.
+
+    A stage the utterance did not go through, or that the client cannot observe, stays None.
+    """
+    first_chunk: float | None = None
+    layer1_active: float | None = None
+    silero_confirmed: float | None = None
+    speech_end: float | None = None
+    stt_enqueued: float | None = None
+    stt_started: float | None = None
+    stt_ended: float | None = None
+    event_emitted: float | None = None
+    event_sent: float | None = None
+
+    def offsets_ms(self) -> dict[str, float]:
+        """Milliseconds from the first chunk to every recorded timestamp."""
+        if self.first_chunk is None:
+            return {}
+        return {
+            field.name: round((getattr(self, field.name) - self.first_chunk) * 1000, 1)
+            for field in fields(self) if getattr(self, field.name) is not None
+        }
+
+    def stages_ms(self) -> dict[str, float]:
+        """Milliseconds spent in every stage whose start and end were both recorded."""
+        stages = {
+            "layer1": (self.first_chunk, self.layer1_active),
+            "silero": (self.layer1_active, self.silero_confirmed),
+            "speech": (self.silero_confirmed, self.speech_end),
+            "end_of_speech_detection": (self.speech_end, self.stt_enqueued),
+            "stt_queue": (self.stt_enqueued, self.stt_started),
+            "stt_inference": (self.stt_started, self.stt_ended),
+            "emit": (self.stt_ended, self.event_emitted),
+            "send": (self.event_emitted, self.event_sent),
+            "speech_end_to_text": (self.speech_end, self.event_sent or self.event_emitted),
+        }
+        return {
+            name: round((end - start) * 1000, 1)
+            for name, (start, end) in stages.items() if start is not None and end is not None
+        }
+
 
 class STTEvent(ABC):
     pass
 
 class TextEvent(STTEvent):
 
-    def __init__(self, text: str):
+    def __init__(self, text: str, timeline: UtteranceTimeline | None = None):
         self.text = text
+        self.timeline = timeline
 
     def text(self) -> str:
         return self.text
@@ -24,6 +73,13 @@ class StopSpeakingEvent(STTEvent):
     pass
 
 
+class OverloadEvent(STTEvent):
+    """Work of the stream was shed because the server is overloaded. The utterance is lost."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
 class EventFactory:
 
     __START_SPEAKING_EVENT = StartSpeakingEvent()
@@ -38,12 +94,18 @@ class EventFactory:
         return EventFactory.__STOP_SPEAKING_EVENT
 
     @staticmethod
-    def text_event(text: str) -> TextEvent:
-        return TextEvent(text)
+    def overload_event(reason: str) -> OverloadEvent:
+        return OverloadEvent(reason)
+
+    @staticmethod
+    def text_event(text: str, timeline: UtteranceTimeline | None = None) -> TextEvent:
+        return TextEvent(text, timeline)
 
 
 class STTEventQueue(ABC):
 
+    __slots__ = ()
+
     @abstractmethod
     async def put(self, event: STTEvent):
         pass
@@ -56,6 +118,10 @@ class STTEventQueue(ABC):
     async def close(self):
         pass
 
+    def is_overflowed(self) -> bool:
+        """Whether the queue gave up on a consumer that fell too far behind. Unbounded queues never do."""
+        return False
+
 
 class SimpleSTTEventQueue(STTEventQueue):
 
@@ -69,4 +135,92 @@ class SimpleSTTEventQueue(STTEventQueue):
         return await self.__queue.get()
 
     async def close(self):
-        self.__queue.shutdown()
\ No newline at end of file
+        self.__queue.shutdown()
+
+class SlowConsumerPolicy(Enum):
+    """What a full BoundedSTTEventQueue does with a new event."""
+    # Drop queued start/stop speaking events first; the text events carry the result.
+    COALESCE = "coalesce"
+    # Drop the oldest queued event, whatever it is.
+    DROP_OLDEST = "drop_oldest"
+    # Give up on the consumer.
+    DISCONNECT = "disconnect"
+
+
+class BoundedSTTEventQueue(STTEventQueue):
+
+    # Every connection holds one for as long as it is open, so it is kept small: a list and
+    # the future of the waiting consumer instead of a deque and an asyncio.Event.
+    __slots__ = ("__max_size", "__policy", "__events", "__waiter", "__closed", "__overflowed", "__dropped")
+
+    def __init__(self, max_size: int, policy: SlowConsumerPolicy):
+        """An event queue that never makes the producer wait for a slow consumer.
+
+        Args:
+            max_size: Most events held at once. The None end marker is always accepted.
+            policy: What to do with a new event when the queue is full. When the policy
+                cannot make room, the queue overflows: queued events are dropped and `get`
+                raises `asyncio.QueueShutDown`.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be positive.")
+        self.__max_size = max_size
+        self.__policy = policy
+        self.__events: list[STTEvent | None] = []
+        self.__waiter: asyncio.Future | None = None
+        self.__closed = False
+        self.__overflowed = False
+        self.__dropped = DROPPED_EVENTS.labels(policy.value)
+
+    async def put(self, event: STTEvent | None):
+        if self.__closed:
+            return
+        if event is not None and len(self.__events) >= self.__max_size:
+            if not self.__make_room(event):
+                return
+        self.__events.append(event)
+        self.__wake()
+
+    async def get(self) -> STTEvent | None:
+        while not self.__events:
+            if self.__closed:
+                raise asyncio.QueueShutDown
+            self.__waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.__waiter
+            finally:
+                self.__waiter = None
+        return self.__events.pop(0)
+
+    async def close(self):
+        self.__closed = True
+        self.__wake()
+
+    def is_overflowed(self) -> bool:
+        return self.__overflowed
+
+    def __wake(self) -> None:
+        if self.__waiter is not None and not self.__waiter.done():
+            self.__waiter.set_result(None)
+
+    def __make_room(self, event: STTEvent) -> bool:
+        """Drop an event according to the policy. Returns whether `event` should still be queued."""
+        if self.__policy == SlowConsumerPolicy.DROP_OLDEST:
+            self.__events.pop(0)
+            self.__dropped.inc()
+            return True
+        if self.__policy == SlowConsumerPolicy.COALESCE:
+            for i, queued in enumerate(self.__events):
+                if isinstance(queued, (StartSpeakingEvent, StopSpeakingEvent)):
+                    del self.__events[i]
+                    self.__dropped.inc()
+                    return True
+            if isinstance(event, (StartSpeakingEvent, StopSpeakingEvent)):
+                self.__dropped.inc()
+                return False
+        self.__dropped.inc(len(self.__events) + 1)
+        self.__events.clear()
+        self.__overflowed = True
+        self.__closed = True
+        self.__wake()
+        return False
@@ -0,0 +1,112 @@
+"""Per-stream tuning of the layer 1 gate.
+
+On a noisy line WebRTC VAD wakes up for noise, and every false alarm costs a Silero call after
+`active_to_detection_ms` of buffering. A tuner follows how often Silero rejects what layer 1
+passed on for its stream. When most of it is rejected, the stream gets a stricter WebRTC
+aggressiveness and then a longer detection window, so noise reaches Silero less often. When
+rejections become rare, the stream steps back towards the configured settings.
+"""
+from lite_rtstt.metrics import GATE_ADJUSTMENTS, TUNED_STREAMS_BY_AGGRESSIVENESS, TUNED_STREAMS_BY_DETECTION_WINDOW
+from lite_rtstt.stt.vad_client import VADClient
+
+# The detection window grows and shrinks by this many chunks per step.
+WINDOW_STEP_CHUNKS = 10
+
+
+class GateTuner:
+
+    __slots__ = (
+        "__vad", "__base_aggressiveness", "__max_aggressiveness", "__base_window_chunks", "__max_window_chunks",
+        "__chunk_size_ms", "__aggressiveness", "__window_chunks", "__rejection_rate", "__checks", "__closed",
+    )
+
+    __STRICTER = GATE_ADJUSTMENTS.labels("stricter")
+    __LOOSER = GATE_ADJUSTMENTS.labels("looser")
+
+    # Layer 2 checks between adjustments, so every setting is judged on its own results.
+    MIN_CHECKS = 5
+    # Smoothing of the rejection rate.
+    ALPHA = 0.2
+    STRICTER_ABOVE = 0.5
+    LOOSER_BELOW = 0.2
+
+    def __init__(
+        self,
+        vad: VADClient | None,
+        base_aggressiveness: int,
+        max_aggressiveness: int,
+        base_window_chunks: int,
+        max_window_chunks: int,
+        chunk_size_ms: int,
+    ) -> None:
+        """Tune the gate of one stream within the given bounds.
+
+        Args:
+            vad: Layer 1 of the stream. Only the detection window is tuned if it is not tunable.
+            base_aggressiveness: Configured aggressiveness, the loosest setting.
+            max_aggressiveness: Strictest aggressiveness.
+            base_window_chunks: Configured detection window, the shortest one.
+            max_window_chunks: Longest detection window.
+            chunk_size_ms: Chunk length, for the metrics.
+        """
+        self.__vad = vad
+        self.__base_aggressiveness = base_aggressiveness
+        self.__max_aggressiveness = max(base_aggressiveness, max_aggressiveness) if vad is not None else base_aggressiveness
+        self.__base_window_chunks = base_window_chunks
+        self.__max_window_chunks = max(base_window_chunks, max_window_chunks)
+        self.__chunk_size_ms = chunk_size_ms
+        self.__aggressiveness = base_aggressiveness
+        self.__window_chunks = base_window_chunks
+        self.__rejection_rate = 0.0
+        self.__checks = 0
+        self.__closed = False
+        self.__count_stream(1)
+
+    def get_window_chunks(self) -> int:
+        """Chunks of layer 1 activity to buffer before asking layer 2."""
+        return self.__window_chunks
+
+    def get_aggressiveness(self) -> int:
+        return self.__aggressiveness
+
+    def record(self, rejected: bool) -> None:
+        """Record the answer of layer 2 to audio that layer 1 passed on, and adjust the gate."""
+        self.__rejection_rate += self.ALPHA * (float(rejected) - self.__rejection_rate)
+        self.__checks += 1
+        if self.__checks < self.MIN_CHECKS:
+            return
+        if self.__rejection_rate > self.STRICTER_ABOVE:
+            # A stricter WebRTC mode is free, a longer window delays the start of speech.
+            if self.__aggressiveness < self.__max_aggressiveness:
+                self.__adjust(self.__aggressiveness + 1, self.__window_chunks)
+            elif self.__window_chunks < self.__max_window_chunks:
+                self.__adjust(self.__aggressiveness, min(self.__max_window_chunks, self.__window_chunks + WINDOW_STEP_CHUNKS))
+            else:
+                return
+            self.__STRICTER.inc()
+        elif self.__rejection_rate < self.LOOSER_BELOW:
+            if self.__window_chunks > self.__base_window_chunks:
+                self.__adjust(self.__aggressiveness, max(self.__base_window_chunks, self.__window_chunks - WINDOW_STEP_CHUNKS))
+            elif self.__aggressiveness > self.__base_aggressiveness:
+                self.__adjust(self.__aggressiveness - 1, self.__window_chunks)
+            else:
+                return
+            self.__LOOSER.inc()
+
+    def close(self) -> None:
+        """Remove the stream from the metrics."""
+        if not self.__closed:
+            self.__closed = True
+            self.__count_stream(-1)
+
+    def __adjust(self, aggressiveness: int, window_chunks: int) -> None:
+        self.__count_stream(-1)
+        self.__aggressiveness, self.__window_chunks = aggressiveness, window_chunks
+        self.__count_stream(1)
+        if self.__vad is not None:
+            self.__vad.set_aggressiveness(aggressiveness)
+        self.__checks = 0
+
+    def __count_stream(self, amount: int) -> None:
+        TUNED_STREAMS_BY_AGGRESSIVENESS.labels(str(self.__aggressiveness)).inc(amount)
+        TUNED_STREAMS_BY_DETECTION_WINDOW.labels(str(self.__window_chunks * self.__chunk_size_ms)).inc(amount)
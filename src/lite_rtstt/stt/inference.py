@@ -0,0 +1,290 @@
+"""A thread pool that runs model inference for coroutines."""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Sequence, TypeVar
+
+from lite_rtstt.cpu_plan import WorkerPlan, apply_worker_plan, get_torch_threads
+from lite_rtstt.metrics import INFERENCE_BATCH_SIZE, INFERENCE_CANCELLED, INFERENCE_QUEUE_DEPTH, INFERENCE_QUEUE_WAIT, INFERENCE_TIME, SHED_WORK
+from lite_rtstt.stt.errors import OverloadedError
+
+I = TypeVar("I")
+O = TypeVar("O")
+M = TypeVar("M")
+
+
+@dataclass(slots=True)
+class InferenceTiming:
+    """When one work item was queued, taken by a worker and finished, in `time.monotonic()` seconds."""
+    enqueued: float = 0.0
+    started: float | None = None
+    ended: float | None = None
+
+
+@dataclass(slots=True, eq=False)
+class InferenceWork(Generic[I, O]):
+    input: I
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future[O]
+    timing: InferenceTiming = field(default_factory=InferenceTiming)
+
+
+class Scheduler(ABC):
+    """Decides which queued work a free worker takes next.
+
+    The executor holds its lock around every call, so schedulers need no locking of their own.
+    """
+
+    @abstractmethod
+    def push(self, work: InferenceWork) -> None:
+        pass
+
+    @abstractmethod
+    def pop(self, count: int) -> list[InferenceWork]:
+        """Take up to `count` works for one batch. Only called while some work is queued."""
+        pass
+
+    @abstractmethod
+    def remove(self, work: InferenceWork) -> bool:
+        """Drop a work that is no longer wanted. Returns whether it was still queued."""
+        pass
+
+    @abstractmethod
+    def get_oldest_enqueued(self) -> float | None:
+        """`InferenceTiming.enqueued` of the work that has waited longest, None when empty."""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class FifoScheduler(Scheduler):
+    """First come, first served."""
+
+    def __init__(self) -> None:
+        self.__works: deque[InferenceWork] = deque()
+
+    def push(self, work: InferenceWork) -> None:
+        self.__works.append(work)
+
+    def pop(self, count: int) -> list[InferenceWork]:
+        return [self.__works.popleft() for _ in range(min(count, len(self.__works)))]
+
+    def remove(self, work: InferenceWork) -> bool:
+        try:
+            self.__works.remove(work)
+        except ValueError:
+            return False
+        return True
+
+    def get_oldest_enqueued(self) -> float | None:
+        return self.__works[0].timing.enqueued if self.__works else None
+
+    def __len__(self) -> int:
+        return len(self.__works)
+
+
+def _resolve(future: asyncio.Future, result: Any, error: BaseException | None) -> None:
+    # The awaiting coroutine may have been cancelled while the work ran.
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class InferenceExecutor(Generic[I, M, O]):
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        load: Callable[[int], M],
+        infer: Callable[[M, list[I]], list[O]],
+        scheduler: Scheduler | None = None,
+        max_batch_size: int = 1,
+        shed_after_s: float = 0.0,
+        cpu_plan: Sequence[WorkerPlan] | None = None,
+    ) -> None:
+        """Worker threads that each own a model and run work submitted from any event loop.
+
+        Args:
+            name: Model name, for thread names, metrics and errors.
+            workers: Number of worker threads, and so of models.
+            load: Loads and warms up the model of the worker with the given index, on that worker's thread.
+            infer: Runs a batch of inputs on a model and returns one output per input.
+            scheduler: Order of queued work. First come, first served by default.
+            max_batch_size: Most inputs given to one `infer` call. A worker takes what is queued, up to this many.
+            shed_after_s: Work that waited longer is failed with OverloadedError instead of run. 0 never sheds.
+            cpu_plan: CPU placement of each worker, applied before its model is loaded.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.__name = name
+        self.__load = load
+        self.__infer = infer
+        self.__scheduler = scheduler if scheduler is not None else FifoScheduler()
+        self.__max_batch_size = max_batch_size
+        self.__shed_after_s = shed_after_s
+        self.__cpu_plan = cpu_plan
+        self.__condition = threading.Condition()
+        self.__started = False
+        self.__closed = False
+        self.__threads = [threading.Thread(target=self.__worker, args=(i,), name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        self.__loaded = [concurrent.futures.Future() for _ in range(workers)]
+        self.__torch_threads: list[int | None] = [None] * workers
+        self.__queue_wait = INFERENCE_QUEUE_WAIT.labels(name)
+        self.__inference_time = INFERENCE_TIME.labels(name)
+        self.__batch_size = INFERENCE_BATCH_SIZE.labels(name)
+        self.__shed = SHED_WORK.labels(name)
+        self.__cancelled = INFERENCE_CANCELLED.labels(name)
+
+    def start(self) -> None:
+        """Start the workers and wait until every model is loaded. A model that fails to load fails the start."""
+        if self.__started:
+            return
+        for thread in self.__threads:
+            thread.start()
+        logging.debug(f"Waiting for {self.__name} models to be loaded.")
+        try:
+            for loaded in self.__loaded:
+                loaded.result()
+        except BaseException:
+            self.close()
+            raise
+        INFERENCE_QUEUE_DEPTH.labels(self.__name).set_function(self.get_queue_depth)
+        self.__started = True
+        if self.__cpu_plan is not None:
+            logging.info(f"{self.__name} workers run {', '.join(str(threads) for threads in self.__torch_threads)} torch threads.")
+        logging.debug(f"{self.__name} workers started.")
+
+    def close(self) -> None:
+        """Stop taking work, let the workers finish what is queued and wait for them."""
+        with self.__condition:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__condition.notify_all()
+        for thread in self.__threads:
+            if thread.is_alive():
+                thread.join()
+
+    def is_ready(self) -> bool:
+        return self.__started and not self.__closed
+
+    def get_torch_threads(self) -> list[int | None]:
+        """Torch thread count each worker ended up with after loading its model. None without a CPU plan."""
+        return list(self.__torch_threads)
+
+    def get_queue_depth(self) -> int:
+        """Number of works waiting for a worker."""
+        return len(self.__scheduler)
+
+    def get_queue_wait_ms(self) -> float:
+        """How long the oldest queued work has been waiting."""
+        with self.__condition:
+            oldest = self.__scheduler.get_oldest_enqueued()
+        return 0.0 if oldest is None else (time.monotonic() - oldest) * 1000
+
+    async def submit(self, input: I, timing: InferenceTiming | None = None) -> O:
+        """Run one input and return its output.
+
+        Cancelling the awaiting coroutine drops the work if no worker has taken it yet.
+
+        Args:
+            input: Input of `infer`.
+            timing: If given, filled in with the timing of this work.
+
+        Raises:
+            OverloadedError: If the work was shed.
+        """
+        if not self.__started:
+            raise RuntimeError(f"{self.__name} is not ready.")
+        loop = asyncio.get_running_loop()
+        work = InferenceWork(input, loop, loop.create_future(), timing if timing is not None else InferenceTiming())
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError(f"{self.__name} is closed.")
+            work.timing.enqueued = time.monotonic()
+            self.__scheduler.push(work)
+            self.__condition.notify()
+        try:
+            return await work.future
+        except asyncio.CancelledError:
+            with self.__condition:
+                removed = self.__scheduler.remove(work)
+            if removed:
+                self.__cancelled.inc()
+            raise
+
+    def __worker(self, index: int) -> None:
+        try:
+            if self.__cpu_plan is not None:
+                apply_worker_plan(self.__cpu_plan[index])
+            model = self.__load(index)
+            if self.__cpu_plan is not None:
+                self.__torch_threads[index] = threads = get_torch_threads()
+                if threads != self.__cpu_plan[index].torch_threads:
+                    logging.warning(f"{self.__name}-{index} runs {threads} torch threads instead of {self.__cpu_plan[index].torch_threads}.")
+        except BaseException as e:
+            self.__loaded[index].set_exception(e)
+            return
+        self.__loaded[index].set_result(None)
+        while True:
+            with self.__condition:
+                while not self.__scheduler and not self.__closed:
+                    self.__condition.wait()
+                if not self.__scheduler:
+                    # Closed and drained.
+                    return
+                works = self.__scheduler.pop(self.__max_batch_size)
+            self.__run(model, works)
+
+    def __run(self, model: M, works: list[InferenceWork]) -> None:
+        started = time.monotonic()
+        batch = []
+        for work in works:
+            waited = started - work.timing.enqueued
+            self.__queue_wait.observe(waited)
+            if work.future.cancelled():
+                # Cancelled after the worker took it; nobody waits for the answer.
+                self.__cancelled.inc()
+            elif self.__shed_after_s and waited > self.__shed_after_s:
+                # The stream has waited too long already; answering late only adds to the backlog.
+                self.__shed.inc()
+                self.__complete(work, None, OverloadedError(f"{self.__name.capitalize()} queue wait exceeded the shedding threshold."))
+            else:
+                work.timing.started = started
+                batch.append(work)
+        if not batch:
+            return
+        self.__batch_size.observe(len(batch))
+        try:
+            outputs = self.__infer(model, [work.input for work in batch])
+            if len(outputs) != len(batch):
+                raise RuntimeError(f"{self.__name} returned {len(outputs)} outputs for {len(batch)} inputs.")
+        except Exception as e:
+            for work in batch:
+                self.__complete(work, None, e)
+            return
+        ended = time.monotonic()
+        self.__inference_time.observe(ended - started)
+        for work, output in zip(batch, outputs):
+            # Published to the loop by call_soon_threadsafe.
+            work.timing.ended = ended
+            self.__complete(work, output, None)
+
+    @staticmethod
+    def __complete(work: InferenceWork, result: Any, error: BaseException | None) -> None:
+        try:
+            work.loop.call_soon_threadsafe(_resolve, work.future, result, error)
+        except RuntimeError:
+            # The loop that submitted the work is closed; nobody waits for the answer.
+            pass
@@ -0,0 +1,279 @@
+"""Silero and Whisper on remote inference workers (`lite-rtstt worker`).
+
+A pool keeps a few persistent connections to every worker and sends each request to the
+healthy worker with the shortest queue for the model: the depth the worker reported in its
+last response, or the requests this pool has waiting there if that is more. A background task pings every worker; a worker that does not
+answer in time is marked unhealthy and its connections are dropped, so requests waiting on
+it fail over to another worker.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from lite_rtstt.network.worker import (
+    KIND_PING,
+    KIND_SILERO,
+    KIND_WHISPER,
+    MODELS,
+    STATUS_OK,
+    STATUS_OVERLOADED,
+    read_frame,
+    write_frame,
+)
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.stt_client import STTClient
+from lite_rtstt.stt.vad_client import VADClient
+
+
+def parse_addresses(addresses: str) -> list[tuple[str, int]]:
+    """Parse `host:port,host:port`."""
+    parsed = []
+    for address in addresses.split(","):
+        host, _, port = address.strip().rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Invalid worker address: {address}")
+        parsed.append((host, int(port)))
+    return parsed
+
+
+class _WorkerConnection:
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.__writer = writer
+        self.__pending: dict[int, asyncio.Future] = {}
+        self.__next_id = 0
+        self.__receiver = asyncio.create_task(self.__receive(reader))
+
+    def is_closed(self) -> bool:
+        return self.__receiver.done()
+
+    def get_pending_count(self) -> int:
+        return len(self.__pending)
+
+    async def request(self, kind: int, payload: bytes) -> tuple[int, dict]:
+        if self.is_closed():
+            raise ConnectionError("The connection to the worker is closed.")
+        request_id = self.__next_id
+        self.__next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.__pending[request_id] = future
+        try:
+            write_frame(self.__writer, request_id, kind, payload)
+            await self.__writer.drain()
+            return await future
+        finally:
+            self.__pending.pop(request_id, None)
+
+    def close(self) -> None:
+        self.__receiver.cancel()
+        self.__writer.close()
+
+    async def __receive(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                request_id, status, payload = await read_frame(reader)
+                future = self.__pending.get(request_id)
+                if future is not None and not future.done():
+                    future.set_result((status, json.loads(payload)))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for future in self.__pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("The connection to the worker was lost."))
+            self.__writer.close()
+
+
+class _Worker:
+
+    def __init__(self, host: str, port: int, max_connections: int) -> None:
+        self.host = host
+        self.port = port
+        self.healthy = True
+        self.__max_connections = max_connections
+        self.__connections: list[_WorkerConnection] = []
+        self.__connecting: asyncio.Lock | None = None
+        self.__load: dict = {}
+        self.__in_flight = {model: 0 for model in MODELS.values()}
+
+    def get_score(self, model: str) -> float:
+        """Requests ahead of a new one. Our own in-flight requests are never stale, the report also counts other pools."""
+        return max(self.__load.get(model, 0), self.__in_flight[model])
+
+    async def request(self, kind: int, payload: bytes) -> dict:
+        model = MODELS.get(kind)
+        # Counted before the first await, so requests picked at the same time spread out.
+        if model is not None:
+            self.__in_flight[model] += 1
+        try:
+            connection = await self.__get_connection()
+            status, result = await connection.request(kind, payload)
+        finally:
+            if model is not None:
+                self.__in_flight[model] -= 1
+        self.__load = result.get("load", {})
+        if status == STATUS_OVERLOADED:
+            raise OverloadedError(result["error"])
+        if status != STATUS_OK:
+            raise RuntimeError(f"Worker {self.host}:{self.port} failed: {result['error']}")
+        return result
+
+    def close(self) -> None:
+        for connection in self.__connections:
+            connection.close()
+        self.__connections.clear()
+
+    async def __get_connection(self) -> _WorkerConnection:
+        connection = self.__pick_connection()
+        if connection is not None:
+            return connection
+        if self.__connecting is None:
+            self.__connecting = asyncio.Lock()
+        async with self.__connecting:
+            # Requests that queued on the lock find the connection the one before them opened.
+            connection = self.__pick_connection()
+            if connection is not None:
+                return connection
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            connection = _WorkerConnection(reader, writer)
+            self.__connections.append(connection)
+            return connection
+
+
+    def __pick_connection(self) -> _WorkerConnection | None:
+        """An idle connection, or the least busy one once no more may be opened. None if a new one should be opened."""
+        self.__connections = [connection for connection in self.__connections if not connection.is_closed()]
+        idle = [connection for connection in self.__connections if connection.get_pending_count() == 0]
+        if idle or len(self.__connections) >= self.__max_connections:
+            return min(idle or self.__connections, key=lambda connection: connection.get_pending_count())
+        return None
+
+
+class RemoteInferencePool:
+
+    def __init__(self, addresses: list[tuple[str, int]], connections_per_worker: int, health_interval_s: float) -> None:
+        """Balance requests over inference workers.
+
+        Args:
+            addresses: Host and port of every worker.
+            connections_per_worker: Most persistent connections kept to one worker.
+            health_interval_s: Period of the health check, which is also its timeout.
+        """
+        if not addresses:
+            raise ValueError("At least one worker address is required.")
+        self.__workers = [_Worker(host, port, connections_per_worker) for host, port in addresses]
+        self.__health_interval_s = health_interval_s
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        self.__health_task: asyncio.Task | None = None
+        self.__closed = False
+
+    def get_healthy_count(self) -> int:
+        return sum(worker.healthy for worker in self.__workers)
+
+    async def request(self, kind: int, payload: bytes) -> dict:
+        """Send a request to the least loaded healthy worker, failing over when one is lost.
+
+        Raises:
+            OverloadedError: If the worker shed the request or no worker is reachable.
+        """
+        if self.__closed:
+            raise RuntimeError("RemoteInferencePool is closed.")
+        if self.__health_task is None:
+            self.__loop = asyncio.get_running_loop()
+            self.__health_task = self.__loop.create_task(self.__check_health())
+        model = MODELS[kind]
+        tried = set()
+        while True:
+            candidates = [worker for worker in self.__workers if worker.healthy and worker not in tried]
+            if not candidates:
+                raise OverloadedError("No inference worker is reachable.")
+            worker = min(candidates, key=lambda candidate: candidate.get_score(model))
+            try:
+                return await worker.request(kind, payload)
+            except (ConnectionError, OSError) as e:
+                logging.warning(f"Inference worker {worker.host}:{worker.port} failed, trying another: {e}")
+                worker.healthy = False
+                worker.close()
+                tried.add(worker)
+
+    def close(self) -> None:
+        if self.__closed:
+            return
+        self.__closed = True
+        if self.__loop is None or self.__loop.is_closed():
+            return
+
+        def close_all():
+            self.__health_task.cancel()
+            for worker in self.__workers:
+                worker.close()
+
+        if self.__loop.is_running():
+            self.__loop.call_soon_threadsafe(close_all)
+        else:
+            close_all()
+
+    async def __check_health(self) -> None:
+        while True:
+            await asyncio.gather(*(self.__ping(worker) for worker in self.__workers))
+            await asyncio.sleep(self.__health_interval_s)
+
+    async def __ping(self, worker: _Worker) -> None:
+        try:
+            await asyncio.wait_for(worker.request(KIND_PING, b""), self.__health_interval_s)
+        except (ConnectionError, OSError, TimeoutError) as e:
+            if worker.healthy:
+                logging.warning(f"Inference worker {worker.host}:{worker.port} is unhealthy: {e!r}")
+            worker.healthy = False
+            # Requests stuck on a hung worker fail over once its connections are gone.
+            worker.close()
+            return
+        if not worker.healthy:
+            logging.info(f"Inference worker {worker.host}:{worker.port} is healthy again.")
+        worker.healthy = True
+
+
+class RemoteVADClient(VADClient):
+
+    def __init__(self, pool: RemoteInferencePool) -> None:
+        """Silero VAD on the workers of `pool`."""
+        self.__pool = pool
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.__pool.close()
+
+    def is_ready(self) -> bool:
+        return self.__pool.get_healthy_count() > 0
+
+    async def is_active(self, audio_buffer: AudioBuffer) -> bool:
+        return (await self.__pool.request(KIND_SILERO, audio_buffer.to_bytes()))["active"]
+
+
+class RemoteSTTClient(STTClient):
+
+    def __init__(self, pool: RemoteInferencePool) -> None:
+        """Whisper on the workers of `pool`."""
+        self.__pool = pool
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.__pool.close()
+
+    def is_ready(self) -> bool:
+        return self.__pool.get_healthy_count() > 0
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        result = await self.__pool.request(KIND_WHISPER, audio_buffer.to_bytes())
+        if timeline is not None and "inference_s" in result:
+            # Worker clocks are not comparable, so the inference is placed right before the answer.
+            timeline.stt_ended = time.monotonic()
+            timeline.stt_started = timeline.stt_ended - result["inference_s"]
+        return result["text"]
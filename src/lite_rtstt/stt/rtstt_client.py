@@ -1,16 +1,62 @@
 """An AudioToTextRecorder client."""
 import asyncio
+import math
 import random
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
-
+from itertools import product
+from typing import AsyncIterable, AsyncIterator
+
+from lite_rtstt.metrics import (
+    ENDPOINT_SAVED,
+    ENDPOINT_SPLITS,
+    ENDPOINTS,
+    HIBERNATING_STREAMS,
+    REJECTED_CONNECTIONS,
+    SPEECH_END_TO_TEXT,
+    STATE_TRANSITIONS,
+    VAD_CHECKS,
+)
+from lite_rtstt.process_stats import get_rss_bytes
 from lite_rtstt.stt.audio_buffer import AudioBuffer
 from lite_rtstt.stt.config import STTConfig
-from lite_rtstt.stt.event import STTEventQueue, SimpleSTTEventQueue, EventFactory, STTEvent
+from lite_rtstt.stt.endpointing import Endpointer, EndpointingMode
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import (
+    BoundedSTTEventQueue,
+    EventFactory,
+    SimpleSTTEventQueue,
+    SlowConsumerPolicy,
+    STTEvent,
+    STTEventQueue,
+    UtteranceTimeline,
+)
+from lite_rtstt.stt.gate_tuning import GateTuner
 from lite_rtstt.stt.stt_client import STTClient
 from lite_rtstt.stt.vad_client import VADClient
 
 
+def start_clients(*clients: VADClient | STTClient) -> None:
+    """Start clients concurrently, so that their models load in parallel."""
+    with ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix="start") as executor:
+        for future in [executor.submit(client.start) for client in clients]:
+            future.result()
+
+
+@dataclass(frozen=True)
+class TranscriptionSegment:
+    """A transcribed speech segment of a finite stream."""
+    index: int
+    start_ms: int
+    end_ms: int
+    text: str
+
+
 class RTSTTClient(ABC):
     """A real-time speech to text service."""
 
@@ -23,12 +69,19 @@ class RTSTTClient(ABC):
     def close(self):
         pass
 
+    def is_ready(self) -> bool:
+        """Can the service take streams right now? Services that are ready once started always are."""
+        return True
+
     @abstractmethod
     def connect(self) -> tuple[STTEventQueue, int]:
         """Connect to the stt service.
 
         Returns:
             tuple[STTEventQueue, int]: An event queue and the connection id.
+
+        Raises:
+            OverloadedError: If the service is saturated and admits no new streams.
         """
         pass
 
@@ -46,6 +99,29 @@ class RTSTTClient(ABC):
         """
         pass
 
+    async def flush(self, connection_id: int) -> None:
+        """End the stream of a connection: transcribe speech that is still buffered and queue its events.
+
+        Services that buffer nothing have nothing to flush.
+        """
+        pass
+
+    @abstractmethod
+    def transcribe(self, audio: AsyncIterable[bytes], max_pending: int | None = None) -> AsyncIterator[TranscriptionSegment]:
+        """Segment and transcribe a finite stream as fast as the layers allow.
+
+        Segments are yielded as soon as their transcription finishes, so they may arrive out of order.
+
+        Args:
+            audio (AsyncIterable[bytes]): Audio chunks of `chunk_size_ms`.
+            max_pending (int | None): Stop reading audio while this many segments are being transcribed.
+
+        Raises:
+            OverloadedError: If the service is saturated and admits no new streams. Raised by the call itself,
+                before the first segment is awaited.
+        """
+        pass
+
 
 class MockRTSTTClient(RTSTTClient):
 
@@ -54,11 +130,15 @@ class MockRTSTTClient(RTSTTClient):
         self.__closed = False
         self.__results: dict[int, asyncio.Queue[STTEvent]] = {}
         self.__queues: dict[int, STTEventQueue] = {}
+        self.__segments: list[TranscriptionSegment] = []
 
     async def append_results(self, connection_id: int, *results: STTEvent):
         for result in results:
             await self.__results[connection_id].put(result)
 
+    def append_segments(self, *segments: TranscriptionSegment):
+        self.__segments.extend(segments)
+
     def start(self) -> None:
         self.__started = True
 
@@ -99,6 +179,16 @@ class MockRTSTTClient(RTSTTClient):
         queue = self.__queues.get(connection_id)
         await queue.put(result)
 
+    async def transcribe(self, audio: AsyncIterable[bytes], max_pending: int | None = None) -> AsyncIterator[TranscriptionSegment]:
+        if not self.__started:
+            raise RuntimeError("MockRTSTTClient is not started.")
+        if self.__closed:
+            raise RuntimeError("MockRTSTTClient is closed.")
+        async for _ in audio:
+            pass
+        while self.__segments:
+            yield self.__segments.pop(0)
+
 
 class ThreeLayerRTSTTClient(RTSTTClient):
 
@@ -110,6 +200,31 @@ class ThreeLayerRTSTTClient(RTSTTClient):
             SILENCE = 0
             ACTIVE = 1
             SPEAKING = 2
+            # Silent for so long that the buffers were dropped.
+            HIBERNATING = 3
+
+        # A server holds one per connection, most of them silent, so the state has no __dict__.
+        __slots__ = (
+            "__audio_buffer", "__state", "__silence_chunks", "__first_vad_client", "__second_vad_client",
+            "__stt_client", "__max_silence_chunks", "__min_active_to_detection_chunks", "__max_buffered_chunks",
+            "__timeline", "__last_timeline", "__endpointer", "__gate_tuner", "__active_chunks", "__chunk_size_s",
+            "__pause_chunks", "__chunks_since_cut", "__active_since_cut", "__cut_slack_chunks", "__cut_pause_chunks",
+            "__pre_roll_chunks", "__hibernate_after_chunks", "__idle_chunks",
+        )
+
+        # Metric children are looked up once, so feed only pays for the increments.
+        __TRANSITIONS = {
+            (old, new): STATE_TRANSITIONS.labels(old.name.lower(), new.name.lower())
+            for old, new in product(State, State) if old != new
+        }
+        __LAYER1_PASS = VAD_CHECKS.labels("1", "pass")
+        __LAYER1_REJECT = VAD_CHECKS.labels("1", "reject")
+        __LAYER2_PASS = VAD_CHECKS.labels("2", "pass")
+        __LAYER2_REJECT = VAD_CHECKS.labels("2", "reject")
+        __SILENCE_ENDPOINT = ENDPOINTS.labels("silence")
+        __EARLY_ENDPOINT = ENDPOINTS.labels("early")
+        __MAX_BUFFER_ENDPOINT = ENDPOINTS.labels("max_buffer")
+        __HIBERNATING = HIBERNATING_STREAMS.labels()
 
         def __init__(
             self,
@@ -119,7 +234,18 @@ class ThreeLayerRTSTTClient(RTSTTClient):
             max_silence_chunks: int,
             min_active_to_detection_chunks: int,
             max_buffer_chunks: int,
+            endpointer: Endpointer | None = None,
+            chunk_size_ms: int = 30,
+            gate_tuner: GateTuner | None = None,
+            pre_roll_chunks: int = 0,
+            hibernate_after_chunks: int = 0,
         ) -> None:
+            """Args:
+                endpointer: Ends utterances early once a pause outlasts the speaker's usual pauses. Fixed timeout if None.
+                gate_tuner: Tunes the detection window and layer 1 of this stream. Fixed gate if None.
+                pre_roll_chunks: Silent chunks kept ahead of an utterance. All of them if 0.
+                hibernate_after_chunks: Silent chunks after which the stream drops its buffers. Never if 0.
+            """
             self.__audio_buffer = AudioBuffer()
             self.__state = self.State.SILENCE
             self.__silence_chunks = 0
@@ -129,48 +255,152 @@ class ThreeLayerRTSTTClient(RTSTTClient):
             self.__max_silence_chunks = max_silence_chunks
             self.__min_active_to_detection_chunks = min_active_to_detection_chunks
             self.__max_buffered_chunks = max_buffer_chunks
+            self.__timeline = UtteranceTimeline()
+            self.__last_timeline = self.__timeline
+            self.__endpointer = endpointer
+            self.__gate_tuner = gate_tuner
+            self.__active_chunks = 0
+            self.__chunk_size_s = chunk_size_ms / 1000
+            # Consecutive silent chunks, unlike __silence_chunks which adds up every pause of the utterance.
+            self.__pause_chunks = 0
+            # After an early cut: chunks fed since, the chunk layer 1 went active at, how many more
+            # chunks the fixed timeout would have waited and the pause that was cut.
+            self.__chunks_since_cut = 0
+            self.__active_since_cut = 0
+            self.__cut_slack_chunks = 0
+            self.__cut_pause_chunks = 0
+            self.__pre_roll_chunks = pre_roll_chunks
+            self.__hibernate_after_chunks = hibernate_after_chunks
+            # Consecutive chunks layer 1 rejected in silence.
+            self.__idle_chunks = 0
 
         async def __feed_from_silence(self, new_buffer: AudioBuffer):
+            received = time.monotonic()
             is_active = await self.__first_vad_client.is_active(new_buffer)
             if is_active:
+                self.__LAYER1_PASS.inc()
+                if self.__state == self.State.HIBERNATING:
+                    self.__wake(new_buffer)
                 self.__state = self.State.ACTIVE
+                self.__active_chunks = 1
+                self.__idle_chunks = 0
+                self.__active_since_cut = self.__chunks_since_cut
+                self.__timeline.first_chunk = received
+                self.__timeline.layer1_active = time.monotonic()
+            else:
+                self.__LAYER1_REJECT.inc()
+                if self.__state == self.State.SILENCE:
+                    self.__idle_chunks += 1
+                    if self.__hibernate_after_chunks and self.__idle_chunks >= self.__hibernate_after_chunks:
+                        self.__hibernate()
+                    elif self.__pre_roll_chunks:
+                        self.__audio_buffer.keep_last(self.__pre_roll_chunks)
+
+        def __hibernate(self) -> None:
+            """Drop everything a silent stream does not need to notice voice."""
+            self.__audio_buffer = None
+            self.__timeline = None
+            self.__last_timeline = None
+            # Speech after this long a silence is a new utterance, whatever the fixed timeout says.
+            self.__cut_slack_chunks = 0
+            self.__state = self.State.HIBERNATING
+            self.__HIBERNATING.inc()
+
+        def __wake(self, new_buffer: AudioBuffer) -> None:
+            # The chunk that woke the stream starts the utterance.
+            self.__audio_buffer = new_buffer
+            self.__timeline = UtteranceTimeline()
+            self.__HIBERNATING.dec()
 
         async def __feed_from_active(self):
-            if self.__audio_buffer.get_chunks_count() >= self.__min_active_to_detection_chunks:
+            self.__active_chunks += 1
+            window = self.__gate_tuner.get_window_chunks() if self.__gate_tuner is not None else self.__min_active_to_detection_chunks
+            if self.__active_chunks >= window:
                 is_speaking = await self.__second_vad_client.is_active(self.__audio_buffer)
+                if self.__gate_tuner is not None:
+                    self.__gate_tuner.record(not is_speaking)
                 if is_speaking:
+                    self.__LAYER2_PASS.inc()
+                    self.__check_split()
                     self.__state = self.State.SPEAKING
+                    self.__timeline.silero_confirmed = self.__timeline.speech_end = time.monotonic()
                 else:
+                    self.__LAYER2_REJECT.inc()
                     self.__state = self.State.SILENCE
                     self.__audio_buffer = AudioBuffer()
+                    self.__timeline = UtteranceTimeline()
 
         async def __feed_from_speaking(self, new_buffer: AudioBuffer) -> asyncio.Task[str] | None:
             is_active = await self.__first_vad_client.is_active(new_buffer)
             if not is_active:
                 self.__silence_chunks += 1
+                self.__pause_chunks += 1
                 if self.__silence_chunks >= self.__max_silence_chunks:
-                    audio_buffer = self.__audio_buffer
-                    self.__audio_buffer = AudioBuffer()
-                    self.__state = self.State.SILENCE
-                    self.__silence_chunks = 0
-                    task = asyncio.create_task(self.__stt_client.transcribe(audio_buffer))
-                    return task
-            elif self.__audio_buffer.get_chunks_count() >= self.__max_buffered_chunks:
-                audio_buffer = self.__audio_buffer
-                self.__audio_buffer = AudioBuffer()
-                self.__state = self.State.SILENCE
-                self.__silence_chunks = 0
-                task = asyncio.create_task(self.__stt_client.transcribe(audio_buffer))
-                return task
+                    self.__SILENCE_ENDPOINT.inc()
+                    return self.__hand_off()
+                if self.__endpointer is not None and self.__pause_chunks == self.__endpointer.get_timeout_chunks() and await self.__is_pause_silent():
+                    self.__EARLY_ENDPOINT.inc()
+                    remaining = self.__max_silence_chunks - self.__silence_chunks
+                    ENDPOINT_SAVED.inc(remaining * self.__chunk_size_s)
+                    self.__chunks_since_cut, self.__cut_slack_chunks, self.__cut_pause_chunks = 0, remaining, self.__pause_chunks
+                    return self.__hand_off()
+                return None
+            if self.__endpointer is not None and self.__pause_chunks:
+                self.__endpointer.add_pause(self.__pause_chunks)
+            self.__pause_chunks = 0
+            self.__timeline.speech_end = time.monotonic()
+            if self.__audio_buffer.get_chunks_count() >= self.__max_buffered_chunks:
+                self.__MAX_BUFFER_ENDPOINT.inc()
+                return self.__hand_off()
             return None
 
+        async def __is_pause_silent(self) -> bool:
+            """Does Silero agree that the current pause holds no speech?"""
+            count = self.__audio_buffer.get_chunks_count()
+            pause = AudioBuffer()
+            for i in range(count - self.__pause_chunks, count):
+                pause.append(self.__audio_buffer.get_chunk(i))
+            try:
+                return not await self.__second_vad_client.is_active(pause)
+            except OverloadedError:
+                # Without an answer the fixed timeout decides, which loses nothing.
+                return False
+
+        def __check_split(self) -> None:
+            """Count a split if this utterance starts before the fixed timeout would have ended the previous one."""
+            if self.__cut_slack_chunks:
+                resumed_after = self.__active_since_cut - 1
+                if resumed_after < self.__cut_slack_chunks:
+                    ENDPOINT_SPLITS.inc()
+                    # It was a pause after all; later timeouts account for it.
+                    self.__endpointer.add_pause(self.__cut_pause_chunks + resumed_after)
+                self.__cut_slack_chunks = 0
+
+        def __hand_off(self) -> asyncio.Task[str]:
+            """Send the buffered utterance to the STT client and start over in silence."""
+            audio_buffer, timeline = self.__audio_buffer, self.__timeline
+            self.__audio_buffer = AudioBuffer()
+            self.__timeline = UtteranceTimeline()
+            self.__last_timeline = timeline
+            self.__state = self.State.SILENCE
+            self.__silence_chunks = 0
+            self.__pause_chunks = 0
+            timeline.stt_enqueued = time.monotonic()
+            return asyncio.create_task(self.__stt_client.transcribe(audio_buffer, timeline))
+
         async def feed(self, audio: bytes) -> tuple['ThreeLayerRTSTTClient.AudioStreamStateMachine.State', 'ThreeLayerRTSTTClient.AudioStreamStateMachine.State', asyncio.Task[str] | None]:
             """Return (old state, new state, transcription task)"""
             current_state = self.__state
             new_buffer = AudioBuffer.from_bytes(audio)
-            self.__audio_buffer.append(audio)
+            if self.__state != self.State.HIBERNATING:
+                self.__audio_buffer.append(audio)
+            if self.__cut_slack_chunks:
+                self.__chunks_since_cut += 1
+                if self.__state == self.State.SILENCE and self.__chunks_since_cut > self.__cut_slack_chunks:
+                    # The fixed timeout would have ended the utterance too.
+                    self.__cut_slack_chunks = 0
             task = None
-            if self.__state == self.State.SILENCE:
+            if self.__state == self.State.SILENCE or self.__state == self.State.HIBERNATING:
                 await self.__feed_from_silence(new_buffer)
             elif self.__state == self.State.ACTIVE:
                 await self.__feed_from_active()
@@ -178,8 +408,46 @@ class ThreeLayerRTSTTClient(RTSTTClient):
                 task = await self.__feed_from_speaking(new_buffer)
             else:
                 raise RuntimeError(f"Undefined audio stream state {self.__state}")
+            if self.__state != current_state:
+                self.__TRANSITIONS[current_state, self.__state].inc()
             return current_state, self.__state, task
 
+        def reset(self) -> None:
+            """Drop the buffered audio and start over in silence."""
+            if self.__state == self.State.HIBERNATING:
+                self.__HIBERNATING.dec()
+            self.__audio_buffer = AudioBuffer()
+            self.__timeline = UtteranceTimeline()
+            self.__state = self.State.SILENCE
+            self.__silence_chunks = 0
+            self.__pause_chunks = 0
+            self.__idle_chunks = 0
+
+        def close(self) -> None:
+            """Release the per-stream resources."""
+            if self.__state == self.State.HIBERNATING:
+                self.__HIBERNATING.dec()
+                self.__state = self.State.SILENCE
+            if self.__gate_tuner is not None:
+                self.__gate_tuner.close()
+
+        def get_last_timeline(self) -> UtteranceTimeline:
+            """Timeline of the utterance most recently handed to the STT client."""
+            return self.__last_timeline
+
+        async def flush(self) -> tuple['ThreeLayerRTSTTClient.AudioStreamStateMachine.State', 'ThreeLayerRTSTTClient.AudioStreamStateMachine.State', asyncio.Task[str] | None]:
+            """End the stream. Return (old state, new state, transcription task for speech that is still buffered)."""
+            current_state = state = self.__state
+            if state == self.State.ACTIVE:
+                if await self.__second_vad_client.is_active(self.__audio_buffer):
+                    self.__timeline.silero_confirmed = self.__timeline.speech_end = time.monotonic()
+                else:
+                    state = self.State.SILENCE
+            if state == self.State.SILENCE or state == self.State.HIBERNATING:
+                self.reset()
+                return current_state, self.__state, None
+            return current_state, self.__state, self.__hand_off()
+
     def __init__(
         self,
         config: STTConfig,
@@ -198,45 +466,114 @@ class ThreeLayerRTSTTClient(RTSTTClient):
         self.__first_vad_client = first_vad_client
         self.__second_vad_client = second_vad_client
         self.__stt_client = stt_client
+        # Event loop threads connect and disconnect concurrently (`run --loops`); admission and
+        # registration must happen as one step. Each stream is then only used by its own loop.
+        self.__connections_lock = threading.Lock()
         self.__state_machines: dict[int, "ThreeLayerRTSTTClient.AudioStreamStateMachine"] = {}
-        self.__queues: dict[int, SimpleSTTEventQueue] = {}
+        # Streams of `transcribe`, which count against the same limits as connections.
+        self.__batch_streams: set[object] = set()
+        self.__queues: dict[int, STTEventQueue] = {}
         self.__increasing_id = 0
         self.__max_silence_chunks = int(config.duration_time_ms / config.chunk_size_ms)
         self.__min_active_to_detection_chunks = int(config.active_to_detection_ms / config.chunk_size_ms)
         self.__max_buffered_chunks = config.max_buffered_chunks
+        self.__chunk_size_ms = config.chunk_size_ms
+        self.__max_streams = config.max_streams
+        self.__admission_queue_wait_ms = config.admission_queue_wait_ms
+        self.__memory_budget_bytes = config.memory_budget_mb * 1024 * 1024
+        self.__event_queue_size = config.event_queue_size
+        self.__slow_consumer_policy = SlowConsumerPolicy(config.slow_consumer_policy)
+        self.__adaptive_endpointing = EndpointingMode(config.endpointing) == EndpointingMode.ADAPTIVE
+        self.__endpointing_floor_chunks = max(1, config.endpointing_floor_ms // config.chunk_size_ms)
+        self.__gate_tuning = config.gate_tuning
+        self.__aggressiveness = config.aggresiveness
+        self.__max_aggressiveness = min(3, config.max_aggresiveness)
+        self.__max_active_to_detection_chunks = int(config.max_active_to_detection_ms / config.chunk_size_ms)
+        self.__pre_roll_chunks = math.ceil(config.pre_roll_ms / config.chunk_size_ms)
+        self.__hibernate_after_chunks = math.ceil(config.hibernate_after_ms / config.chunk_size_ms)
+
+    def __create_state_machine(self) -> "ThreeLayerRTSTTClient.AudioStreamStateMachine":
+        first_vad_client = self.__first_vad_client.create_stream()
+        gate_tuner = None
+        if self.__gate_tuning:
+            gate_tuner = GateTuner(
+                first_vad_client if first_vad_client.is_tunable() else None,
+                self.__aggressiveness,
+                self.__max_aggressiveness,
+                self.__min_active_to_detection_chunks,
+                self.__max_active_to_detection_chunks,
+                self.__chunk_size_ms,
+            )
+        return self.AudioStreamStateMachine(
+            first_vad_client,
+            self.__second_vad_client,
+            self.__stt_client,
+            self.__max_silence_chunks,
+            self.__min_active_to_detection_chunks,
+            self.__max_buffered_chunks,
+            Endpointer(self.__endpointing_floor_chunks, self.__max_silence_chunks) if self.__adaptive_endpointing else None,
+            self.__chunk_size_ms,
+            gate_tuner,
+            self.__pre_roll_chunks,
+            self.__hibernate_after_chunks,
+        )
 
     def start(self):
         if not self.__started:
-            self.__first_vad_client.start()
-            self.__second_vad_client.start()
-            self.__stt_client.start()
+            start_clients(self.__first_vad_client, self.__second_vad_client, self.__stt_client)
             self.__started = True
 
+    def is_ready(self) -> bool:
+        return self.__started and all(
+            client.is_ready() for client in (self.__first_vad_client, self.__second_vad_client, self.__stt_client)
+        )
+
     def connect(self) -> tuple[STTEventQueue, int]:
         if not self.__started:
             raise RuntimeError("ThreeLayerRTSTTClient is not started.")
         if self.__closed:
             raise RuntimeError("ThreeLayerRTSTTClient is closed.")
-        connection_id = self.__increasing_id
-        self.__increasing_id += 1
-        self.__state_machines[connection_id] = self.AudioStreamStateMachine(
-            self.__first_vad_client,
-            self.__second_vad_client,
-            self.__stt_client,
-            self.__max_silence_chunks,
-            self.__min_active_to_detection_chunks,
-            self.__max_buffered_chunks
-        )
-        self.__queues[connection_id] = SimpleSTTEventQueue()
-        return self.__queues[connection_id], connection_id
+        if self.__event_queue_size:
+            queue = BoundedSTTEventQueue(self.__event_queue_size, self.__slow_consumer_policy)
+        else:
+            queue = SimpleSTTEventQueue()
+        with self.__connections_lock:
+            self.__admit()
+            connection_id = self.__increasing_id
+            self.__increasing_id += 1
+            self.__state_machines[connection_id] = self.__create_state_machine()
+            self.__queues[connection_id] = queue
+        return queue, connection_id
+
+    def get_queue_wait_ms(self) -> float:
+        """Wait of the oldest work queued for layer 2 or layer 3."""
+        return max(self.__second_vad_client.get_queue_wait_ms(), self.__stt_client.get_queue_wait_ms())
+
+    def __admit(self) -> None:
+        """Raise OverloadedError if a new stream would exceed a limit. A limit of 0 is off."""
+        if not self.is_ready():
+            REJECTED_CONNECTIONS.labels("not_ready").inc()
+            raise OverloadedError("The models are still loading.")
+        if self.__max_streams and len(self.__state_machines) + len(self.__batch_streams) >= self.__max_streams:
+            REJECTED_CONNECTIONS.labels("max_streams").inc()
+            raise OverloadedError(f"The server serves the maximum of {self.__max_streams} streams.")
+        queue_wait_ms = self.get_queue_wait_ms()
+        if self.__admission_queue_wait_ms and queue_wait_ms >= self.__admission_queue_wait_ms:
+            REJECTED_CONNECTIONS.labels("queue_wait").inc()
+            raise OverloadedError(f"Inference queues are {queue_wait_ms:.0f} ms behind.", max(1.0, queue_wait_ms / 1000))
+        if self.__memory_budget_bytes and get_rss_bytes() >= self.__memory_budget_bytes:
+            REJECTED_CONNECTIONS.labels("memory").inc()
+            raise OverloadedError("The server is over its memory budget.")
 
     def disconnect(self, connection_id: int) -> None:
         if not self.__started:
             raise RuntimeError("ThreeLayerRTSTTClient is not started.")
-        if self.__state_machines.get(connection_id) is None:
-            raise KeyError("Connection id not found.")
-        self.__state_machines.pop(connection_id, None)
-        self.__queues.pop(connection_id, None)
+        with self.__connections_lock:
+            state_machine = self.__state_machines.pop(connection_id, None)
+            if state_machine is None:
+                raise KeyError("Connection id not found.")
+            self.__queues.pop(connection_id, None)
+        state_machine.close()
 
     async def feed(self, connection_id: int, audio: bytes):
         if not self.__started:
@@ -244,13 +581,111 @@ class ThreeLayerRTSTTClient(RTSTTClient):
         if self.__closed:
             raise RuntimeError("ThreeLayerRTSTTClient is closed")
         state_machine = self.__state_machines[connection_id]
-        old_state, new_state, task = await state_machine.feed(audio)
-        if old_state == self.AudioStreamStateMachine.State.ACTIVE and new_state == self.AudioStreamStateMachine.State.SPEAKING:
-            await self.__queues[connection_id].put(EventFactory.start_speaking_event())
-        elif old_state == self.AudioStreamStateMachine.State.SPEAKING and new_state == self.AudioStreamStateMachine.State.SILENCE:
-            await self.__queues[connection_id].put(EventFactory.stop_speaking_event())
+        try:
+            old_state, new_state, task = await state_machine.feed(audio)
+        except OverloadedError as e:
+            # Layer 2 shed the buffer; the stream starts over instead of stalling.
+            state_machine.reset()
+            await self.__queues[connection_id].put(EventFactory.overload_event(str(e)))
+            return
+        await self.__emit(self.__queues[connection_id], state_machine, old_state, new_state, task)
+
+    async def flush(self, connection_id: int) -> None:
+        if not self.__started:
+            raise RuntimeError("ThreeLayerRTSTTClient is not started")
+        state_machine = self.__state_machines[connection_id]
+        try:
+            old_state, new_state, task = await state_machine.flush()
+        except OverloadedError as e:
+            state_machine.reset()
+            await self.__queues[connection_id].put(EventFactory.overload_event(str(e)))
+            return
+        await self.__emit(self.__queues[connection_id], state_machine, old_state, new_state, task)
+
+    async def __emit(
+        self,
+        queue: STTEventQueue,
+        state_machine: "ThreeLayerRTSTTClient.AudioStreamStateMachine",
+        old_state: "ThreeLayerRTSTTClient.AudioStreamStateMachine.State",
+        new_state: "ThreeLayerRTSTTClient.AudioStreamStateMachine.State",
+        task: asyncio.Task[str] | None,
+    ) -> None:
+        """Queue the events of a state change. A transcription task means an utterance just ended."""
+        State = self.AudioStreamStateMachine.State
+        # A flush hands off speech that layer 2 only confirmed at the end of the stream.
+        if old_state == State.ACTIVE and (new_state == State.SPEAKING or task is not None):
+            await queue.put(EventFactory.start_speaking_event())
+        if task is None:
+            return
+        await queue.put(EventFactory.stop_speaking_event())
+        timeline = state_machine.get_last_timeline()
+        try:
             text = await task
-            await self.__queues[connection_id].put(EventFactory.text_event(text))
+        except OverloadedError as e:
+            await queue.put(EventFactory.overload_event(str(e)))
+            return
+        timeline.event_emitted = time.monotonic()
+        await queue.put(EventFactory.text_event(text, timeline))
+        SPEECH_END_TO_TEXT.observe(timeline.event_emitted - timeline.speech_end)
+
+    def transcribe(self, audio: AsyncIterable[bytes], max_pending: int | None = None) -> AsyncIterator[TranscriptionSegment]:
+        if not self.__started:
+            raise RuntimeError("ThreeLayerRTSTTClient is not started")
+        if self.__closed:
+            raise RuntimeError("ThreeLayerRTSTTClient is closed")
+        stream = object()
+        with self.__connections_lock:
+            self.__admit()
+            self.__batch_streams.add(stream)
+        segments = self.__transcribe(audio, max_pending, stream)
+        # An iterator dropped before its first step never runs its finally block.
+        weakref.finalize(segments, self.__batch_streams.discard, stream)
+        return segments
+
+    async def __transcribe(self, audio: AsyncIterable[bytes], max_pending: int | None, stream: object) -> AsyncIterator[TranscriptionSegment]:
+        State = self.AudioStreamStateMachine.State
+        state_machine = self.__create_state_machine()
+        pending: set[asyncio.Task[TranscriptionSegment]] = set()
+        segment_count = 0
+        chunk_index = 0
+        segment_start = 0
+
+        async def segment(index: int, start: int, end: int, task: asyncio.Task[str]) -> TranscriptionSegment:
+            return TranscriptionSegment(index, start * self.__chunk_size_ms, end * self.__chunk_size_ms, await task)
+
+        def submit(task: asyncio.Task[str]) -> None:
+            nonlocal segment_count
+            pending.add(asyncio.create_task(segment(segment_count, segment_start, chunk_index, task)))
+            segment_count += 1
+
+        try:
+            # Unlike feed, transcriptions are not awaited here, so segmentation keeps running
+            # while earlier segments wait for or occupy the STT workers.
+            async for chunk in audio:
+                old_state, new_state, task = await state_machine.feed(chunk)
+                chunk_index += 1
+                if old_state != State.ACTIVE and new_state == State.ACTIVE:
+                    segment_start = chunk_index - 1
+                if task is not None:
+                    submit(task)
+                while max_pending is not None and len(pending) >= max_pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for finished in done:
+                        pending.remove(finished)
+                        yield finished.result()
+                for done in [pending_task for pending_task in pending if pending_task.done()]:
+                    pending.remove(done)
+                    yield done.result()
+            _, _, task = await state_machine.flush()
+            if task is not None:
+                submit(task)
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            self.__batch_streams.discard(stream)
+            state_machine.close()
+            for pending_task in pending:
+                pending_task.cancel()
 
     def close(self):
         if not self.__closed:
@@ -0,0 +1,288 @@
+"""Silero and Whisper in another process, fed through shared memory.
+
+A front-end process writes the audio of every request into its shared-memory ring and sends
+only the offset and length over a pipe. The inference process reads the audio straight out of
+the ring, so audio is never pickled and every front-end shares one copy of the models.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.stt_client import STTClient
+from lite_rtstt.stt.vad_client import VADClient
+
+SILERO = "silero"
+WHISPER = "whisper"
+
+_OK = "ok"
+_READY = "ready"
+_OVERLOADED = "overloaded"
+_ERROR = "error"
+
+
+class SharedAudioRing:
+
+    def __init__(self, size: int) -> None:
+        """Allocate regions of a buffer of `size` bytes in ring order.
+
+        Regions may be released in any order. The space of a region is reused once every
+        region allocated before it is released too.
+        """
+        self.__size = size
+        self.__head = 0
+        # Insertion order is ring order, so the first region is the oldest one still in use.
+        self.__regions: dict[int, int] = {}
+
+    def allocate(self, length: int) -> int | None:
+        """Return the offset of `length` free bytes, or None when the ring has no room."""
+        length = max(length, 1)
+        if length > self.__size:
+            return None
+        if not self.__regions:
+            offset = 0
+        else:
+            tail = next(iter(self.__regions))
+            if self.__head > tail:
+                if self.__head + length <= self.__size:
+                    offset = self.__head
+                elif length <= tail:
+                    offset = 0
+                else:
+                    return None
+            elif self.__head + length <= tail:
+                offset = self.__head
+            else:
+                return None
+        self.__regions[offset] = length
+        self.__head = offset + length
+        return offset
+
+    def release(self, offset: int) -> None:
+        del self.__regions[offset]
+
+
+class InferenceChannel:
+
+    @dataclass
+    class Request:
+        model: str
+        offset: int
+        sent_at: float
+        future: asyncio.Future
+
+    def __init__(self, connection: Connection, memory: SharedMemory) -> None:
+        """The front-end end of a pipe to the inference process, with its shared-memory ring.
+
+        Args:
+            connection: Pipe end to send requests and receive responses on.
+            memory: Shared memory the inference process reads the audio from.
+        """
+        self.__connection = connection
+        self.__memory = memory
+        self.__ring = SharedAudioRing(memory.size)
+        self.__requests: dict[int, InferenceChannel.Request] = {}
+        self.__next_id = 0
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        self.__ready = False
+        self.__closed = False
+
+    def is_ready(self) -> bool:
+        """Has the inference process loaded its models?"""
+        if not self.__ready and self.__loop is None and not self.__closed:
+            # Before the first request nobody reads the pipe, and the only message on it is the ready one.
+            self.__receive()
+        return self.__ready
+
+    async def request(self, model: str, audio_buffer: AudioBuffer):
+        if self.__closed:
+            raise RuntimeError("InferenceChannel is closed.")
+        if self.__loop is None:
+            self.__loop = asyncio.get_running_loop()
+            self.__loop.add_reader(self.__connection.fileno(), self.__receive)
+        chunks = [audio_buffer.get_chunk(i) for i in range(audio_buffer.get_chunks_count())]
+        length = sum(len(chunk) for chunk in chunks)
+        offset = self.__ring.allocate(length)
+        if offset is None:
+            raise OverloadedError("The shared audio ring of this worker is full.")
+        position = offset
+        for chunk in chunks:
+            self.__memory.buf[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        request_id = self.__next_id
+        self.__next_id += 1
+        request = self.Request(model, offset, time.monotonic(), self.__loop.create_future())
+        self.__requests[request_id] = request
+        self.__connection.send((request_id, model, offset, length))
+        return await request.future
+
+    def get_queue_wait_ms(self, model: str) -> float:
+        """Age of the oldest unanswered request for `model`."""
+        sent_at = [request.sent_at for request in self.__requests.values() if request.model == model]
+        return (time.monotonic() - min(sent_at)) * 1000 if sent_at else 0.0
+
+    def __receive(self) -> None:
+        while self.__connection.poll():
+            try:
+                request_id, status, result = self.__connection.recv()
+            except (EOFError, OSError):
+                self.__fail("The inference process exited.")
+                return
+            if status == _READY:
+                self.__ready = True
+                continue
+            request = self.__requests.pop(request_id)
+            self.__ring.release(request.offset)
+            if request.future.done():
+                continue
+            if status == _OK:
+                request.future.set_result(result)
+            elif status == _OVERLOADED:
+                request.future.set_exception(OverloadedError(result))
+            else:
+                request.future.set_exception(RuntimeError(result))
+
+    def __fail(self, message: str) -> None:
+        if self.__loop is not None:
+            self.__loop.remove_reader(self.__connection.fileno())
+        self.__ready = False
+        self.__closed = True
+        for request in self.__requests.values():
+            if not request.future.done():
+                request.future.set_exception(RuntimeError(message))
+        self.__requests.clear()
+
+    def close(self) -> None:
+        if self.__connection.closed:
+            return
+        if self.__loop is not None and not self.__closed and not self.__loop.is_closed():
+            self.__loop.remove_reader(self.__connection.fileno())
+        self.__closed = True
+        self.__connection.close()
+
+
+class SharedMemoryVADClient(VADClient):
+
+    def __init__(self, channel: InferenceChannel) -> None:
+        """Silero VAD of the inference process."""
+        self.__channel = channel
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.__channel.close()
+
+    async def is_active(self, audio_buffer: AudioBuffer) -> bool:
+        return await self.__channel.request(SILERO, audio_buffer)
+
+    def get_queue_wait_ms(self) -> float:
+        return self.__channel.get_queue_wait_ms(SILERO)
+
+    def is_ready(self) -> bool:
+        return self.__channel.is_ready()
+
+
+class SharedMemorySTTClient(STTClient):
+
+    def __init__(self, channel: InferenceChannel) -> None:
+        """Whisper of the inference process."""
+        self.__channel = channel
+
+    def start(self):
+        pass
+
+    def close(self):
+        self.__channel.close()
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        text, started, ended = await self.__channel.request(WHISPER, audio_buffer)
+        if timeline is not None:
+            # time.monotonic() is system-wide, so the inference process timestamps line up.
+            timeline.stt_started, timeline.stt_ended = started, ended
+        return text
+
+    def get_queue_wait_ms(self) -> float:
+        return self.__channel.get_queue_wait_ms(WHISPER)
+
+    def is_ready(self) -> bool:
+        return self.__channel.is_ready()
+
+
+class InferenceServer:
+
+    def __init__(self, vad_client: VADClient, stt_client: STTClient, channels: list[tuple[Connection, SharedMemory]]) -> None:
+        """Serve the requests of every front-end with one VAD and one STT client.
+
+        Args:
+            vad_client: Started client that answers Silero requests.
+            stt_client: Started client that answers Whisper requests.
+            channels: The inference end of the pipe and the ring of every front-end.
+
+        Every front-end is told that the models are ready once serving starts.
+        """
+        self.__vad_client = vad_client
+        self.__stt_client = stt_client
+        self.__channels = channels
+        self.__tasks: set[asyncio.Task] = set()
+
+    async def serve(self) -> None:
+        """Serve until every front-end has closed its pipe."""
+        loop = asyncio.get_running_loop()
+        open_channels = len(self.__channels)
+        finished = asyncio.Event()
+
+        def receive(connection: Connection, buffer: memoryview) -> None:
+            nonlocal open_channels
+            while connection.poll():
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    loop.remove_reader(connection.fileno())
+                    open_channels -= 1
+                    if open_channels == 0:
+                        finished.set()
+                    return
+                task = loop.create_task(self.__handle(connection, buffer, *request))
+                self.__tasks.add(task)
+                task.add_done_callback(self.__tasks.discard)
+
+        for connection, memory in self.__channels:
+            try:
+                connection.send((None, _READY, None))
+            except OSError:
+                pass
+            loop.add_reader(connection.fileno(), receive, connection, memory.buf)
+        if open_channels:
+            await finished.wait()
+        await asyncio.gather(*self.__tasks, return_exceptions=True)
+
+    async def __handle(self, connection: Connection, buffer: memoryview, request_id: int, model: str, offset: int, length: int) -> None:
+        view = buffer[offset:offset + length]
+        # The buffer holds the view itself, and the clients convert it to float32 before queueing
+        # it, so that conversion is the only copy of the audio.
+        audio = AudioBuffer.from_bytes(view)
+        try:
+            if model == SILERO:
+                response = (request_id, _OK, await self.__vad_client.is_active(audio))
+            else:
+                timeline = UtteranceTimeline()
+                text = await self.__stt_client.transcribe(audio, timeline)
+                response = (request_id, _OK, (text, timeline.stt_started, timeline.stt_ended))
+        except OverloadedError as e:
+            response = (request_id, _OVERLOADED, str(e))
+        except Exception as e:
+            logging.error(e, stack_info=True)
+            response = (request_id, _ERROR, str(e))
+        finally:
+            view.release()
+        try:
+            connection.send(response)
+        except OSError:
+            # The front-end is gone; its connection is dropped once the pipe reports EOF.
+            pass
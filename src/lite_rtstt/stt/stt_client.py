@@ -1,26 +1,86 @@
 import asyncio
+import os
 import threading
-import queue
 import logging
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import asdict
+from typing import TYPE_CHECKING
 
 import numpy as np
-import whisper
-from atomicx.atomicx import AtomicBool
 
+from lite_rtstt.cpu_plan import plan_cpus
 from lite_rtstt.stt.audio_buffer import AudioBuffer
 from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.inference import InferenceExecutor, InferenceTiming
+
+if TYPE_CHECKING:
+    import whisper
+
+_MAPPED_SAVE_LOCK = threading.Lock()
+
+
+def load_whisper_model(name: str, download_root: str) -> "whisper.Whisper":
+    """Load a Whisper model, memory-mapping its weights where possible.
+
+    The first CPU load of an official model saves a float32 copy of the checkpoint next to it,
+    `<name>.f32.pt`. Later loads map that file instead of reading and converting the fp16
+    checkpoint, so a restart only reads the pages inference touches, and every model of the
+    pool shares them through the page cache.
+    """
+    # Imported here so that clients of remote or shared-memory inference never load torch.
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+
+    if torch.cuda.is_available() or name not in whisper.available_models():
+        return whisper.load_model(name, download_root=download_root)
+    mapped_path = os.path.join(download_root, f"{name}.f32.pt")
+    if os.path.exists(mapped_path):
+        try:
+            checkpoint = torch.load(mapped_path, map_location="cpu", mmap=True, weights_only=True)
+            model = Whisper(ModelDimensions(**checkpoint["dims"]))
+            # assign keeps the mapped tensors instead of copying them into the new parameters.
+            model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])
+            return model
+        except Exception as e:
+            logging.warning(f"Ignoring unusable {mapped_path}: {e}")
+    model = whisper.load_model(name, device="cpu", download_root=download_root)
+    with _MAPPED_SAVE_LOCK:
+        try:
+            temporary_path = f"{mapped_path}.tmp"
+            torch.save({"dims": asdict(model.dims), "model_state_dict": model.state_dict()}, temporary_path)
+            os.replace(temporary_path, mapped_path)
+        except OSError as e:
+            logging.warning(f"Could not save {mapped_path}, the next start reads the checkpoint again: {e}")
+    return model
 
 
 class STTClient(ABC):
     """A speech to text service."""
 
     @abstractmethod
-    async def transcribe(self, audio_buffer: AudioBuffer) -> str:
-        """Transcribe the audio."""
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        """Transcribe the audio.
+
+        Args:
+            audio_buffer: Audio of one utterance.
+            timeline: If given, the client records when the transcription started and ended.
+
+        Raises:
+            OverloadedError: If the work was shed because the server is overloaded.
+        """
         pass
 
+    def get_queue_wait_ms(self) -> float:
+        """How long the oldest queued utterance has been waiting. Clients without a queue never wait."""
+        return 0.0
+
+    def is_ready(self) -> bool:
+        """Can the service transcribe right now? Clients that are ready once started always are."""
+        return True
+
     @abstractmethod
     def start(self):
         """Start the STT service."""
@@ -40,7 +100,8 @@ class MockSTTClient(STTClient):
         self.__closed = False
         self.__results = asyncio.Queue()
 
-    async def append_results(self, *results: str):
+    async def append_results(self, *results: str | Exception):
+        """Queue results to return in order. An exception is raised instead."""
         for result in results:
             await self.__results.put(result)
 
@@ -50,81 +111,73 @@ class MockSTTClient(STTClient):
     def close(self):
         self.__closed = True
 
-    async def transcribe(self, audio_buffer: AudioBuffer) -> str:
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
         if not self.__started:
             raise RuntimeError("MockSTTClient is not started.")
         if self.__closed:
             raise RuntimeError("MockSTTClient is closed.")
-        return await self.__results.get()
+        result = await self.__results.get()
+        if isinstance(result, Exception):
+            raise result
+        return result
 
 
 class WhisperClient(STTClient):
 
     __silence_padding = np.zeros(8000, dtype=np.float32)
 
-    @dataclass
-    class Work:
-        audio_array: np.ndarray
-        loop: asyncio.AbstractEventLoop
-        future: asyncio.Future[str]
-
     def __init__(self, config: STTConfig, download_root: str) -> None:
-        """A Whisper-based STT client."""
+        """A Whisper-based STT client.
+
+        Each of the `whisper_threads` workers owns a model, because a Whisper model can
+        only decode one utterance at a time.
+        """
 
-        self.started = False
-        self.__closed = AtomicBool(False)
-        self.__inputs = queue.Queue()
-        self.__input_semaphore = threading.Semaphore(0)
-        self.__model: whisper.Whisper = None
         self.__model_size = config.whisper_model
-        self.__whisper_thread = threading.Thread(target=self.__worker, daemon=True)
         self.__download_root = download_root
-
-    def __worker(self):
-        while not self.__closed.load():
-            self.__input_semaphore.acquire()
-            try:
-                work = self.__inputs.get()
-            except queue.ShutDown:
-                break
-            try:
-                if not isinstance(work, WhisperClient.Work):
-                    raise RuntimeError("Whisper worker received an invalid work.")
-                result = self.__model.transcribe(audio=work.audio_array)
-                if result.get("text", None) is not None:
-                    work.loop.call_soon_threadsafe(work.future.set_result, result["text"])
-                else:
-                    work.loop.call_soon_threadsafe(work.future.set_result, result[""])
-            except Exception as e:
-                work.loop.call_soon_threadsafe(work.future.set_exception, e)
+        self.__warm_up_samples = config.sample_rate * config.warm_up_ms // 1000
+        self.__executor: InferenceExecutor[np.ndarray, "whisper.Whisper", str] = InferenceExecutor(
+            "whisper",
+            config.whisper_threads,
+            self.__load_model,
+            self.__infer,
+            shed_after_s=config.shed_queue_wait_ms / 1000,
+            cpu_plan=plan_cpus(config).whisper,
+        )
+
+    def __load_model(self, index: int) -> "whisper.Whisper":
+        # Loaded on the worker's thread, so the warm-up runs on the cores that will serve.
+        model = load_whisper_model(self.__model_size, self.__download_root)
+        if self.__warm_up_samples:
+            # The first inference pays for lazy initialization; pay it before serving.
+            model.transcribe(audio=np.zeros(self.__warm_up_samples, dtype=np.float32))
+        return model
+
+    @staticmethod
+    def __infer(model: "whisper.Whisper", audios: list[np.ndarray]) -> list[str]:
+        return [model.transcribe(audio=audio)["text"] for audio in audios]
 
     def start(self):
-        if self.started:
-            return
-        logging.debug("Waiting for whisper models to be loaded.")
-        self.__model = whisper.load_model(self.__model_size, download_root=self.__download_root)
-        self.__whisper_thread.start()
-        self.started = True
-        logging.debug("Whisper pool starts.")
+        self.__executor.start()
+
+    def is_ready(self) -> bool:
+        return self.__executor.is_ready()
 
     def close(self):
-        if not self.__closed.load():
-            self.__closed.store(True)
-            self.__inputs.shutdown(True)
-            self.__input_semaphore.release()
-            self.__whisper_thread.join()
-
-    async def transcribe(self, audio_buffer: AudioBuffer) -> str:
-        if not self.started:
-            raise RuntimeError("Whisper is not ready.")
-        if self.__closed.load():
-            raise RuntimeError("Whisper is closed.")
-        raw_audio = audio_buffer.to_float32_ndarray()
-        padded_audio = np.concatenate([self.__silence_padding, raw_audio])
-        work = WhisperClient.Work(
-            padded_audio,
-            asyncio.get_running_loop(),
-            asyncio.Future())
-        self.__inputs.put(work)
-        self.__input_semaphore.release()
-        return await work.future
+        self.__executor.close()
+
+    def get_queue_depth(self) -> int:
+        """Number of utterances waiting for a Whisper worker."""
+        return self.__executor.get_queue_depth()
+
+    def get_queue_wait_ms(self) -> float:
+        return self.__executor.get_queue_wait_ms()
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        padded_audio = np.concatenate([self.__silence_padding, audio_buffer.to_float32_ndarray()])
+        timing = InferenceTiming()
+        try:
+            return await self.__executor.submit(padded_audio, timing)
+        finally:
+            if timeline is not None:
+                timeline.stt_started, timeline.stt_ended = timing.started, timing.ended
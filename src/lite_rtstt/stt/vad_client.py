@@ -1,23 +1,22 @@
 from abc import ABC, abstractmethod
 import asyncio
-from dataclasses import dataclass
-import logging
-import queue
 import threading
 
 import numpy
 import webrtcvad
-from atomicx import AtomicBool
-from silero_vad import load_silero_vad, get_speech_timestamps
 
-from lite_rtstt.atomic.counter import Counter
+from lite_rtstt.cpu_plan import plan_cpus
 from lite_rtstt.stt.audio_buffer import AudioBuffer
 from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.inference import InferenceExecutor
 
 
 class VADClient(ABC):
     """An VAD service that tells you whether an audio chunk has human voice."""
 
+    # Lets per-stream subclasses do without a __dict__.
+    __slots__ = ()
+
     @abstractmethod
     def start(self):
         """Start the service."""
@@ -35,9 +34,31 @@ class VADClient(ABC):
             audio_buffer (numpy.ndarray): Audio.
         Returns:
             bool: Is the given audio active?
+        Raises:
+            OverloadedError: If the work was shed because the server is overloaded.
         """
         pass
 
+    def get_queue_wait_ms(self) -> float:
+        """How long the oldest queued work has been waiting. Clients without a queue never wait."""
+        return 0.0
+
+    def is_ready(self) -> bool:
+        """Can the service detect voice right now? Clients that are ready once started always are."""
+        return True
+
+    def create_stream(self) -> "VADClient":
+        """A client for one audio stream. Clients without per-stream state serve every stream themselves."""
+        return self
+
+    def is_tunable(self) -> bool:
+        """Does `set_aggressiveness` change how this client detects voice?"""
+        return False
+
+    def set_aggressiveness(self, aggressiveness: int) -> None:
+        """Make detection stricter (higher) or looser. Clients that are not tunable ignore it."""
+        pass
+
 
 class MockVADClient(VADClient):
 
@@ -65,13 +86,6 @@ class MockVADClient(VADClient):
 
 class SileroClient(VADClient):
 
-
-    @dataclass
-    class SileroPoolWork:
-        audio: numpy.ndarray
-        loop: asyncio.AbstractEventLoop
-        future: asyncio.Future[bool]
-
     def __init__(self, config: STTConfig) -> None:
         """A VADClient that uses a Silero VAD pool for detection.
 
@@ -79,73 +93,58 @@ class SileroClient(VADClient):
             config (STTConfig): STT config.
         """
 
-        self.started = False
-        self.__closed = AtomicBool(False)
-        self.__pool = [threading.Thread(target=self.__worker, daemon=True) for _ in range(config.vad_threads)]
-        self.__inputs = queue.Queue()
-        self.__input_semaphore = threading.Semaphore(0)
-        self.__ready_threads = Counter()
+        self.__warm_up_samples = config.sample_rate * config.warm_up_ms // 1000
+        self.__executor: InferenceExecutor[numpy.ndarray, object, bool] = InferenceExecutor(
+            "silero",
+            config.vad_threads,
+            self.__load_model,
+            self.__infer,
+            shed_after_s=config.shed_queue_wait_ms / 1000,
+            cpu_plan=plan_cpus(config).silero,
+        )
 
-    def __worker(self) -> None:
-        """Load the model and start listening for work."""
+    def __load_model(self, index: int):
+        from silero_vad import load_silero_vad, get_speech_timestamps
 
         model = load_silero_vad()
-        self.__ready_threads.increment()
-        while not self.__closed.load():
-            self.__input_semaphore.acquire()
-            try:
-                work = self.__inputs.get()
-            except queue.ShutDown:
-                break
-            try:
-                if not isinstance(work, SileroClient.SileroPoolWork):
-                    raise RuntimeError("Silero worker received an invalid work.")
-                result = get_speech_timestamps(work.audio, model)
-                work.loop.call_soon_threadsafe(work.future.set_result, len(result) > 0)
-            except Exception as e:
-                work.loop.call_soon_threadsafe(work.future.set_exception, e)
+        if self.__warm_up_samples:
+            get_speech_timestamps(numpy.zeros(self.__warm_up_samples, dtype=numpy.float32), model)
+        return model
+
+    @staticmethod
+    def __infer(model, audios: list[numpy.ndarray]) -> list[bool]:
+        from silero_vad import get_speech_timestamps
+
+        return [len(get_speech_timestamps(audio, model)) > 0 for audio in audios]
 
     def start(self) -> None:
         """Start the pool. You should call this method before using the pool."""
-        if self.started:
-            return
-        for thread in self.__pool:
-            thread.start()
-        logging.debug("Waiting for silero pool to be ready.")
-        self.__ready_threads.wait_for(len(self.__pool))
-        self.started = True
-        logging.debug("Silero pool started.")
+        self.__executor.start()
 
     def close(self) -> None:
-        if not self.__closed.load():
-            self.__closed.store(True)
-            self.__inputs.shutdown(True)
-            for _ in range(len(self.__pool)):
-                self.__input_semaphore.release()
-            for thread in self.__pool:
-                thread.join()
-            self.__pool.clear()
+        self.__executor.close()
+
+    def is_ready(self) -> bool:
+        return self.__executor.is_ready()
+
+    def get_queue_depth(self) -> int:
+        """Number of buffers waiting for a Silero worker."""
+        return self.__executor.get_queue_depth()
+
+    def get_queue_wait_ms(self) -> float:
+        return self.__executor.get_queue_wait_ms()
 
     async def is_active(self, audio_buffer: AudioBuffer) -> bool:
-        if not self.started:
-            raise RuntimeError("Silero pool is not ready.")
-        if self.__closed.load():
-            raise RuntimeError("Silero pool is closed.")
-        work = SileroClient.SileroPoolWork(
-            audio_buffer.to_float32_ndarray(),
-            asyncio.get_running_loop(),
-            asyncio.get_running_loop().create_future(),
-        )
-        self.__inputs.put(work)
-        self.__input_semaphore.release()
-        return await work.future
+        return await self.__executor.submit(audio_buffer.to_float32_ndarray())
 
 
 class WebRTCClient(VADClient):
 
     def __init__(self, config: STTConfig):
         """A light-weighted VAD based on web rtc VAD"""
-        self.__vad = webrtcvad.Vad(config.aggresiveness)
+        self.__aggresiveness = config.aggresiveness
+        # A Vad is not safe to share between threads once the GIL is gone, so every event loop thread gets its own.
+        self.__local = threading.local()
         self.__sample_rate = config.sample_rate
         self.__started = False
         self.__closed = False
@@ -161,4 +160,36 @@ class WebRTCClient(VADClient):
             raise RuntimeError("WebRTCClient is not ready.")
         if self.__closed:
             raise RuntimeError("WebRTCClient is closed.")
+        vad = getattr(self.__local, "vad", None)
+        if vad is None:
+            vad = self.__local.vad = webrtcvad.Vad(self.__aggresiveness)
+        return vad.is_speech(audio_buffer.to_bytes(), self.__sample_rate)
+
+    def create_stream(self) -> "WebRTCStreamClient":
+        # WebRTC VAD adapts to the noise it hears, so streams must not share one.
+        return WebRTCStreamClient(self.__aggresiveness, self.__sample_rate)
+
+
+class WebRTCStreamClient(VADClient):
+
+    __slots__ = ("__vad", "__sample_rate")
+
+    def __init__(self, aggressiveness: int, sample_rate: int) -> None:
+        """WebRTC VAD of one stream, created by WebRTCClient.create_stream."""
+        self.__vad = webrtcvad.Vad(aggressiveness)
+        self.__sample_rate = sample_rate
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def is_tunable(self) -> bool:
+        return True
+
+    def set_aggressiveness(self, aggressiveness: int) -> None:
+        self.__vad.set_mode(aggressiveness)
+
+    async def is_active(self, audio_buffer: AudioBuffer) -> bool:
         return self.__vad.is_speech(audio_buffer.to_bytes(), self.__sample_rate)
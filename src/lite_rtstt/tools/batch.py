@@ -0,0 +1,140 @@
+"""Offline bulk transcription of recordings, in-process and without real-time pacing."""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import time
+from typing import AsyncIterator, Iterable, TextIO
+
+from lite_rtstt.stt.audio_format import AudioConverter, AudioFormat, parse_wav_header
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import RTSTTClient
+
+AUDIO_EXTENSIONS = (".pcm", ".raw", ".wav")
+
+
+def collect_inputs(paths: Iterable[str], list_file: str | None = None) -> list[str]:
+    """Expand directories and an optional file list into absolute recording paths."""
+    paths = list(paths)
+    if list_file is not None:
+        with open(list_file, "r") as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                inputs.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            inputs.append(path)
+    return [os.path.abspath(path) for path in inputs]
+
+
+def load_completed(output_path: str) -> set[str]:
+    """Return the files an earlier run finished.
+
+    Records of files that were interrupted are removed from the output, so those files can
+    be transcribed again without duplicating segments.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "r") as f:
+        records = []
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The last line of a killed run may be cut off.
+                continue
+    completed = {record["file"] for record in records if record.get("done")}
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "w") as f:
+        for record in records:
+            if record["file"] in completed:
+                f.write(json.dumps(record) + "\n")
+    os.replace(temp_path, output_path)
+    return completed
+
+
+def detect_format(audio: bytes | mmap.mmap, config: STTConfig) -> tuple[AudioFormat, int]:
+    """Return the format of a WAV file and the offset of its samples. Anything else is native PCM."""
+    if audio[:4] == b"RIFF":
+        header = parse_wav_header(audio[:1 << 20])
+        if header is None:
+            raise ValueError("Incomplete WAV header.")
+        return header
+    return AudioFormat.native(config), 0
+
+
+class BatchTranscriber:
+
+    __READ_CHUNKS = 64
+
+    def __init__(self, rtstt_client: RTSTTClient, config: STTConfig, output: TextIO, jobs: int, max_pending: int) -> None:
+        """Transcribe many recordings through a bounded pipeline.
+
+        Up to `jobs` files are segmented at once and each file keeps at most `max_pending`
+        segments in the STT queue, so the workers stay busy without reading whole archives
+        into memory. Results are written as JSONL, one record per segment and a final
+        record with `"done": true` per file.
+        """
+        self.__rtstt_client = rtstt_client
+        self.__config = config
+        self.__output = output
+        self.__jobs = asyncio.Semaphore(jobs)
+        self.__max_pending = max_pending
+        self.__chunk_bytes = config.sample_rate * config.chunk_size_ms // 1000 * 2
+
+    def __write(self, record: dict) -> None:
+        self.__output.write(json.dumps(record) + "\n")
+        self.__output.flush()
+
+    async def run(self, paths: Iterable[str]) -> None:
+        async def job(path: str) -> None:
+            async with self.__jobs:
+                try:
+                    await self.__transcribe_file(path)
+                except Exception as e:
+                    logging.error(f"Failed to transcribe {path}: {e}")
+                    self.__write({"file": path, "error": str(e)})
+
+        await asyncio.gather(*(job(path) for path in paths))
+
+    async def __chunks(self, audio: mmap.mmap, offset: int, converter: AudioConverter) -> AsyncIterator[bytes]:
+        block = self.__chunk_bytes * self.__READ_CHUNKS
+        for start in range(offset, len(audio), block):
+            for chunk in converter.convert(audio[start:start + block]):
+                yield chunk
+            # Let the other files make progress between blocks.
+            await asyncio.sleep(0)
+
+    async def __transcribe_file(self, path: str) -> None:
+        started = time.perf_counter()
+        segments = 0
+        audio_seconds = 0.0
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as audio:
+                    audio_format, offset = detect_format(audio, self.__config)
+                    converter = AudioConverter(audio_format, self.__config, allow_passthrough=False)
+                    bytes_per_second = audio_format.sample_rate * audio_format.channels * audio_format.bytes_per_sample()
+                    audio_seconds = (len(audio) - offset) / bytes_per_second
+                    async for segment in self.__rtstt_client.transcribe(self.__chunks(audio, offset, converter), self.__max_pending):
+                        segments += 1
+                        self.__write({
+                            "file": path,
+                            "index": segment.index,
+                            "start_ms": segment.start_ms,
+                            "end_ms": segment.end_ms,
+                            "text": segment.text,
+                            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+                        })
+        wall_seconds = time.perf_counter() - started
+        self.__write({
+            "file": path,
+            "done": True,
+            "segments": segments,
+            "audio_seconds": round(audio_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "real_time_factor": round(wall_seconds / audio_seconds, 4) if audio_seconds else None,
+        })
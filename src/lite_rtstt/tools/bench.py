@@ -0,0 +1,362 @@
+"""Concurrent-stream load generator and latency benchmark.
+
+Simulated speakers replay PCM recordings at real-time pace against `/rtstt` or an in-process
+RTSTTClient and time the events they get back. End of speech and start of speech are taken
+from the replayed audio itself: a chunk counts as voiced when its RMS is above a threshold.
+"""
+import asyncio
+import base64
+import json
+import os
+import time
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+import numpy
+
+from lite_rtstt.metrics import PROCESS_CPU_SECONDS, PROCESS_RSS_BYTES
+from lite_rtstt.process_stats import get_cpu_seconds, get_peak_rss_bytes, get_rss_bytes
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.event import OverloadEvent, StartSpeakingEvent, StopSpeakingEvent, TextEvent
+from lite_rtstt.stt.rtstt_client import RTSTTClient
+
+START_SPEAKING = "start speaking"
+STOP_SPEAKING = "stop speaking"
+TEXT = "text"
+OVERLOAD = "overload"
+
+
+class BenchSession(ABC):
+    """One simulated client connection."""
+
+    @abstractmethod
+    async def send(self, chunk: bytes) -> None:
+        pass
+
+    @abstractmethod
+    def events(self) -> AsyncIterator[str]:
+        """Yield the type of every event until the connection ends."""
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Signal the end of the audio."""
+        pass
+
+
+class FrameSession(BenchSession):
+    """A session that also sends binary messages, as captured traces hold."""
+
+    @abstractmethod
+    async def send_frame(self, audio: bytes) -> None:
+        """Send audio of any length as one binary message."""
+        pass
+
+
+class WebSocketSession(FrameSession):
+
+    def __init__(self, websocket) -> None:
+        self.__websocket = websocket
+
+    @staticmethod
+    async def open(url: str) -> "WebSocketSession":
+        import websockets
+
+        return WebSocketSession(await websockets.connect(url, max_queue=None))
+
+    async def send(self, chunk: bytes) -> None:
+        await self.__websocket.send(json.dumps({"type": "audio chunk", "data": base64.b64encode(chunk).decode("utf-8")}))
+
+    async def send_frame(self, audio: bytes) -> None:
+        await self.__websocket.send(audio)
+
+    async def events(self) -> AsyncIterator[str]:
+        import websockets
+
+        try:
+            async for message in self.__websocket:
+                yield json.loads(message)["type"]
+        except websockets.exceptions.ConnectionClosed:
+            return
+
+    async def close(self) -> None:
+        await self.__websocket.send(json.dumps({"type": "EOF"}))
+
+
+class InProcessSession(BenchSession):
+
+    def __init__(self, rtstt_client: RTSTTClient) -> None:
+        self.__rtstt_client = rtstt_client
+        self.__queue, self.__connection_id = rtstt_client.connect()
+        # Feeding awaits transcriptions. A task of its own feeds the chunks in order, as the
+        # server's receive loop does, so sending keeps to the clock like a remote client.
+        self.__chunks: asyncio.Queue[bytes | None] = asyncio.Queue()
+        self.__feeder = asyncio.create_task(self.__feed())
+
+    async def send(self, chunk: bytes) -> None:
+        if self.__feeder.done():
+            # Raises what stopped the feeder.
+            self.__feeder.result()
+        self.__chunks.put_nowait(chunk)
+
+    async def __feed(self) -> None:
+        while (chunk := await self.__chunks.get()) is not None:
+            await self.__rtstt_client.feed(self.__connection_id, chunk)
+
+    async def events(self) -> AsyncIterator[str]:
+        while True:
+            try:
+                event = await self.__queue.get()
+            except asyncio.QueueShutDown:
+                return
+            if event is None:
+                return
+            if isinstance(event, StartSpeakingEvent):
+                yield START_SPEAKING
+            elif isinstance(event, StopSpeakingEvent):
+                yield STOP_SPEAKING
+            elif isinstance(event, TextEvent):
+                yield TEXT
+            elif isinstance(event, OverloadEvent):
+                yield OVERLOAD
+
+    async def close(self) -> None:
+        # As the /rtstt route does on EOF.
+        self.__chunks.put_nowait(None)
+        await self.__feeder
+        await self.__rtstt_client.flush(self.__connection_id)
+        self.__rtstt_client.disconnect(self.__connection_id)
+        await self.__queue.put(None)
+
+
+@dataclass
+class Recording:
+    name: str
+    chunks: list[bytes]
+    voiced: list[bool]
+
+
+@dataclass
+class StreamStats:
+    start_detection_ms: list[float] = field(default_factory=list)
+    speech_end_to_text_ms: list[float] = field(default_factory=list)
+    stop_to_text_ms: list[float] = field(default_factory=list)
+    send_lag_ms: list[float] = field(default_factory=list)
+    audio_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    error: str | None = None
+
+
+def load_corpus(paths: list[str], config: STTConfig, voiced_rms: float = 500.0) -> list[Recording]:
+    """Load 16-bit mono PCM recordings and split them into chunks of `chunk_size_ms`."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".pcm"))
+        else:
+            files.append(path)
+    chunk_samples = config.sample_rate * config.chunk_size_ms // 1000
+    recordings = []
+    for path in files:
+        samples = numpy.fromfile(path, dtype="<i2")
+        samples = samples[:len(samples) - len(samples) % chunk_samples].reshape(-1, chunk_samples)
+        rms = numpy.sqrt(numpy.mean(samples.astype(numpy.float32) ** 2, axis=1))
+        recordings.append(Recording(os.path.basename(path), [chunk.tobytes() for chunk in samples], list(rms > voiced_rms)))
+    if not recordings:
+        raise ValueError("The corpus has no .pcm recordings.")
+    return recordings
+
+
+async def read_local_process() -> tuple[float, int]:
+    """CPU seconds and RSS of this process, which serves in-process sessions."""
+    return get_cpu_seconds(), get_rss_bytes()
+
+
+def get_metrics_url(url: str) -> str:
+    """The /metrics URL of the server behind a /rtstt WebSocket URL."""
+    parts = urllib.parse.urlsplit(url)
+    return urllib.parse.urlunsplit(({"ws": "http", "wss": "https"}.get(parts.scheme, parts.scheme), parts.netloc, "/metrics", "", ""))
+
+
+async def scrape_process(metrics_url: str) -> tuple[float, int]:
+    """CPU seconds and RSS that a server reports on /metrics.
+
+    Raises:
+        KeyError: If the server does not report them.
+    """
+    def scrape() -> str:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            return response.read().decode("utf-8")
+
+    values = {}
+    for line in (await asyncio.to_thread(scrape)).splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            values[name] = float(value)
+    return values[PROCESS_CPU_SECONDS.name], int(values[PROCESS_RSS_BYTES.name])
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    array = numpy.asarray(values)
+    return {
+        "count": len(values),
+        "mean": round(float(array.mean()), 2),
+        "p50": round(float(numpy.percentile(array, 50)), 2),
+        "p90": round(float(numpy.percentile(array, 90)), 2),
+        "p99": round(float(numpy.percentile(array, 99)), 2),
+        "max": round(float(array.max()), 2),
+    }
+
+
+class LoadGenerator:
+
+    __SAMPLE_INTERVAL_S = 0.1
+
+    def __init__(
+        self,
+        open_session: Callable[[], Awaitable[BenchSession]],
+        corpus: list[Recording],
+        config: STTConfig,
+        clients: int,
+        stagger_ms: int,
+        tail_ms: int = 2000,
+        speed: float = 1.0,
+        queue_depths: dict[str, Callable[[], int]] | None = None,
+        server_process: Callable[[], Awaitable[tuple[float, int]]] | None = None,
+    ) -> None:
+        """Replay the corpus from `clients` concurrent sessions.
+
+        Args:
+            open_session: Opens one simulated connection.
+            corpus: Recordings, assigned to clients round-robin.
+            config: STT config, for the chunk duration.
+            clients: Number of concurrent sessions.
+            stagger_ms: Delay between the starts of two sessions.
+            tail_ms: Silence sent after each recording so its last utterance is closed.
+            speed: Replay speed. 1.0 is real time.
+            queue_depths: Queue depth readers, sampled while the benchmark runs.
+            server_process: Reads the CPU seconds and RSS of the serving process, sampled while the
+                benchmark runs. The process of the benchmark itself is always reported.
+        """
+        self.__open_session = open_session
+        self.__corpus = corpus
+        self.__clients = clients
+        self.__stagger_s = stagger_ms / 1000 / speed
+        self.__chunk_s = config.chunk_size_ms / 1000
+        self.__interval_s = self.__chunk_s / speed
+        self.__tail_chunks = tail_ms // config.chunk_size_ms
+        self.__speed = speed
+        self.__queue_depths = queue_depths or {}
+        self.__server_process = server_process
+        self.__silence = b"\x00" * (config.sample_rate * config.chunk_size_ms // 1000 * 2)
+
+    async def run(self) -> dict:
+        depth_samples: dict[str, list[int]] = {name: [] for name in self.__queue_depths}
+        rss_samples: list[int] = []
+        server_rss_samples: list[int] = []
+
+        async def sample() -> None:
+            while True:
+                for name, depth in self.__queue_depths.items():
+                    depth_samples[name].append(depth())
+                rss_samples.append(get_rss_bytes())
+                if self.__server_process is not None:
+                    server_rss_samples.append((await self.__server_process())[1])
+                await asyncio.sleep(self.__SAMPLE_INTERVAL_S)
+
+        server_cpu_start = (await self.__server_process())[0] if self.__server_process is not None else 0.0
+        sampler = asyncio.create_task(sample())
+        cpu_start = get_cpu_seconds()
+        wall_start = time.perf_counter()
+        try:
+            stats = await asyncio.gather(*(self.__client(i) for i in range(self.__clients)))
+        finally:
+            sampler.cancel()
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = get_cpu_seconds() - cpu_start
+
+        def merged(name: str) -> list[float]:
+            return [value for stream in stats for value in getattr(stream, name)]
+
+        report = {
+            "clients": self.__clients,
+            "speed": self.__speed,
+            "errors": [stream.error for stream in stats if stream.error is not None],
+            "latency_ms": {
+                "speech_end_to_text": summarize(merged("speech_end_to_text_ms")),
+                "stop_to_text": summarize(merged("stop_to_text_ms")),
+                "start_detection": summarize(merged("start_detection_ms")),
+            },
+            "send_lag_ms": summarize(merged("send_lag_ms")),
+            "real_time_factor": summarize([stream.wall_seconds * self.__speed / stream.audio_seconds for stream in stats if stream.audio_seconds]),
+            "queue_depth": {name: summarize(samples) for name, samples in depth_samples.items()},
+            "wall_seconds": round(wall_seconds, 3),
+            # The load generator; the server only when it runs in-process.
+            "bench_process": {
+                "cpu_seconds": round(cpu_seconds, 3),
+                "cpu_percent": round(cpu_seconds / wall_seconds * 100, 1),
+                "rss_bytes": summarize(rss_samples),
+                "peak_rss_bytes": get_peak_rss_bytes(),
+            },
+        }
+        if self.__server_process is not None:
+            server_cpu_seconds = (await self.__server_process())[0] - server_cpu_start
+            report["server_process"] = {
+                "cpu_seconds": round(server_cpu_seconds, 3),
+                "cpu_percent": round(server_cpu_seconds / wall_seconds * 100, 1),
+                "rss_bytes": summarize(server_rss_samples),
+            }
+        return report
+
+    async def __client(self, index: int) -> StreamStats:
+        await asyncio.sleep(index * self.__stagger_s)
+        recording = self.__corpus[index % len(self.__corpus)]
+        loop = asyncio.get_running_loop()
+        stats = StreamStats()
+        speech_onset: float | None = None
+        last_voiced: float | None = None
+        speech_end: float | None = None
+        stopped_at: float | None = None
+
+        async def receive(session: BenchSession) -> None:
+            nonlocal speech_onset, speech_end, stopped_at
+            async for event in session.events():
+                now = loop.time()
+                if event == START_SPEAKING and speech_onset is not None:
+                    stats.start_detection_ms.append((now - speech_onset) * 1000)
+                elif event == STOP_SPEAKING:
+                    stopped_at, speech_end, speech_onset = now, last_voiced, None
+                elif event == TEXT and stopped_at is not None:
+                    stats.stop_to_text_ms.append((now - stopped_at) * 1000)
+                    if speech_end is not None:
+                        stats.speech_end_to_text_ms.append((now - speech_end) * 1000)
+
+        started = loop.time()
+        try:
+            session = await self.__open_session()
+            receiver = asyncio.create_task(receive(session))
+            chunks = recording.chunks + [self.__silence] * self.__tail_chunks
+            voiced = recording.voiced + [False] * self.__tail_chunks
+            for i, chunk in enumerate(chunks):
+                target = started + i * self.__interval_s
+                delay = target - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                now = loop.time()
+                stats.send_lag_ms.append(max(0.0, now - target) * 1000)
+                if voiced[i]:
+                    speech_onset = now if speech_onset is None else speech_onset
+                    last_voiced = now
+                await session.send(chunk)
+            await session.close()
+            await receiver
+            stats.audio_seconds = len(chunks) * self.__chunk_s
+        except Exception as e:
+            stats.error = f"client {index}: {e!r}"
+        stats.wall_seconds = loop.time() - started
+        return stats
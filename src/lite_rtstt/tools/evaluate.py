@@ -0,0 +1,261 @@
+"""Offline accuracy-vs-speed evaluation over a grid of STT configs.
+
+Every recording of the corpus has a reference transcript next to it, with the same name and a
+`.txt` extension. Each config of the grid transcribes the whole corpus without real-time pacing
+and is scored by word error rate, real-time factor, CPU seconds per audio minute and the number
+of calls that reached each layer. With adaptive endpointing the report also has the early cuts,
+how many of them split an utterance the fixed timeout would have kept whole and the silence they
+saved per utterance. Configs that no other config beats on all of WER, real-time
+factor and CPU time form the Pareto front.
+"""
+import os
+import re
+import string
+import time
+from dataclasses import dataclass, fields, replace
+from typing import AsyncIterator, Callable
+
+from lite_rtstt.metrics import ENDPOINT_SAVED, ENDPOINT_SPLITS, ENDPOINTS
+from lite_rtstt.process_stats import get_cpu_seconds
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.audio_format import AudioConverter
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import STTClient
+from lite_rtstt.stt.vad_client import VADClient
+from lite_rtstt.tools.batch import AUDIO_EXTENSIONS, detect_format
+
+OBJECTIVES = ("wer", "real_time_factor", "cpu_seconds_per_audio_minute")
+
+
+@dataclass
+class LabelledRecording:
+    name: str
+    audio: bytes
+    reference: str
+
+
+class CountingVADClient(VADClient):
+    """Counts the calls that reach a VAD layer, including those of its per-stream clients."""
+
+    def __init__(self, client: VADClient, parent: "CountingVADClient | None" = None) -> None:
+        self.__client = client
+        self.__parent = parent
+        self.calls = 0
+
+    def start(self):
+        self.__client.start()
+
+    def close(self):
+        self.__client.close()
+
+    async def is_active(self, audio_buffer: AudioBuffer) -> bool:
+        self.calls += 1
+        if self.__parent is not None:
+            self.__parent.calls += 1
+        return await self.__client.is_active(audio_buffer)
+
+    def get_queue_wait_ms(self) -> float:
+        return self.__client.get_queue_wait_ms()
+
+    def is_ready(self) -> bool:
+        return self.__client.is_ready()
+
+    def create_stream(self) -> VADClient:
+        stream = self.__client.create_stream()
+        # A stream of its own, as the server gives every connection, still counted here.
+        return self if stream is self.__client else CountingVADClient(stream, self)
+
+    def is_tunable(self) -> bool:
+        return self.__client.is_tunable()
+
+    def set_aggressiveness(self, aggressiveness: int) -> None:
+        self.__client.set_aggressiveness(aggressiveness)
+
+
+class CountingSTTClient(STTClient):
+    """Counts the calls that reach the STT layer."""
+
+    def __init__(self, client: STTClient) -> None:
+        self.__client = client
+        self.calls = 0
+
+    def start(self):
+        self.__client.start()
+
+    def close(self):
+        self.__client.close()
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        self.calls += 1
+        return await self.__client.transcribe(audio_buffer, timeline)
+
+
+def normalize_words(text: str) -> list[str]:
+    text = text.lower().translate(str.maketrans("", "", string.punctuation))
+    return re.sub(r"\s+", " ", text).strip().split()
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """Return the word-level edit distance and the number of reference words."""
+    expected, actual = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(actual) + 1))
+    for i, word in enumerate(expected, 1):
+        current = [i]
+        for j, candidate in enumerate(actual, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != candidate)))
+        previous = current
+    return previous[-1], len(expected)
+
+
+def load_labelled_corpus(paths: list[str]) -> list[LabelledRecording]:
+    """Load recordings that have a `.txt` reference transcript beside them."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.append(path)
+    corpus = []
+    for path in files:
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(reference_path):
+            continue
+        with open(path, "rb") as f:
+            audio = f.read()
+        with open(reference_path, "r") as f:
+            reference = f.read().strip()
+        corpus.append(LabelledRecording(os.path.basename(path), audio, reference))
+    if not corpus:
+        raise ValueError("The corpus has no recordings with a reference transcript.")
+    return corpus
+
+
+_BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _convert_value(name: str, value_type: type, value: str):
+    # bool("false") is True, so booleans are spelled out.
+    if value_type is bool:
+        if value.lower() not in _BOOLEANS:
+            raise ValueError(f"Invalid value for {name}: {value}. Use true, false, 1 or 0.")
+        return _BOOLEANS[value.lower()]
+    return value_type(value)
+
+
+def parse_grid(axes: list[str], base: STTConfig) -> list[STTConfig]:
+    """Expand `name=value,value` axes into the cartesian product of configs.
+
+    Values are converted to the type of the field in `base`.
+    """
+    types = {field.name: type(getattr(base, field.name)) for field in fields(base)}
+    configs = [base]
+    for axis in axes:
+        name, _, values = axis.partition("=")
+        name = name.strip()
+        if name not in types or not values:
+            raise ValueError(f"Invalid grid axis: {axis}")
+        converted = [_convert_value(name, types[name], value.strip()) for value in values.split(",")]
+        configs = [replace(config, **{name: value}) for config in configs for value in converted]
+    return configs
+
+
+def pareto_front(rows: list[dict], objectives: tuple[str, ...] = OBJECTIVES) -> list[int]:
+    """Indices of the rows that no other row dominates. Every objective is minimized."""
+    front = []
+    for i, row in enumerate(rows):
+        dominated = any(
+            all(other[key] <= row[key] for key in objectives) and any(other[key] < row[key] for key in objectives)
+            for j, other in enumerate(rows) if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def format_table(rows: list[dict], columns: list[str]) -> str:
+    cells = [columns] + [[str(row[column]) for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
+
+
+class Evaluator:
+
+    def __init__(
+        self,
+        corpus: list[LabelledRecording],
+        create_clients: Callable[[STTConfig], tuple[VADClient, VADClient, STTClient]],
+    ) -> None:
+        """Score configs on a labelled corpus.
+
+        Args:
+            corpus: Recordings with reference transcripts.
+            create_clients: Builds the first VAD, second VAD and STT clients of a config.
+        """
+        self.__corpus = corpus
+        self.__create_clients = create_clients
+
+    async def run(self, configs: list[STTConfig], swept: list[str]) -> dict:
+        rows = []
+        for config in configs:
+            row = {name: getattr(config, name) for name in swept}
+            row.update(await self.evaluate(config))
+            rows.append(row)
+        front = pareto_front(rows)
+        for i, row in enumerate(rows):
+            row["pareto"] = i in front
+        return {
+            "corpus": [recording.name for recording in self.__corpus],
+            "results": rows,
+            "pareto_front": [rows[i] for i in front],
+        }
+
+    async def evaluate(self, config: STTConfig) -> dict:
+        first_vad, second_vad, stt = self.__create_clients(config)
+        first_vad, second_vad, stt = CountingVADClient(first_vad), CountingVADClient(second_vad), CountingSTTClient(stt)
+        rtstt = ThreeLayerRTSTTClient(config, first_vad, second_vad, stt)
+        # Model loading is not part of the measurement.
+        rtstt.start()
+        errors = words = 0
+        audio_seconds = 0.0
+        endpoint_counters = [ENDPOINTS.labels(reason) for reason in ("silence", "early", "max_buffer")]
+        early, saved, splits = ENDPOINTS.labels("early"), ENDPOINT_SAVED.labels(), ENDPOINT_SPLITS.labels()
+        endpoints_before = sum(counter.get() for counter in endpoint_counters)
+        early_before, saved_before, splits_before = early.get(), saved.get(), splits.get()
+        try:
+            cpu_start = get_cpu_seconds()
+            wall_start = time.perf_counter()
+            for recording in self.__corpus:
+                audio_format, offset = detect_format(recording.audio, config)
+                converter = AudioConverter(audio_format, config, allow_passthrough=False)
+                chunks = converter.convert(recording.audio[offset:])
+                audio_seconds += len(chunks) * config.chunk_size_ms / 1000
+                segments = [segment async for segment in rtstt.transcribe(self.__iterate(chunks), 2 * config.whisper_threads)]
+                hypothesis = " ".join(segment.text for segment in sorted(segments, key=lambda segment: segment.index))
+                recording_errors, recording_words = word_errors(recording.reference, hypothesis)
+                errors += recording_errors
+                words += recording_words
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = get_cpu_seconds() - cpu_start
+        finally:
+            rtstt.close()
+        audio_minutes = audio_seconds / 60
+        endpoints = sum(counter.get() for counter in endpoint_counters) - endpoints_before
+        early_endpoints = early.get() - early_before
+        return {
+            "wer": round(errors / words, 4) if words else 0.0,
+            "real_time_factor": round(wall_seconds / audio_seconds, 4) if audio_seconds else 0.0,
+            "cpu_seconds_per_audio_minute": round(cpu_seconds / audio_minutes, 3) if audio_minutes else 0.0,
+            "layer1_calls": first_vad.calls,
+            "layer2_calls": second_vad.calls,
+            "layer3_calls": stt.calls,
+            "early_endpoints": int(early_endpoints),
+            "split_rate": round((splits.get() - splits_before) / early_endpoints, 3) if early_endpoints else 0.0,
+            "saved_ms_per_utterance": round((saved.get() - saved_before) * 1000 / endpoints, 1) if endpoints else 0.0,
+        }
+
+    @staticmethod
+    async def __iterate(chunks: list[bytes]) -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
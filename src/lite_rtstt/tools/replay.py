@@ -0,0 +1,124 @@
+"""Replay captured /rtstt traces with their original timing.
+
+Traces are played back concurrently. By default each trace starts at its original offset from
+the earliest trace, so bursts of connections are reproduced; within a trace every frame is sent
+at its original arrival offset. `speed` compresses or stretches all of the timing.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl
+
+from lite_rtstt.network.trace import FrameKind, Trace
+from lite_rtstt.stt.audio_format import AudioConverter, AudioFormat
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import RTSTTClient
+from lite_rtstt.tools.bench import BenchSession, FrameSession, InProcessSession, START_SPEAKING, STOP_SPEAKING, TEXT, summarize
+
+
+class ConvertingSession(FrameSession):
+    """Converts a trace's input format to native PCM before an in-process session."""
+
+    def __init__(self, session: BenchSession, converter: AudioConverter, frame_converter: AudioConverter) -> None:
+        self.__session = session
+        self.__converter = converter
+        self.__frame_converter = frame_converter
+
+    @staticmethod
+    def open(rtstt_client: RTSTTClient, query: str, config: STTConfig) -> "ConvertingSession":
+        audio_format = AudioFormat.from_query(dict(parse_qsl(query)), config)
+        converter = AudioConverter(audio_format, config)
+        # As on the server, binary messages are split into chunks even in the native format.
+        frame_converter = AudioConverter(audio_format, config, allow_passthrough=False) if converter.is_passthrough() else converter
+        return ConvertingSession(InProcessSession(rtstt_client), converter, frame_converter)
+
+    async def send(self, chunk: bytes) -> None:
+        for converted in self.__converter.convert(chunk):
+            await self.__session.send(converted)
+
+    async def send_frame(self, audio: bytes) -> None:
+        for converted in self.__frame_converter.convert(audio):
+            await self.__session.send(converted)
+
+    def events(self):
+        return self.__session.events()
+
+    async def close(self) -> None:
+        await self.__session.close()
+
+
+class Replayer:
+
+    def __init__(
+        self,
+        open_session: Callable[[Trace], Awaitable[FrameSession]],
+        traces: list[Trace],
+        speed: float = 1.0,
+        simultaneous: bool = False,
+    ) -> None:
+        """Replay traces concurrently.
+
+        Args:
+            open_session: Opens a connection that declares the input format of the trace.
+            traces: Traces to replay.
+            speed: Replay speed. 1.0 keeps the captured timing.
+            simultaneous: Start every trace at once instead of at its captured start time.
+        """
+        self.__open_session = open_session
+        self.__traces = traces
+        self.__speed = speed
+        self.__simultaneous = simultaneous
+
+    async def run(self) -> dict:
+        earliest = min(trace.start_time_s for trace in self.__traces)
+        wall_start = time.perf_counter()
+        streams = await asyncio.gather(*(
+            self.__replay(trace, 0.0 if self.__simultaneous else (trace.start_time_s - earliest) / self.__speed)
+            for trace in self.__traces
+        ))
+        return {
+            "traces": len(self.__traces),
+            "speed": self.__speed,
+            "wall_seconds": round(time.perf_counter() - wall_start, 3),
+            "errors": [stream["error"] for stream in streams if stream["error"] is not None],
+            "frames": sum(stream["frames"] for stream in streams),
+            "send_lag_ms": summarize([lag for stream in streams for lag in stream["send_lag_ms"]]),
+            "events": {
+                name: sum(stream["events"][name] for stream in streams)
+                for name in (START_SPEAKING, STOP_SPEAKING, TEXT)
+            },
+        }
+
+    async def __replay(self, trace: Trace, delay_s: float) -> dict:
+        await asyncio.sleep(delay_s)
+        loop = asyncio.get_running_loop()
+        stream = {"frames": 0, "send_lag_ms": [], "events": {START_SPEAKING: 0, STOP_SPEAKING: 0, TEXT: 0}, "error": None}
+
+        async def receive(session: FrameSession) -> None:
+            async for event in session.events():
+                if event in stream["events"]:
+                    stream["events"][event] += 1
+
+        try:
+            session = await self.__open_session(trace)
+            receiver = asyncio.create_task(receive(session))
+            started = loop.time()
+            for frame in trace.frames:
+                target = started + frame.offset_s / self.__speed
+                wait = target - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                stream["send_lag_ms"].append(max(0.0, loop.time() - target) * 1000)
+                if frame.kind == FrameKind.EOF:
+                    break
+                if frame.kind == FrameKind.BINARY_AUDIO:
+                    await session.send_frame(frame.data)
+                else:
+                    await session.send(frame.data)
+                stream["frames"] += 1
+            # A trace without EOF ended with a disconnect; closing still lets the events drain.
+            await session.close()
+            await receiver
+        except Exception as e:
+            stream["error"] = f"{trace.name}: {e!r}"
+        return stream
@@ -0,0 +1,131 @@
+import io
+import unittest
+import wave
+
+import numpy
+
+from lite_rtstt.stt.audio_format import AudioConverter, AudioEncoding, AudioFormat, PolyphaseResampler, parse_wav_header
+from lite_rtstt.stt.config import STTConfig
+from test.utils import from_int16_pcm
+
+try:
+    import opuslib
+except Exception:
+    opuslib = None
+
+
+def sine(frequency: int, sample_rate: int, duration_s: float) -> numpy.ndarray:
+    t = numpy.arange(int(sample_rate * duration_s)) / sample_rate
+    return (0.5 * numpy.sin(2 * numpy.pi * frequency * t)).astype(numpy.float32)
+
+
+def dominant_frequency(samples: numpy.ndarray, sample_rate: int) -> float:
+    spectrum = numpy.abs(numpy.fft.rfft(samples))
+    return numpy.argmax(spectrum) * sample_rate / len(samples)
+
+
+class AudioFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__config = STTConfig.default()
+
+    def test_from_query(self):
+        self.assertEqual(AudioFormat.native(self.__config), AudioFormat.from_query({}, self.__config))
+        actual = AudioFormat.from_query({"encoding": "mulaw", "sample_rate": "8000"}, self.__config)
+        self.assertEqual(AudioFormat(AudioEncoding.MULAW, 8000, 1), actual)
+        with self.assertRaises(ValueError):
+            AudioFormat.from_query({"encoding": "mp3"}, self.__config)
+        with self.assertRaises(ValueError):
+            AudioFormat.from_query({"sample_rate": "12345"}, self.__config)
+        with self.assertRaises(ValueError):
+            AudioFormat.from_query({"channels": "0"}, self.__config)
+
+    def test_parse_wav_header(self):
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(44100)
+            wav.writeframes(b"\x00" * 400)
+        data = output.getvalue()
+        self.assertEqual((AudioFormat(AudioEncoding.PCM_S16LE, 44100, 2), 44), parse_wav_header(data))
+        self.assertIsNone(parse_wav_header(data[:30]))
+        with self.assertRaises(ValueError):
+            parse_wav_header(b"RIFF\x00\x00\x00\x00AVI LIST")
+
+
+class PolyphaseResamplerTest(unittest.TestCase):
+
+    def test_keeps_frequency(self):
+        for rate in (8000, 44100, 48000):
+            resampler = PolyphaseResampler(rate, 16000)
+            output = resampler.process(sine(440, rate, 1.0))
+            self.assertEqual(16000, len(output))
+            self.assertAlmostEqual(440, dominant_frequency(output[1000:], 16000), delta=5)
+            self.assertAlmostEqual(0.5, numpy.abs(output[1000:]).max(), delta=0.01)
+
+    def test_chunk_boundaries_are_seamless(self):
+        signal = sine(1000, 44100, 0.5)
+        whole = PolyphaseResampler(44100, 16000).process(signal)
+        resampler = PolyphaseResampler(44100, 16000)
+        chunked = numpy.concatenate([resampler.process(chunk) for chunk in numpy.array_split(signal, 37)])
+        numpy.testing.assert_allclose(whole, chunked, atol=1e-6)
+
+    def test_removes_aliasing(self):
+        # 12 kHz is above the 8 kHz Nyquist limit of the output and must be filtered out.
+        output = PolyphaseResampler(48000, 16000).process(sine(12000, 48000, 0.5))
+        self.assertLess(numpy.abs(output[500:]).max(), 0.01)
+
+
+class AudioConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__config = STTConfig.default()
+
+    def test_passthrough(self):
+        converter = AudioConverter(AudioFormat.native(self.__config), self.__config)
+        self.assertTrue(converter.is_passthrough())
+        self.assertEqual([b"\x01\x02\x03"], converter.convert(b"\x01\x02\x03"))
+
+    def test_native_without_passthrough(self):
+        converter = AudioConverter(AudioFormat.native(self.__config), self.__config, allow_passthrough=False)
+        self.assertFalse(converter.is_passthrough())
+        chunks = converter.convert(b"\x01" * 1000) + converter.convert(b"\x01" * 1000)
+        self.assertEqual([b"\x01" * 960] * 2, chunks)
+
+    def test_stereo_48k(self):
+        voice = numpy.frombuffer(from_int16_pcm("test/data/7s_i16.pcm").to_bytes(), dtype=numpy.int16)
+        upsampled = PolyphaseResampler(16000, 48000).process(voice.astype(numpy.float32) / 32768.0)
+        stereo = numpy.repeat((upsampled * 32767).astype("<i2"), 2).tobytes()
+        converter = AudioConverter(AudioFormat(AudioEncoding.PCM_S16LE, 48000, 2), self.__config)
+
+        chunks = []
+        # Odd slice sizes split samples and frames across calls.
+        for i in range(0, len(stereo), 1001):
+            chunks.extend(converter.convert(stereo[i:i + 1001]))
+        self.assertTrue(all(len(chunk) == 960 for chunk in chunks))
+        self.assertAlmostEqual(len(voice) / 480, len(chunks), delta=1)
+
+    def test_mulaw(self):
+        converter = AudioConverter(AudioFormat(AudioEncoding.MULAW, 8000, 1), self.__config)
+        chunks = converter.convert(bytes([0xFF]) * 240 + bytes([0x80]) * 480)
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(0, numpy.abs(numpy.frombuffer(chunks[0][:400], dtype=numpy.int16)).max())
+        self.assertGreater(numpy.frombuffer(chunks[2][-400:], dtype=numpy.int16).min(), 30000)
+
+    @unittest.skipIf(opuslib is None, "opuslib or libopus is not installed")
+    def test_opus(self):
+        pcm = from_int16_pcm("test/data/7s_i16.pcm").to_bytes()
+        encoder = opuslib.Encoder(16000, 1, opuslib.APPLICATION_VOIP)
+        packets = [encoder.encode(pcm[i:i + 640], 320) for i in range(0, len(pcm) - 639, 640)]
+        converter = AudioConverter(AudioFormat(AudioEncoding.OPUS, 48000, 1), self.__config)
+
+        chunks = []
+        for packet in packets:
+            chunks.extend(converter.convert(packet))
+        self.assertTrue(all(len(chunk) == 960 for chunk in chunks))
+        self.assertAlmostEqual(len(packets) * 320 / 480, len(chunks), delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import MockVADClient
+from lite_rtstt.tools.batch import BatchTranscriber, collect_inputs, load_completed
+
+
+class BatchTranscriberTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__temp_dir = tempfile.TemporaryDirectory()
+        self.__config = replace(STTConfig.default(), **{
+            "duration_time_ms": 60,
+            "active_to_detection_ms": 90,
+        })
+        self.__first_vad = MockVADClient()
+        self.__second_vad = MockVADClient()
+        self.__stt = MockSTTClient()
+        self.__client = ThreeLayerRTSTTClient(self.__config, self.__first_vad, self.__second_vad, self.__stt)
+        self.__client.start()
+
+    async def asyncTearDown(self):
+        self.__client.close()
+        self.__temp_dir.cleanup()
+
+    def __write_pcm(self, name: str, chunks: int) -> str:
+        path = os.path.join(self.__temp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(b"\x00" * 960 * chunks)
+        return path
+
+    async def test_run(self):
+        path = self.__write_pcm("a.pcm", 9)
+        empty = self.__write_pcm("b.pcm", 0)
+        self.assertEqual([path, empty], collect_inputs([self.__temp_dir.name]))
+
+        await self.__first_vad.append_results(True, False, False, True, True)
+        await self.__second_vad.append_results(True, True)
+        await self.__stt.append_results("one", "two")
+        output = io.StringIO()
+        await BatchTranscriber(self.__client, self.__config, output, 2, 1).run([path, empty])
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        segments = [record for record in records if "text" in record]
+        self.assertEqual(["one", "two"], [segment["text"] for segment in segments])
+        summaries = {record["file"]: record for record in records if record.get("done")}
+        self.assertEqual(2, summaries[path]["segments"])
+        self.assertEqual(0.27, summaries[path]["audio_seconds"])
+        self.assertEqual(0, summaries[empty]["segments"])
+
+    def test_load_completed(self):
+        output_path = os.path.join(self.__temp_dir.name, "out.jsonl")
+        with open(output_path, "w") as f:
+            f.write(json.dumps({"file": "a", "index": 0, "text": "x"}) + "\n")
+            f.write(json.dumps({"file": "a", "done": True}) + "\n")
+            f.write(json.dumps({"file": "b", "index": 0, "text": "y"}) + "\n")
+            f.write('{"file": "b", "ind')
+        self.assertEqual({"a"}, load_completed(output_path))
+        with open(output_path, "r") as f:
+            self.assertEqual(["a", "a"], [json.loads(line)["file"] for line in f])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lite_rtstt.metrics import REGISTRY
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import WebRTCClient
+from lite_rtstt.tools.bench import InProcessSession, LoadGenerator, get_metrics_url, load_corpus, read_local_process, scrape_process, summarize
+from test.utils import EnergyVADClient
+
+
+class LoadGeneratorTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__config = STTConfig.default()
+        self.__second_vad = EnergyVADClient()
+        self.__stt = MockSTTClient()
+        self.__client = ThreeLayerRTSTTClient(self.__config, WebRTCClient(self.__config), self.__second_vad, self.__stt)
+        self.__client.start()
+
+    async def asyncTearDown(self):
+        self.__client.close()
+
+    def test_summarize(self):
+        self.assertEqual({"count": 0}, summarize([]))
+        summary = summarize(list(range(101)))
+        self.assertEqual(50, summary["p50"])
+        self.assertEqual(99, summary["p99"])
+        self.assertEqual(100, summary["max"])
+
+    async def test_run(self):
+        corpus = load_corpus(["test/data/7s_i16.pcm"], self.__config)
+        self.assertTrue(any(corpus[0].voiced))
+        await self.__stt.append_results(*["text"] * 100)
+
+        async def open_session():
+            return InProcessSession(self.__client)
+
+        generator = LoadGenerator(open_session, corpus, self.__config, clients=3, stagger_ms=100, speed=20.0)
+        report = await generator.run()
+        self.assertEqual([], report["errors"])
+        self.assertEqual(3, report["clients"])
+        latency = report["latency_ms"]
+        self.assertGreaterEqual(latency["stop_to_text"]["count"], 3)
+        self.assertEqual(latency["stop_to_text"]["count"], latency["speech_end_to_text"]["count"])
+        self.assertGreaterEqual(latency["start_detection"]["count"], 3)
+        self.assertEqual(3, report["real_time_factor"]["count"])
+        self.assertGreater(report["bench_process"]["peak_rss_bytes"], 0)
+        self.assertNotIn("server_process", report)
+
+    async def test_pacing_during_transcription(self):
+        corpus = load_corpus(["test/data/7s_i16.pcm"], self.__config)
+
+        async def transcribe_late():
+            # Transcriptions finish only once the whole recording should have been sent.
+            await asyncio.sleep(0.6)
+            await self.__stt.append_results(*["text"] * 100)
+
+        async def open_session():
+            return InProcessSession(self.__client)
+
+        generator = LoadGenerator(open_session, corpus, self.__config, clients=1, stagger_ms=0, speed=20.0)
+        transcriber = asyncio.create_task(transcribe_late())
+        report = await generator.run()
+        await transcriber
+        self.assertEqual([], report["errors"])
+        self.assertGreaterEqual(report["latency_ms"]["stop_to_text"]["count"], 1)
+        # The speaker kept to the clock while its first utterance waited for text.
+        self.assertLess(report["send_lag_ms"]["max"], 100)
+
+    async def test_server_process(self):
+        corpus = load_corpus(["test/data/7s_i16.pcm"], self.__config)
+        await self.__stt.append_results(*["text"] * 100)
+
+        async def open_session():
+            return InProcessSession(self.__client)
+
+        generator = LoadGenerator(open_session, corpus, self.__config, clients=1, stagger_ms=0, speed=20.0, server_process=read_local_process)
+        report = await generator.run()
+        self.assertGreaterEqual(report["server_process"]["cpu_seconds"], 0)
+        self.assertGreater(report["server_process"]["rss_bytes"]["count"], 0)
+
+    async def test_scrape_process(self):
+        self.assertEqual("http://host:8766/metrics", get_metrics_url("ws://host:8766/rtstt?encoding=mulaw"))
+        self.assertEqual("https://host/metrics", get_metrics_url("wss://host/rtstt"))
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = REGISTRY.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            cpu_seconds, rss_bytes = await scrape_process(get_metrics_url(f"ws://127.0.0.1:{server.server_port}/rtstt"))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertGreater(cpu_seconds, 0)
+        self.assertGreater(rss_bytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
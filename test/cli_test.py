@@ -0,0 +1,27 @@
+import json
+import subprocess
+import sys
+import unittest
+
+from lite_rtstt.main import COMMANDS, load_command
+
+
+class CommandLoadingTest(unittest.TestCase):
+
+    def test_load_every_command(self):
+        for command in COMMANDS:
+            self.assertTrue(callable(load_command(command)))
+
+    def test_client_commands_stay_light(self):
+        script = (
+            "import json, sys\n"
+            "from lite_rtstt.main import load_command\n"
+            "load_command('live'); load_command('transcribe')\n"
+            "print(json.dumps([name for name in ('torch', 'whisper', 'silero_vad', 'fastapi', 'uvicorn') if name in sys.modules]))\n"
+        )
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        self.assertEqual([], json.loads(output))
+
+
+if __name__ == '__main__':
+    unittest.main()
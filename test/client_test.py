@@ -0,0 +1,155 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from websockets.asyncio.server import serve
+
+from lite_rtstt.cli.client import AudioQueue, SendStats, _print_live_events, _stream_audio, _transcribe_file
+
+
+class AudioQueueTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_bounded(self):
+        queue = AudioQueue(60)
+        for i in range(3):
+            queue.put(bytes([i]) * 960, float(i))
+        # 30 ms pieces; the oldest no longer fits.
+        self.assertEqual(30, queue.dropped_ms)
+        queue.put_front([(b"\x09" * 960, -1.0)])
+        self.assertEqual([1.0, 2.0], [captured for _, captured in await queue.take()])
+        self.assertEqual(0, queue.get_ms())
+
+    async def test_take_waits(self):
+        queue = AudioQueue(1000)
+        taker = asyncio.create_task(queue.take())
+        await asyncio.sleep(0)
+        self.assertFalse(taker.done())
+        queue.put(b"\x00" * 960, 0.0)
+        self.assertEqual([(b"\x00" * 960, 0.0)], await taker)
+
+
+class FakeWebSocket:
+
+    def __init__(self, *messages: dict) -> None:
+        self.__messages = [json.dumps(message) for message in messages]
+
+    async def __aiter__(self):
+        for message in self.__messages:
+            yield message
+
+
+class LiveClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stop_speaking_clears_retained(self):
+        retained = AudioQueue(1000)
+        retained.put(b"\x00" * 960, 0.0)
+        await _print_live_events(FakeWebSocket({"type": "start speaking"}, {"type": "stop speaking"}), retained)
+        self.assertEqual(0, retained.get_ms())
+
+    async def test_reconnect_replays_audio(self):
+        connections: list[list[bytes | str]] = []
+        first_received = asyncio.Event()
+
+        async def handler(websocket) -> None:
+            messages = []
+            connections.append(messages)
+            async for message in websocket:
+                messages.append(message)
+                if isinstance(message, str) and json.loads(message)["type"] == "EOF":
+                    # As the server does once it has sent the last events.
+                    break
+                if len(connections) == 1:
+                    first_received.set()
+                    await websocket.close()
+
+        async with serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            backlog, stats = AudioQueue(1000), SendStats()
+            client = asyncio.create_task(_stream_audio(f"ws://127.0.0.1:{port}/rtstt", backlog, stats, 1000, min_reconnect_s=0.01))
+            first, second = b"\x01" * 960, b"\x02" * 960
+            backlog.put(first, 0.0)
+            await first_received.wait()
+            backlog.put(second, 0.0)
+            while len(connections) < 2 or b"".join(m for m in connections[1] if isinstance(m, bytes)) != first + second:
+                await asyncio.sleep(0.01)
+            client.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await client
+            # The client stopped with an EOF, after the audio.
+            self.assertEqual({"type": "EOF"}, json.loads(connections[1][-1]))
+        self.assertEqual([first], connections[0])
+        self.assertEqual(1, stats.reconnects)
+        # At least the first piece; the second too if it was sent as the connection closed.
+        self.assertGreaterEqual(stats.replayed_ms, 30)
+
+
+class FileClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stays_within_credit(self):
+        window_ms = 90
+        received: list[bytes] = []
+        in_flight_ms: list[float] = []
+        queries: list[str] = []
+
+        async def handler(websocket) -> None:
+            queries.append(websocket.request.path)
+            await websocket.send(json.dumps({"type": "credit", "ms": window_ms}))
+            outstanding_ms = 0.0
+            async for message in websocket:
+                if isinstance(message, str):
+                    self.assertEqual({"type": "EOF"}, json.loads(message))
+                    await websocket.send(json.dumps({"type": "text", "text": "hello"}))
+                    await websocket.send(json.dumps({"type": "end"}))
+                    # A client that waits for the server to close instead of for "end" times out.
+                    await websocket.wait_closed()
+                    return
+                received.append(message)
+                outstanding_ms += len(message) / 32
+                in_flight_ms.append(outstanding_ms)
+                # Consumed at once, in 30 ms chunks.
+                await websocket.send(json.dumps({"type": "credit", "ms": outstanding_ms}))
+                outstanding_ms = 0.0
+
+        audio = bytes(range(256)) * 30
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "audio.pcm")
+            with open(path, "wb") as f:
+                f.write(audio)
+            async with serve(handler, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                await asyncio.wait_for(_transcribe_file(f"ws://127.0.0.1:{port}/rtstt", path), 5)
+        self.assertEqual(["/rtstt?credits=1"], queries)
+        self.assertEqual(audio, b"".join(received))
+        self.assertLessEqual(max(in_flight_ms), window_ms)
+
+    async def test_paced_without_credit(self):
+        received: list[bytes] = []
+
+        async def handler(websocket) -> None:
+            # A server from before flow control: JSON audio only, no credit, no "end", a close after EOF.
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    await websocket.close(code=1003, reason="binary audio is not supported")
+                    return
+                message = json.loads(message)
+                if message["type"] == "EOF":
+                    return
+                self.assertEqual("audio chunk", message["type"])
+                received.append(base64.b64decode(message["data"]))
+
+        audio = bytes(range(256)) * 15
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "audio.pcm")
+            with open(path, "wb") as f:
+                f.write(audio)
+            async with serve(handler, "127.0.0.1", 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                with patch("lite_rtstt.cli.client.PACED_TAIL_MS", 60):
+                    await asyncio.wait_for(_transcribe_file(f"ws://127.0.0.1:{port}/rtstt", path, first_credit_timeout_s=0.05), 5)
+        # The file in 30 ms pieces, then the silent tail.
+        self.assertEqual([960] * 6, [len(piece) for piece in received])
+        self.assertEqual(audio + bytes(1920), b"".join(received))
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import unittest
+from dataclasses import replace
+
+import torch
+
+from lite_rtstt.cpu_plan import CPUPinning, WorkerPlan, _parse_cpus, plan_cpus
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.inference import InferenceExecutor
+
+
+class CPUPlanTest(unittest.TestCase):
+
+    def test_parse_cpus(self):
+        self.assertEqual(frozenset({0, 1, 2, 3, 8, 10, 11}), _parse_cpus("0-3,8,10-11\n"))
+
+    def test_single_cpu(self):
+        plan = plan_cpus(STTConfig.default(), [0])
+        self.assertEqual((0,), plan.event_loop_cpus)
+        self.assertEqual((WorkerPlan(1, None),) * 4, plan.silero)
+        self.assertEqual((WorkerPlan(1, None),), plan.whisper)
+
+    def test_cores(self):
+        config = replace(STTConfig.default(), whisper_threads=2, cpu_pinning="cores")
+        plan = plan_cpus(config, list(range(16)))
+        self.assertEqual((0,), plan.event_loop_cpus)
+        # A quarter of the 15 model cores for Silero, one thread per worker.
+        self.assertEqual([frozenset({1}), frozenset({2}), frozenset({3}), frozenset({1})], [worker.cpus for worker in plan.silero])
+        self.assertEqual([WorkerPlan(6, frozenset(range(4, 10))), WorkerPlan(6, frozenset(range(10, 16)))], list(plan.whisper))
+
+    def test_cpu_cores_limit(self):
+        config = replace(STTConfig.default(), cpu_cores=4, vad_threads=2)
+        plan = plan_cpus(config, list(range(16)))
+        self.assertEqual([1, 1], [worker.torch_threads for worker in plan.silero])
+        self.assertEqual([WorkerPlan(2, None)], list(plan.whisper))
+
+    def test_numa(self):
+        config = replace(STTConfig.default(), vad_threads=1, cpu_pinning="numa")
+        nodes = {0: frozenset(range(4)), 1: frozenset(range(4, 8))}
+        plan = plan_cpus(config, list(range(8)), nodes)
+        self.assertEqual(CPUPinning.NUMA, plan.pinning)
+        self.assertEqual(nodes[0], plan.silero[0].cpus)
+        self.assertEqual(WorkerPlan(6, frozenset(range(8))), plan.whisper[0])
+        # Without NUMA information nothing is pinned.
+        self.assertEqual(CPUPinning.OFF, plan_cpus(config, list(range(8)), {}).pinning)
+
+
+class WorkerThreadsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_each_worker_keeps_its_count(self):
+        plans = [WorkerPlan(1, None), WorkerPlan(3, None)]
+        loading = threading.Barrier(len(plans))
+        running = threading.Barrier(len(plans))
+
+        def load(index: int) -> int:
+            # Both workers have set their counts before either runs its first parallel op.
+            loading.wait()
+            torch.ones(1 << 20).sum()
+            return index
+
+        def infer(index: int, inputs: list[None]) -> list[tuple[int, int]]:
+            # Holds each worker until the other one runs, so both answer.
+            running.wait()
+            torch.ones(1 << 20).sum()
+            return [(index, torch.get_num_threads())] * len(inputs)
+
+        executor = InferenceExecutor("test", len(plans), load, infer, cpu_plan=plans)
+        executor.start()
+        try:
+            self.assertEqual([1, 3], executor.get_torch_threads())
+            answers = await asyncio.gather(executor.submit(None), executor.submit(None))
+            self.assertEqual([(0, 1), (1, 3)], sorted(answers))
+        finally:
+            executor.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+from lite_rtstt.metrics import ENDPOINT_SAVED, ENDPOINT_SPLITS, ENDPOINTS
+from lite_rtstt.stt.endpointing import Endpointer
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import MockVADClient
+from test.utils import get_silence_audio
+
+State = ThreeLayerRTSTTClient.AudioStreamStateMachine.State
+
+
+class EndpointerTest(unittest.TestCase):
+
+    def test_timeout(self):
+        endpointer = Endpointer(floor_chunks=5, ceiling_chunks=40)
+        for pause in (10, 12, 8):
+            endpointer.add_pause(pause)
+        # Too few pauses to trust.
+        self.assertEqual(40, endpointer.get_timeout_chunks())
+        endpointer.add_pause(9)
+        self.assertEqual(14, endpointer.get_timeout_chunks())
+        for _ in range(32):
+            endpointer.add_pause(1)
+        self.assertEqual(5, endpointer.get_timeout_chunks())
+        for _ in range(32):
+            endpointer.add_pause(100)
+        self.assertEqual(40, endpointer.get_timeout_chunks())
+
+
+class AdaptiveEndpointingTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__first_vad, self.__second_vad, self.__stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        for client in (self.__first_vad, self.__second_vad, self.__stt):
+            client.start()
+        self.__state_machine = ThreeLayerRTSTTClient.AudioStreamStateMachine(
+            self.__first_vad, self.__second_vad, self.__stt, 10, 3, 500, Endpointer(2, 10), 30,
+        )
+        self.__chunk = get_silence_audio(30).to_bytes()
+
+    async def __feed(self, *first_vad_results: bool) -> tuple[State, State, object]:
+        await self.__first_vad.append_results(*first_vad_results)
+        result = None
+        for _ in first_vad_results:
+            result = await self.__state_machine.feed(self.__chunk)
+        return result
+
+    async def __start_speaking(self) -> None:
+        await self.__feed(True)
+        await self.__second_vad.append_results(True)
+        # Layer 2 runs once three chunks are buffered.
+        await self.__state_machine.feed(self.__chunk)
+        _, state, _ = await self.__state_machine.feed(self.__chunk)
+        self.assertEqual(State.SPEAKING, state)
+
+    async def test_early_cut_and_split(self):
+        early, saved, splits = ENDPOINTS.labels("early"), ENDPOINT_SAVED.labels(), ENDPOINT_SPLITS.labels()
+        early_before, saved_before, splits_before = early.get(), saved.get(), splits.get()
+        await self.__start_speaking()
+        # Four one-chunk pauses teach a timeout of three chunks.
+        for _ in range(4):
+            await self.__feed(False, True)
+        self.assertEqual((State.SPEAKING, State.SPEAKING, None), await self.__feed(False, False))
+        # Silero hears nothing in the pause, so it ends the utterance.
+        await self.__second_vad.append_results(False)
+        await self.__stt.append_results("first")
+        _, state, task = await self.__feed(False)
+        self.assertEqual(State.SILENCE, state)
+        self.assertEqual("first", await task)
+        self.assertEqual(early_before + 1, early.get())
+        # The fixed timeout of ten chunks would have waited for three more.
+        self.assertAlmostEqual(saved_before + 0.09, saved.get())
+
+        # Speech resumes at once: the cut split an utterance.
+        await self.__start_speaking()
+        self.assertEqual(splits_before + 1, splits.get())
+
+    async def test_speech_in_pause(self):
+        early = ENDPOINTS.labels("early")
+        early_before = early.get()
+        await self.__start_speaking()
+        for _ in range(4):
+            await self.__feed(False, True)
+        await self.__second_vad.append_results(True)
+        # Silero hears speech WebRTC missed, so the fixed timeout decides.
+        self.assertEqual((State.SPEAKING, State.SPEAKING, None), await self.__feed(False, False, False))
+        await self.__stt.append_results("whole")
+        _, state, task = await self.__feed(False, False, False)
+        self.assertEqual(State.SILENCE, state)
+        self.assertEqual("whole", await task)
+        self.assertEqual(early_before, early.get())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.stt_client import STTClient
+from lite_rtstt.stt.vad_client import WebRTCClient
+from lite_rtstt.tools.evaluate import CountingVADClient, Evaluator, load_labelled_corpus, pareto_front, parse_grid, word_errors
+from test.utils import EnergyVADClient
+
+
+class FixedSTTClient(STTClient):
+
+    def __init__(self, text: str) -> None:
+        self.__text = text
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        return self.__text
+
+
+class EvaluateTest(unittest.IsolatedAsyncioTestCase):
+
+    def test_word_errors(self):
+        self.assertEqual((0, 3), word_errors("Hello, big world.", "hello big world"))
+        self.assertEqual((1, 3), word_errors("hello big world", "hello world"))
+        self.assertEqual((2, 2), word_errors("hello world", ""))
+        self.assertEqual((1, 2), word_errors("hello world", "hello word"))
+
+    def test_parse_grid(self):
+        configs = parse_grid(["whisper_model=tiny,base", "aggresiveness=1,3"], STTConfig.default())
+        self.assertEqual(4, len(configs))
+        self.assertEqual(("tiny", 1), (configs[0].whisper_model, configs[0].aggresiveness))
+        self.assertEqual(("base", 3), (configs[3].whisper_model, configs[3].aggresiveness))
+        with self.assertRaises(ValueError):
+            parse_grid(["unknown=1"], STTConfig.default())
+
+    def test_parse_grid_bool(self):
+        configs = parse_grid(["gate_tuning=true,False,1,0"], STTConfig.default())
+        self.assertEqual([True, False, True, False], [config.gate_tuning for config in configs])
+        with self.assertRaises(ValueError):
+            parse_grid(["gate_tuning=yes"], STTConfig.default())
+
+    async def test_counting_streams(self):
+        client = CountingVADClient(WebRTCClient(STTConfig.default()))
+        client.start()
+        first, second = client.create_stream(), client.create_stream()
+        # Every stream gets its own tunable WebRTC VAD, as on the server.
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_tunable())
+        first.set_aggressiveness(3)
+        await first.is_active(AudioBuffer.from_bytes(b"\x00" * 960))
+        await second.is_active(AudioBuffer.from_bytes(b"\x00" * 960))
+        self.assertEqual(2, client.calls)
+        self.assertTrue(client.is_ready())
+        self.assertEqual(0.0, client.get_queue_wait_ms())
+
+    def test_pareto_front(self):
+        rows = [
+            {"wer": 0.1, "real_time_factor": 0.5, "cpu_seconds_per_audio_minute": 30},
+            {"wer": 0.2, "real_time_factor": 0.1, "cpu_seconds_per_audio_minute": 6},
+            {"wer": 0.2, "real_time_factor": 0.6, "cpu_seconds_per_audio_minute": 30},
+        ]
+        self.assertEqual([0, 1], pareto_front(rows))
+
+    async def test_run(self):
+        corpus = [recording for recording in load_labelled_corpus(["test/data"]) if recording.name == "7s_i16.pcm"]
+        self.assertEqual(1, len(corpus))
+
+        def create_clients(config: STTConfig):
+            return WebRTCClient(config), EnergyVADClient(), FixedSTTClient(corpus[0].reference)
+
+        configs = parse_grid(["aggresiveness=1,3"], STTConfig.default())
+        report = await Evaluator(corpus, create_clients).run(configs, ["aggresiveness"])
+        self.assertEqual(["7s_i16.pcm"], report["corpus"])
+        self.assertEqual(2, len(report["results"]))
+        for row in report["results"]:
+            self.assertEqual(0.0, row["wer"])
+            self.assertEqual(1, row["layer3_calls"])
+            self.assertGreater(row["layer1_calls"], row["layer2_calls"])
+            self.assertGreater(row["layer2_calls"], 0)
+        self.assertGreaterEqual(len(report["pareto_front"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+from lite_rtstt.stt.event import BoundedSTTEventQueue, EventFactory, SlowConsumerPolicy, StartSpeakingEvent, StopSpeakingEvent
+
+
+class BoundedSTTEventQueueTest(unittest.IsolatedAsyncioTestCase):
+
+    async def drain(self, queue: BoundedSTTEventQueue) -> list:
+        await queue.close()
+        events = []
+        try:
+            while True:
+                events.append(await queue.get())
+        except asyncio.QueueShutDown:
+            return events
+
+    async def test_coalesce(self):
+        queue = BoundedSTTEventQueue(3, SlowConsumerPolicy.COALESCE)
+        first, second = EventFactory.text_event("first"), EventFactory.text_event("second")
+        for event in (EventFactory.start_speaking_event(), EventFactory.stop_speaking_event(), first, EventFactory.start_speaking_event(), second):
+            await queue.put(event)
+        # Start and stop of the first utterance made room for the newer events.
+        events = await self.drain(queue)
+        self.assertEqual(first, events[0])
+        self.assertIsInstance(events[1], StartSpeakingEvent)
+        self.assertEqual(second, events[2])
+        self.assertFalse(queue.is_overflowed())
+
+    async def test_coalesce_overflow(self):
+        queue = BoundedSTTEventQueue(2, SlowConsumerPolicy.COALESCE)
+        await queue.put(EventFactory.text_event("first"))
+        await queue.put(EventFactory.text_event("second"))
+        # A speaking event is dropped rather than a text.
+        await queue.put(EventFactory.stop_speaking_event())
+        self.assertFalse(queue.is_overflowed())
+        await queue.put(EventFactory.text_event("third"))
+        self.assertTrue(queue.is_overflowed())
+        with self.assertRaises(asyncio.QueueShutDown):
+            await queue.get()
+
+    async def test_drop_oldest(self):
+        queue = BoundedSTTEventQueue(2, SlowConsumerPolicy.DROP_OLDEST)
+        texts = [EventFactory.text_event(str(i)) for i in range(4)]
+        for event in texts:
+            await queue.put(event)
+        await queue.put(None)
+        self.assertEqual([texts[2], texts[3], None], await self.drain(queue))
+
+    async def test_disconnect(self):
+        queue = BoundedSTTEventQueue(1, SlowConsumerPolicy.DISCONNECT)
+        await queue.put(EventFactory.start_speaking_event())
+        getter = asyncio.create_task(queue.get())
+        self.assertIsInstance(await getter, StartSpeakingEvent)
+        getter = asyncio.create_task(queue.get())
+        await queue.put(EventFactory.stop_speaking_event())
+        self.assertIsInstance(await getter, StopSpeakingEvent)
+        await queue.put(EventFactory.start_speaking_event())
+        await queue.put(EventFactory.stop_speaking_event())
+        self.assertTrue(queue.is_overflowed())
+        # Later events are ignored, so the producer never fails.
+        await queue.put(EventFactory.text_event("late"))
+        with self.assertRaises(asyncio.QueueShutDown):
+            await queue.get()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+    async def test_close_wakes_consumer(self):
+        queue = BoundedSTTEventQueue(1, SlowConsumerPolicy.COALESCE)
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        await queue.close()
+        with self.assertRaises(asyncio.QueueShutDown):
+            await getter
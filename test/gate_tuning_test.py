@@ -0,0 +1,70 @@
+import unittest
+from dataclasses import replace
+
+from lite_rtstt.metrics import TUNED_STREAMS_BY_AGGRESSIVENESS, TUNED_STREAMS_BY_DETECTION_WINDOW, VAD_CHECKS
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.gate_tuning import GateTuner
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import MockVADClient, WebRTCClient, WebRTCStreamClient
+
+
+class GateTunerTest(unittest.TestCase):
+
+    def test_adjust(self):
+        aggressiveness_2 = TUNED_STREAMS_BY_AGGRESSIVENESS.labels("2")
+        window_1500 = TUNED_STREAMS_BY_DETECTION_WINDOW.labels("1500")
+        before = aggressiveness_2.get(), window_1500.get()
+        tuner = GateTuner(WebRTCStreamClient(1, 16000), 1, 2, 30, 50, 30)
+        # Stricter aggressiveness first, then longer windows, up to the bounds.
+        settings = []
+        for _ in range(4):
+            for _ in range(GateTuner.MIN_CHECKS):
+                tuner.record(True)
+            settings.append((tuner.get_aggressiveness(), tuner.get_window_chunks()))
+        self.assertEqual([(2, 30), (2, 40), (2, 50), (2, 50)], settings)
+        self.assertEqual((before[0] + 1, before[1] + 1), (aggressiveness_2.get(), window_1500.get()))
+
+        # Back towards the configured gate once layer 2 agrees with layer 1 again.
+        for _ in range(40):
+            tuner.record(False)
+        self.assertEqual((1, 30), (tuner.get_aggressiveness(), tuner.get_window_chunks()))
+        tuner.close()
+        tuner.close()
+        self.assertEqual(before, (aggressiveness_2.get(), window_1500.get()))
+
+    def test_streams_get_own_webrtc(self):
+        client = WebRTCClient(STTConfig.default())
+        self.assertIsNot(client.create_stream(), client.create_stream())
+        mock = MockVADClient()
+        self.assertIs(mock, mock.create_stream())
+
+
+class GateTuningTest(unittest.IsolatedAsyncioTestCase):
+
+    async def __count_layer2_calls(self, gate_tuning: bool) -> int:
+        config = replace(STTConfig.default(), active_to_detection_ms=90, max_active_to_detection_ms=390, gate_tuning=gate_tuning)
+        first_vad, second_vad = MockVADClient(), MockVADClient()
+        client = ThreeLayerRTSTTClient(config, first_vad, second_vad, MockSTTClient())
+        client.start()
+        # Layer 1 hears voice in the noise, Silero never does.
+        await first_vad.append_results(*[True] * 300)
+        await second_vad.append_results(*[False] * 300)
+        rejected = VAD_CHECKS.labels("2", "reject")
+        before = rejected.get()
+        _, connection_id = client.connect()
+        for _ in range(300):
+            await client.feed(connection_id, b"\x00" * 960)
+        client.disconnect(connection_id)
+        client.close()
+        return rejected.get() - before
+
+    async def test_fewer_layer2_calls(self):
+        fixed = await self.__count_layer2_calls(False)
+        tuned = await self.__count_layer2_calls(True)
+        self.assertEqual(100, fixed)
+        self.assertLess(tuned, fixed / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
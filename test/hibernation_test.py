@@ -0,0 +1,75 @@
+import unittest
+
+from lite_rtstt.metrics import HIBERNATING_STREAMS
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import MockVADClient
+
+State = ThreeLayerRTSTTClient.AudioStreamStateMachine.State
+
+
+class RecordingVADClient(MockVADClient):
+    """Hears speech in everything and keeps what it was asked about."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.buffers: list[bytes] = []
+
+    async def is_active(self, audio_buffer: AudioBuffer) -> bool:
+        self.buffers.append(audio_buffer.to_bytes())
+        return True
+
+
+class HibernationTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__first_vad, self.__second_vad, self.__stt = MockVADClient(), RecordingVADClient(), MockSTTClient()
+        for client in (self.__first_vad, self.__second_vad, self.__stt):
+            client.start()
+        self.__state_machine = ThreeLayerRTSTTClient.AudioStreamStateMachine(
+            self.__first_vad, self.__second_vad, self.__stt, 10, 2, 500,
+            pre_roll_chunks=2, hibernate_after_chunks=5,
+        )
+        self.__hibernating = HIBERNATING_STREAMS.labels()
+        self.__hibernating_before = self.__hibernating.get()
+
+    async def __feed(self, first_vad_result: bool, index: int) -> tuple[State, State, object]:
+        await self.__first_vad.append_results(first_vad_result)
+        return await self.__state_machine.feed(self.__chunk(index))
+
+    @staticmethod
+    def __chunk(index: int) -> bytes:
+        return bytes([index]) * 960
+
+    async def test_pre_roll(self):
+        for i in range(4):
+            await self.__feed(False, i)
+        await self.__feed(True, 4)
+        await self.__feed(True, 5)
+        # Only the last two silent chunks stay ahead of the utterance.
+        self.assertEqual([b"".join(self.__chunk(i) for i in (2, 3, 4, 5))], self.__second_vad.buffers)
+
+    async def test_hibernate_and_wake(self):
+        for i in range(4):
+            self.assertEqual((State.SILENCE, State.SILENCE, None), await self.__feed(False, i))
+        self.assertEqual((State.SILENCE, State.HIBERNATING, None), await self.__feed(False, 4))
+        self.assertEqual(self.__hibernating_before + 1, self.__hibernating.get())
+        self.assertEqual((State.HIBERNATING, State.HIBERNATING, None), await self.__feed(False, 5))
+
+        # The first active chunk wakes the stream and starts the utterance.
+        self.assertEqual((State.HIBERNATING, State.ACTIVE, None), await self.__feed(True, 6))
+        self.assertEqual(self.__hibernating_before, self.__hibernating.get())
+        self.assertEqual((State.ACTIVE, State.SPEAKING, None), await self.__feed(True, 7))
+        self.assertEqual([self.__chunk(6) + self.__chunk(7)], self.__second_vad.buffers)
+
+    async def test_close_while_hibernating(self):
+        for i in range(5):
+            await self.__feed(False, i)
+        self.assertEqual(self.__hibernating_before + 1, self.__hibernating.get())
+        self.assertEqual((State.HIBERNATING, State.SILENCE, None), await self.__state_machine.flush())
+        self.assertEqual(self.__hibernating_before, self.__hibernating.get())
+        for i in range(5):
+            await self.__feed(False, i)
+        self.__state_machine.close()
+        self.assertEqual(self.__hibernating_before, self.__hibernating.get())
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import unittest
+
+from lite_rtstt.metrics import INFERENCE_CANCELLED
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.inference import InferenceExecutor, InferenceTiming
+
+
+class GatedModel:
+    """Doubles its inputs once the gate opens, and keeps the batches it was given."""
+
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.batches: list[list[int]] = []
+
+    def infer(self, model: "GatedModel", inputs: list[int]) -> list[int]:
+        self.entered.set()
+        self.gate.wait()
+        self.batches.append(inputs)
+        return [value * 2 for value in inputs]
+
+
+class InferenceExecutorTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__model = GatedModel()
+        self.__executor = InferenceExecutor("test", 1, lambda index: self.__model, self.__model.infer, max_batch_size=3)
+        self.__executor.start()
+
+    async def asyncTearDown(self):
+        self.__model.gate.set()
+        self.__executor.close()
+
+    async def __submit_held(self, value: int) -> asyncio.Task:
+        """Submit work and wait until the worker holds it at the gate."""
+        task = asyncio.create_task(self.__executor.submit(value))
+        await asyncio.to_thread(self.__model.entered.wait)
+        return task
+
+    async def __wait_for_queue_depth(self, depth: int) -> None:
+        while self.__executor.get_queue_depth() != depth:
+            await asyncio.sleep(0.001)
+
+    async def test_batches_and_timing(self):
+        # The worker holds the first input while the others queue up behind it.
+        first = await self.__submit_held(1)
+        timing = InferenceTiming()
+        rest = [asyncio.create_task(self.__executor.submit(value, timing if value == 2 else None)) for value in (2, 3, 4, 5)]
+        await self.__wait_for_queue_depth(4)
+        self.__model.gate.set()
+        self.assertEqual([2, 4, 6, 8, 10], await asyncio.gather(first, *rest))
+        self.assertEqual([[1], [2, 3, 4], [5]], self.__model.batches)
+        self.assertLessEqual(timing.enqueued, timing.started)
+        self.assertLessEqual(timing.started, timing.ended)
+
+    async def test_cancel_queued_work(self):
+        cancelled = INFERENCE_CANCELLED.labels("test")
+        before = cancelled.get()
+        first = await self.__submit_held(1)
+        second = asyncio.create_task(self.__executor.submit(2))
+        await self.__wait_for_queue_depth(1)
+        second.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await second
+        self.assertEqual(0, self.__executor.get_queue_depth())
+        self.assertEqual(before + 1, cancelled.get())
+        self.__model.gate.set()
+        self.assertEqual(2, await first)
+        # The cancelled input never reached the model.
+        self.assertEqual([[1]], self.__model.batches)
+
+    async def test_drain_on_close(self):
+        first = await self.__submit_held(1)
+        second = asyncio.create_task(self.__executor.submit(2))
+        await self.__wait_for_queue_depth(1)
+        self.__model.gate.set()
+        await asyncio.to_thread(self.__executor.close)
+        # Queued work still ran; new work is refused.
+        self.assertEqual([2, 4], await asyncio.gather(first, second))
+        with self.assertRaises(RuntimeError):
+            await self.__executor.submit(3)
+
+
+class InferenceExecutorFailureTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_shed(self):
+        model = GatedModel()
+        executor = InferenceExecutor("test", 1, lambda index: model, model.infer, shed_after_s=0.01)
+        executor.start()
+        try:
+            first = asyncio.create_task(executor.submit(1))
+            await asyncio.to_thread(model.entered.wait)
+            second = asyncio.create_task(executor.submit(2))
+            await asyncio.sleep(0.05)
+            model.gate.set()
+            self.assertEqual(2, await first)
+            with self.assertRaises(OverloadedError):
+                await second
+        finally:
+            model.gate.set()
+            executor.close()
+
+    async def test_infer_error(self):
+        def infer(model, inputs):
+            raise ValueError("bad input")
+
+        executor = InferenceExecutor("test", 2, lambda index: None, infer)
+        executor.start()
+        try:
+            with self.assertRaises(ValueError):
+                await executor.submit(1)
+        finally:
+            executor.close()
+
+    def test_load_error(self):
+        def load(index: int):
+            if index == 1:
+                raise OSError("no model")
+
+        executor = InferenceExecutor("test", 2, load, lambda model, inputs: inputs)
+        with self.assertRaises(OSError):
+            executor.start()
+        self.assertFalse(executor.is_ready())
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from lite_rtstt.metrics import EVENT_LOOP_LAG, VAD_CHECKS, EventLoopLagMonitor, MetricsRegistry
+from lite_rtstt.network.route import create_router
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import MockRTSTTClient, ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import MockVADClient
+
+
+class MetricsRegistryTest(unittest.TestCase):
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "A counter.", ("kind",))
+        gauge = registry.gauge("test_gauge", "A gauge.")
+        histogram = registry.histogram("test_seconds", "A histogram.", buckets=(0.1, 1.0))
+        counter.labels("a").inc()
+        counter.labels("a").inc(2)
+        gauge.set_function(lambda: 7)
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE test_total counter", lines)
+        self.assertIn('test_total{kind="a"} 3', lines)
+        self.assertIn("test_gauge 7", lines)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("test_seconds_sum 5.55", lines)
+        self.assertIn("test_seconds_count 3", lines)
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+
+
+class InstrumentationTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_state_machine(self):
+        config = STTConfig.default()
+        first_vad, second_vad, stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        client = ThreeLayerRTSTTClient(config, first_vad, second_vad, stt)
+        client.start()
+        passed, rejected = VAD_CHECKS.labels("1", "pass"), VAD_CHECKS.labels("2", "reject")
+        passed_before, rejected_before = passed.get(), rejected.get()
+        await first_vad.append_results(False, True)
+        await second_vad.append_results(False)
+        _, connection_id = client.connect()
+        # The detection window counts from the chunk that woke layer 1 and fills on the last feed.
+        for _ in range(config.active_to_detection_ms // config.chunk_size_ms + 1):
+            await client.feed(connection_id, b"\x00" * 960)
+        self.assertEqual(passed_before + 1, passed.get())
+        self.assertEqual(rejected_before + 1, rejected.get())
+        client.close()
+
+    async def test_event_loop_lag(self):
+        before = EVENT_LOOP_LAG.labels().get_count()
+        monitor = EventLoopLagMonitor(interval_s=0.01)
+        monitor.start()
+        monitor.start()
+        await asyncio.sleep(0.1)
+        monitor.stop()
+        self.assertGreater(EVENT_LOOP_LAG.labels().get_count(), before)
+
+
+class MetricsRouteTest(unittest.TestCase):
+
+    def test_metrics(self):
+        rtstt = MockRTSTTClient()
+        rtstt.start()
+        app = FastAPI()
+        app.include_router(create_router(rtstt))
+        response = TestClient(app).get("/metrics")
+        self.assertEqual(200, response.status_code)
+        self.assertIn("rtstt_active_connections", response.text)
+        self.assertIn('rtstt_layer_pass_ratio{transition="1_to_2"}', response.text)
+        self.assertIn("# TYPE rtstt_inference_seconds histogram", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from lite_rtstt.network.route import create_router
+from lite_rtstt.profiling import get_thread_cpu_seconds, profile, sample_stacks
+from lite_rtstt.stt.rtstt_client import MockRTSTTClient
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def test_sample_stacks(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+        thread.start()
+        try:
+            stacks, rounds = sample_stacks(0.1, 0.005)
+            cpu = get_thread_cpu_seconds()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertGreater(rounds, 5)
+        busy = [stack for stack in stacks if stack.startswith("busy;")]
+        self.assertTrue(busy)
+        self.assertTrue(all("busy_loop" in stack for stack in busy))
+        self.assertIn("busy", cpu)
+
+    def test_profile(self):
+        result = profile(0.05, 0.01)
+        self.assertIn("MainThread", result["threads"])
+        self.assertTrue(result["torch"]["available"])
+        self.assertGreaterEqual(result["torch"]["num_threads"], 1)
+
+
+class ProfileRouteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__rtstt = MockRTSTTClient()
+        self.__rtstt.start()
+
+    def __client(self, admin_token: str | None) -> TestClient:
+        app = FastAPI()
+        app.include_router(create_router(self.__rtstt, admin_token=admin_token))
+        return TestClient(app)
+
+    def test_disabled_by_default(self):
+        self.assertEqual(404, self.__client(None).get("/admin/profile").status_code)
+
+    def test_profile(self):
+        client = self.__client("secret")
+        self.assertEqual(401, client.get("/admin/profile?seconds=0.05").status_code)
+        self.assertEqual(401, client.get("/admin/profile?seconds=0.05", headers={"Authorization": "Bearer wrong"}).status_code)
+        headers = {"Authorization": "Bearer secret"}
+        self.assertEqual(400, client.get("/admin/profile?seconds=600", headers=headers).status_code)
+        response = client.get("/admin/profile?seconds=0.05&interval_ms=5", headers=headers)
+        self.assertEqual(200, response.status_code)
+        self.assertIn("collapsed", response.json())
+        response = client.get("/admin/profile?seconds=0.05&format=collapsed", headers=headers)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from lite_rtstt.network.worker import HEADER, KIND_PING, KIND_WHISPER, WorkerServer, get_max_payload_bytes, read_frame
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.remote import RemoteInferencePool, RemoteSTTClient, RemoteVADClient, parse_addresses
+from lite_rtstt.stt.stt_client import STTClient
+from test.utils import EnergyVADClient, get_silence_audio
+
+
+class NamedSTTClient(STTClient):
+    """Answers with its name after a short delay, so requests overlap."""
+
+    def __init__(self, name: str) -> None:
+        self.__name = name
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        await asyncio.sleep(0.05)
+        return self.__name
+
+
+class RemoteInferencePoolTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__servers = {}
+        for name in ("a", "b"):
+            self.__servers[name] = await WorkerServer(EnergyVADClient(), NamedSTTClient(name)).start("127.0.0.1", 0)
+        addresses = [("127.0.0.1", server.sockets[0].getsockname()[1]) for server in self.__servers.values()]
+        self.__pool = RemoteInferencePool(addresses, connections_per_worker=2, health_interval_s=0.2)
+        self.__vad, self.__stt = RemoteVADClient(self.__pool), RemoteSTTClient(self.__pool)
+
+    async def asyncTearDown(self):
+        self.__pool.close()
+        for server in self.__servers.values():
+            server.close()
+            server.close_clients()
+        await asyncio.sleep(0)
+
+    def test_parse_addresses(self):
+        self.assertEqual([("localhost", 8767), ("10.0.0.2", 9000)], parse_addresses("localhost:8767, 10.0.0.2:9000"))
+        with self.assertRaises(ValueError):
+            parse_addresses("localhost")
+
+    async def test_balance(self):
+        self.assertTrue(await self.__vad.is_active(AudioBuffer.from_bytes(b"\x00\x40" * 480)))
+        self.assertFalse(await self.__vad.is_active(get_silence_audio(30)))
+        texts = await asyncio.gather(*(self.__stt.transcribe(get_silence_audio(30)) for _ in range(8)))
+        self.assertEqual(4, texts.count("a"))
+        self.assertEqual(4, texts.count("b"))
+
+    async def test_reject_oversized_frame(self):
+        port = self.__servers["a"].sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            writer.write(HEADER.pack(1, KIND_PING, 0))
+            self.assertEqual(1, (await read_frame(reader))[0])
+            # Only the header of an oversized frame is sent; the worker must not wait for its payload.
+            writer.write(HEADER.pack(2, KIND_WHISPER, get_max_payload_bytes(STTConfig.default()) + 1))
+            async with asyncio.timeout(1):
+                self.assertEqual(b"", await reader.read())
+        finally:
+            writer.close()
+
+    async def test_connection_limit(self):
+        address = ("127.0.0.1", self.__servers["a"].sockets[0].getsockname()[1])
+        pool = RemoteInferencePool([address], connections_per_worker=2, health_interval_s=0.2)
+        try:
+            with patch("asyncio.open_connection", wraps=asyncio.open_connection) as open_connection:
+                texts = await asyncio.gather(*(RemoteSTTClient(pool).transcribe(get_silence_audio(30)) for _ in range(8)))
+            self.assertEqual(["a"] * 8, texts)
+            # Concurrent first requests share the connections instead of each opening one.
+            self.assertLessEqual(open_connection.call_count, 2)
+        finally:
+            pool.close()
+
+    async def test_failover(self):
+        self.assertIn(await self.__stt.transcribe(get_silence_audio(30)), ("a", "b"))
+        self.__servers["a"].close()
+        self.__servers["a"].close_clients()
+        texts = await asyncio.gather(*(self.__stt.transcribe(get_silence_audio(30)) for _ in range(4)))
+        self.assertEqual(["b"] * 4, texts)
+        await asyncio.sleep(0.3)
+        self.assertEqual(1, self.__pool.get_healthy_count())
+
+        self.__servers["b"].close()
+        self.__servers["b"].close_clients()
+        with self.assertRaises(OverloadedError):
+            await self.__stt.transcribe(get_silence_audio(30))
+
+
+if __name__ == '__main__':
+    unittest.main()
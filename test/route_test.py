@@ -1,9 +1,13 @@
 import asyncio
 import base64
+import io
+import json
 import os
 import shutil
 import threading
+import time
 import unittest
+import wave
 from dataclasses import replace
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
@@ -11,8 +15,8 @@ from starlette.websockets import WebSocketDisconnect
 
 from lite_rtstt.stt.config import STTConfig
 from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
-from lite_rtstt.stt.stt_client import WhisperClient
-from lite_rtstt.stt.vad_client import WebRTCClient, SileroClient
+from lite_rtstt.stt.stt_client import MockSTTClient, WhisperClient
+from lite_rtstt.stt.vad_client import MockVADClient, WebRTCClient, SileroClient
 from lite_rtstt.network.route import create_router
 from test.utils import assert_text_similar
 
@@ -112,5 +116,228 @@ class WebSocketIntegrationTest(unittest.TestCase):
                 raise exception[0]
 
 
+class TranscribeRouteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__config = replace(STTConfig.default(), **{
+            "duration_time_ms": 60,
+            "active_to_detection_ms": 90,
+        })
+        self.__first_vad = MockVADClient()
+        self.__second_vad = MockVADClient()
+        self.__stt = MockSTTClient()
+        self.__rtstt = ThreeLayerRTSTTClient(self.__config, self.__first_vad, self.__second_vad, self.__stt)
+        self.__rtstt.start()
+        app = FastAPI()
+        app.include_router(create_router(self.__rtstt, self.__config))
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.__rtstt.close()
+
+    def test_transcribe_wav(self):
+        asyncio.run(self.__first_vad.append_results(True, False, False, True, True))
+        asyncio.run(self.__second_vad.append_results(True, True))
+        asyncio.run(self.__stt.append_results("one", "two"))
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(b"\x00" * 960 * 9)
+
+        response = self.client.post("/transcribe", content=output.getvalue())
+        self.assertEqual(200, response.status_code)
+        segments = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda segment: segment["index"])
+        self.assertEqual(["one", "two"], [segment["text"] for segment in segments])
+        self.assertEqual([0, 150], [segment["start_ms"] for segment in segments])
+
+    def test_reject_unsupported_format(self):
+        response = self.client.post("/transcribe?encoding=opus", content=b"\x00" * 960)
+        self.assertEqual(415, response.status_code)
+
+
+class TranscribeUvicornTest(unittest.TestCase):
+
+    def test_chunked_upload(self):
+        import httpx
+        import uvicorn
+
+        config = replace(STTConfig.default(), duration_time_ms=60, active_to_detection_ms=90)
+        first_vad, second_vad, stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        rtstt = ThreeLayerRTSTTClient(config, first_vad, second_vad, stt)
+        rtstt.start()
+        # Only the end of the upload holds speech, so a body cut short has no text.
+        asyncio.run(first_vad.append_results(*[False] * 1990, *[True] * 20))
+        asyncio.run(second_vad.append_results(True, True, True))
+        asyncio.run(stt.append_results("tail"))
+        app = FastAPI()
+        app.include_router(create_router(rtstt, config))
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+        thread = threading.Thread(target=server.run)
+        thread.start()
+        try:
+            while not server.started:
+                time.sleep(0.01)
+            port = server.servers[0].sockets[0].getsockname()[1]
+
+            def upload():
+                # Every piece arrives as its own http.request message.
+                for _ in range(200):
+                    yield b"\x00" * 9600
+
+            response = httpx.post(f"http://127.0.0.1:{port}/transcribe", content=upload(), timeout=30)
+        finally:
+            server.should_exit = True
+            thread.join()
+            rtstt.close()
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(["tail"], [json.loads(line)["text"] for line in response.text.splitlines()])
+
+
+class TimingsRouteTest(unittest.TestCase):
+
+    def test_text_timings(self):
+        config = replace(STTConfig.default(), **{
+            "duration_time_ms": 30,
+            "active_to_detection_ms": 60,
+        })
+        first_vad, second_vad, stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        rtstt = ThreeLayerRTSTTClient(config, first_vad, second_vad, stt)
+        rtstt.start()
+        asyncio.run(first_vad.append_results(True, False))
+        asyncio.run(second_vad.append_results(True))
+        asyncio.run(stt.append_results("hello"))
+        app = FastAPI()
+        app.include_router(create_router(rtstt, config, latency_log=True))
+        silence = base64.b64encode(b"\x00" * 960).decode("utf-8")
+        with self.assertLogs("lite_rtstt.latency", level="INFO") as logs:
+            with TestClient(app).websocket_connect("/rtstt?timings=1") as websocket:
+                for _ in range(3):
+                    websocket.send_json({"type": "audio chunk", "data": silence})
+                self.assertEqual("start speaking", websocket.receive_json()["type"])
+                self.assertEqual("stop speaking", websocket.receive_json()["type"])
+                message = websocket.receive_json()
+                websocket.send_json({"type": "EOF"})
+        rtstt.close()
+        self.assertEqual("hello", message["text"])
+        self.assertEqual(0, message["timings"]["offsets_ms"]["first_chunk"])
+        self.assertIn("speech_end_to_text", message["timings"]["stages_ms"])
+        self.assertIn("send", json.loads(logs.records[0].getMessage())["stages_ms"])
+
+
+class BinaryAudioRouteTest(unittest.TestCase):
+
+    def test_batched_binary_audio(self):
+        config = replace(STTConfig.default(), duration_time_ms=30, active_to_detection_ms=60)
+        first_vad, second_vad, stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        rtstt = ThreeLayerRTSTTClient(config, first_vad, second_vad, stt)
+        rtstt.start()
+        asyncio.run(first_vad.append_results(True, False))
+        asyncio.run(second_vad.append_results(True))
+        asyncio.run(stt.append_results("hello"))
+        app = FastAPI()
+        app.include_router(create_router(rtstt, config))
+        with TestClient(app).websocket_connect("/rtstt") as websocket:
+            # Three chunks in one message, the last one split across two.
+            websocket.send_bytes(b"\x00" * 2400)
+            websocket.send_bytes(b"\x00" * 480)
+            self.assertEqual("start speaking", websocket.receive_json()["type"])
+            self.assertEqual("stop speaking", websocket.receive_json()["type"])
+            self.assertEqual("hello", websocket.receive_json()["text"])
+            websocket.send_json({"type": "EOF"})
+        rtstt.close()
+
+
+class CreditRouteTest(unittest.TestCase):
+
+    def test_credits_and_end(self):
+        config = replace(STTConfig.default(), duration_time_ms=30, active_to_detection_ms=60, credit_window_ms=120)
+        first_vad, second_vad, stt = MockVADClient(), MockVADClient(), MockSTTClient()
+        rtstt = ThreeLayerRTSTTClient(config, first_vad, second_vad, stt)
+        rtstt.start()
+        asyncio.run(first_vad.append_results(True))
+        asyncio.run(second_vad.append_results(True))
+        asyncio.run(stt.append_results("hello"))
+        app = FastAPI()
+        app.include_router(create_router(rtstt, config))
+        with TestClient(app).websocket_connect("/rtstt?credits=1") as websocket:
+            self.assertEqual({"type": "credit", "ms": 120}, websocket.receive_json())
+            websocket.send_bytes(b"\x00" * 960)
+            # The utterance is still in progress; EOF flushes it.
+            websocket.send_json({"type": "EOF"})
+            self.assertEqual({"type": "credit", "ms": 30}, websocket.receive_json())
+            self.assertEqual("start speaking", websocket.receive_json()["type"])
+            self.assertEqual("stop speaking", websocket.receive_json()["type"])
+            self.assertEqual("hello", websocket.receive_json()["text"])
+            self.assertEqual({"type": "end"}, websocket.receive_json())
+        rtstt.close()
+
+
+class AdmissionRouteTest(unittest.TestCase):
+
+    def test_reject_over_max_streams(self):
+        config = replace(STTConfig.default(), max_streams=1)
+        rtstt = ThreeLayerRTSTTClient(config, MockVADClient(), MockVADClient(), MockSTTClient())
+        rtstt.start()
+        app = FastAPI()
+        app.include_router(create_router(rtstt, config))
+        client = TestClient(app)
+        with client.websocket_connect("/rtstt") as first:
+            with client.websocket_connect("/rtstt") as second:
+                with self.assertRaises(WebSocketDisconnect) as context:
+                    second.receive_json()
+            self.assertEqual(1013, context.exception.code)
+            self.assertEqual("retry-after=1", context.exception.reason)
+            first.send_json({"type": "EOF"})
+        rtstt.close()
+
+    def test_reject_upload_over_max_streams(self):
+        config = replace(STTConfig.default(), max_streams=1)
+        rtstt = ThreeLayerRTSTTClient(config, MockVADClient(), MockVADClient(), MockSTTClient())
+        rtstt.start()
+        app = FastAPI()
+        app.include_router(create_router(rtstt, config))
+        client = TestClient(app)
+        with client.websocket_connect("/rtstt") as websocket:
+            response = client.post("/transcribe", content=b"\x00" * 960)
+            self.assertEqual(503, response.status_code)
+            self.assertEqual("1", response.headers["retry-after"])
+            websocket.send_json({"type": "EOF"})
+        rtstt.close()
+
+
+class LoadingSTTClient(MockSTTClient):
+    """Started, but its models are still loading until `loaded` is set."""
+
+    loaded = False
+
+    def is_ready(self) -> bool:
+        return self.loaded
+
+
+class ReadyRouteTest(unittest.TestCase):
+
+    def test_ready(self):
+        stt = LoadingSTTClient()
+        rtstt = ThreeLayerRTSTTClient(STTConfig.default(), MockVADClient(), MockVADClient(), stt)
+        rtstt.start()
+        app = FastAPI()
+        app.include_router(create_router(rtstt))
+        client = TestClient(app)
+        response = client.get("/ready")
+        self.assertEqual(503, response.status_code)
+        self.assertEqual({"ready": False}, response.json())
+        with client.websocket_connect("/rtstt") as websocket:
+            with self.assertRaises(WebSocketDisconnect) as context:
+                websocket.receive_json()
+        self.assertEqual(1013, context.exception.code)
+        stt.loaded = True
+        response = client.get("/ready")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"ready": True}, response.json())
+        rtstt.close()
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -2,11 +2,13 @@ import asyncio
 import os
 import shutil
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import replace
 
 from lite_rtstt.stt.config import STTConfig
-from lite_rtstt.stt.event import EventFactory, StartSpeakingEvent, StopSpeakingEvent, TextEvent
-from lite_rtstt.stt.rtstt_client import MockRTSTTClient, ThreeLayerRTSTTClient
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import EventFactory, OverloadEvent, StartSpeakingEvent, StopSpeakingEvent, TextEvent
+from lite_rtstt.stt.rtstt_client import MockRTSTTClient, ThreeLayerRTSTTClient, TranscriptionSegment
 from lite_rtstt.stt.stt_client import MockSTTClient, WhisperClient
 from lite_rtstt.stt.vad_client import MockVADClient, WebRTCClient, SileroClient
 from test.utils import get_silence_audio, assert_text_similar
@@ -120,6 +122,14 @@ class ThreeLayerRTSTTClientUnitTest(unittest.IsolatedAsyncioTestCase):
             event = await q.get()
             self.assertIsInstance(event, TextEvent)
             self.assertEqual(stt_results[0], event.text)
+            offsets = event.timeline.offsets_ms()
+            self.assertEqual(
+                ["first_chunk", "layer1_active", "silero_confirmed", "speech_end", "stt_enqueued", "event_emitted"],
+                list(offsets),
+            )
+            self.assertEqual(sorted(offsets.values()), list(offsets.values()))
+            self.assertIn("speech_end_to_text", event.timeline.stages_ms())
+            self.assertNotIn("stt_inference", event.timeline.stages_ms())
 
         self.__client.disconnect(id)
         with self.assertRaises(KeyError):
@@ -128,6 +138,93 @@ class ThreeLayerRTSTTClientUnitTest(unittest.IsolatedAsyncioTestCase):
         with self.assertRaises(RuntimeError):
             await self.__client.feed(0, silence)
 
+    async def test_admission(self):
+        self.__client.close()
+        config = replace(self.__config, max_streams=1)
+        self.__client = ThreeLayerRTSTTClient(config, self.__first_vad, self.__second_vad, self.__stt)
+        self.__client.start()
+        _, id = self.__client.connect()
+        with self.assertRaises(OverloadedError):
+            self.__client.connect()
+        self.__client.disconnect(id)
+        _, id = self.__client.connect()
+
+        async def audio():
+            yield get_silence_audio(30).to_bytes()
+
+        # Uploads are streams too.
+        with self.assertRaises(OverloadedError):
+            self.__client.transcribe(audio())
+        self.__client.disconnect(id)
+        segments = self.__client.transcribe(audio())
+        with self.assertRaises(OverloadedError):
+            self.__client.connect()
+        # Dropping an upload that never started frees its stream as well.
+        del segments
+        self.__client.connect()
+
+    async def test_admission_from_threads(self):
+        self.__client.close()
+        config = replace(self.__config, max_streams=10)
+        self.__client = ThreeLayerRTSTTClient(config, self.__first_vad, self.__second_vad, self.__stt)
+        self.__client.start()
+
+        def connect() -> int | None:
+            try:
+                return self.__client.connect()[1]
+            except OverloadedError:
+                return None
+
+        # Event loop threads of `run --loops` connect at the same time.
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ids = [id for id in executor.map(lambda _: connect(), range(40)) if id is not None]
+        self.assertEqual(10, len(set(ids)))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(self.__client.disconnect, ids))
+        self.assertIsNotNone(connect())
+
+    async def test_shed_utterance(self):
+        silence = get_silence_audio(30).to_bytes()
+        self.__client.start()
+        q, id = self.__client.connect()
+        await self.__first_vad.append_results(True, False, True, False, False)
+        await self.__second_vad.append_results(True)
+        await self.__stt.append_results(OverloadedError("Whisper queue wait exceeded the shedding threshold."))
+        for _ in range(7):
+            await self.__client.feed(id, silence)
+
+        events = []
+        async with asyncio.timeout(0.1):
+            for _ in range(3):
+                events.append(await q.get())
+        self.assertIsInstance(events[0], StartSpeakingEvent)
+        self.assertIsInstance(events[1], StopSpeakingEvent)
+        self.assertIsInstance(events[2], OverloadEvent)
+        self.assertIn("shedding", events[2].reason)
+
+    async def test_transcribe(self):
+        silence = get_silence_audio(30).to_bytes()
+
+        async def audio(count: int):
+            for _ in range(count):
+                yield silence
+
+        with self.assertRaises(RuntimeError):
+            async for _ in self.__client.transcribe(audio(1)):
+                pass
+        self.__client.start()
+
+        # One segment ended by silence, and one still speaking when the stream ends.
+        await self.__first_vad.append_results(True, False, False, True, True)
+        await self.__second_vad.append_results(True, True)
+        await self.__stt.append_results("one", "two")
+        async with asyncio.timeout(1):
+            segments = [segment async for segment in self.__client.transcribe(audio(9))]
+        self.assertEqual([
+            TranscriptionSegment(0, 0, 150, "one"),
+            TranscriptionSegment(1, 150, 270, "two"),
+        ], sorted(segments, key=lambda segment: segment.index))
+
 
 class ThreeLayerRTSTTClientIntegrationTest(unittest.IsolatedAsyncioTestCase):
 
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import unittest
+from multiprocessing import Pipe
+from multiprocessing.shared_memory import SharedMemory
+
+from lite_rtstt.stt.audio_buffer import AudioBuffer
+from lite_rtstt.stt.errors import OverloadedError
+from lite_rtstt.stt.event import UtteranceTimeline
+from lite_rtstt.stt.shared_memory import (
+    InferenceChannel,
+    InferenceServer,
+    SharedAudioRing,
+    SharedMemorySTTClient,
+    SharedMemoryVADClient,
+)
+from lite_rtstt.stt.stt_client import STTClient
+from test.utils import EnergyVADClient, get_silence_audio
+
+
+class EchoSTTClient(STTClient):
+    """Returns the first and last byte of the audio, so the test sees what crossed the ring."""
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def transcribe(self, audio_buffer: AudioBuffer, timeline: UtteranceTimeline | None = None) -> str:
+        timeline.stt_started = time.monotonic()
+        audio = audio_buffer.to_bytes()
+        if audio == b"shed":
+            raise OverloadedError("Whisper queue wait exceeded the shedding threshold.")
+        timeline.stt_ended = time.monotonic()
+        return f"{audio[0]}-{audio[-1]}-{len(audio)}"
+
+
+class SharedAudioRingTest(unittest.TestCase):
+
+    def test_allocate(self):
+        ring = SharedAudioRing(100)
+        self.assertEqual(0, ring.allocate(40))
+        self.assertEqual(40, ring.allocate(40))
+        self.assertIsNone(ring.allocate(30))
+        # The space of a region is reused only once the regions before it are released.
+        ring.release(40)
+        self.assertIsNone(ring.allocate(30))
+        ring.release(0)
+        self.assertEqual(0, ring.allocate(30))
+        self.assertEqual(30, ring.allocate(60))
+        self.assertIsNone(ring.allocate(20))
+        ring.release(0)
+        self.assertEqual(0, ring.allocate(20))
+        self.assertIsNone(ring.allocate(101))
+
+
+class SharedAudioViewTest(unittest.TestCase):
+
+    def test_convert_in_place(self):
+        memory = SharedMemory(create=True, size=8)
+        try:
+            memory.buf[:8] = b"\x00\x40\x00\xc0\xff\x7f\x00\x80"
+            view = memory.buf[:8]
+            audio = AudioBuffer.from_bytes(view).to_float32_ndarray()
+            self.assertEqual([0.5, -0.5, 32767 / 32768, -1.0], audio.tolist())
+            self.assertEqual("float32", audio.dtype.name)
+            # Nothing still points into the ring, so the view can be released.
+            view.release()
+        finally:
+            memory.close()
+            memory.unlink()
+
+
+class InferenceChannelTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.__memory = SharedMemory(create=True, size=64 * 1024)
+        frontend_end, inference_end = Pipe()
+        self.__server = InferenceServer(EnergyVADClient(), EchoSTTClient(), [(inference_end, self.__memory)])
+        self.__thread = threading.Thread(target=asyncio.run, args=(self.__server.serve(),))
+        self.__thread.start()
+        self.__inference_end = inference_end
+        self.__channel = InferenceChannel(frontend_end, self.__memory)
+
+    async def asyncTearDown(self):
+        self.__channel.close()
+        self.__thread.join(5)
+        self.__inference_end.close()
+        self.__memory.close()
+        self.__memory.unlink()
+
+    async def test_ready(self):
+        for _ in range(100):
+            if self.__channel.is_ready():
+                break
+            await asyncio.sleep(0.01)
+        self.assertTrue(SharedMemorySTTClient(self.__channel).is_ready())
+        # The ready message does not stand in the way of responses.
+        self.assertTrue(await SharedMemoryVADClient(self.__channel).is_active(AudioBuffer.from_bytes(b"\x00\x40" * 480)))
+
+    async def test_requests(self):
+        vad, stt = SharedMemoryVADClient(self.__channel), SharedMemorySTTClient(self.__channel)
+        loud = AudioBuffer.from_bytes(b"\x00\x40" * 480)
+        self.assertEqual([True, False], list(await asyncio.gather(vad.is_active(loud), vad.is_active(get_silence_audio(30)))))
+
+        audio = AudioBuffer.from_bytes(b"\x01" + b"\x00" * 958)
+        audio.append(b"\x00" * 959 + b"\x02")
+        timeline = UtteranceTimeline()
+        self.assertEqual("1-2-1919", await stt.transcribe(audio, timeline))
+        self.assertLessEqual(timeline.stt_started, timeline.stt_ended)
+        self.assertEqual(0.0, stt.get_queue_wait_ms())
+
+        with self.assertRaises(OverloadedError):
+            await stt.transcribe(AudioBuffer.from_bytes(b"shed"))
+        # A buffer larger than the ring is refused before it is sent.
+        with self.assertRaises(OverloadedError):
+            await stt.transcribe(AudioBuffer.from_bytes(b"\x00" * (64 * 1024 + 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
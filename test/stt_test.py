@@ -1,10 +1,12 @@
 import asyncio
 import os
 import shutil
+import tempfile
 import unittest
+from dataclasses import asdict
 
 from lite_rtstt.stt.config import STTConfig
-from lite_rtstt.stt.stt_client import MockSTTClient, WhisperClient
+from lite_rtstt.stt.stt_client import MockSTTClient, WhisperClient, load_whisper_model
 from test.utils import from_int16_pcm, get_silence_audio, assert_text_similar
 
 
@@ -63,5 +65,22 @@ class WhisperClientTest(unittest.IsolatedAsyncioTestCase):
             await self.__client.transcribe(self.__silence)
 
 
+class LoadWhisperModelTest(unittest.TestCase):
+
+    def test_load_mapped(self):
+        import torch
+        from whisper.model import ModelDimensions, Whisper
+
+        # Random weights with the dimensions of "tiny", so nothing is downloaded.
+        dims = ModelDimensions(80, 1500, 384, 6, 4, 51865, 448, 384, 6, 4)
+        expected = Whisper(dims)
+        with tempfile.TemporaryDirectory() as download_root:
+            torch.save({"dims": asdict(dims), "model_state_dict": expected.state_dict()}, os.path.join(download_root, "tiny.f32.pt"))
+            actual = load_whisper_model("tiny", download_root)
+        self.assertEqual(dims, actual.dims)
+        for name, tensor in expected.state_dict().items():
+            self.assertTrue(torch.equal(tensor, actual.state_dict()[name]), name)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+import base64
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from lite_rtstt.metrics import ACTIVE_CONNECTIONS
+from lite_rtstt.network.route import create_router
+from lite_rtstt.network.trace import Frame, FrameKind, Trace, TraceWriter, read_trace
+from lite_rtstt.stt.config import STTConfig
+from lite_rtstt.stt.rtstt_client import ThreeLayerRTSTTClient
+from lite_rtstt.stt.stt_client import MockSTTClient
+from lite_rtstt.stt.vad_client import WebRTCClient
+from lite_rtstt.tools.bench import TEXT, load_corpus
+from lite_rtstt.tools.replay import ConvertingSession, Replayer
+from test.utils import EnergyVADClient
+
+
+class TraceTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = TraceWriter.create(directory, 7, "encoding=mulaw&sample_rate=8000")
+            writer.write(FrameKind.AUDIO, b"\x01" * 240)
+            time.sleep(0.05)
+            writer.write(FrameKind.AUDIO, b"\x02" * 240)
+            writer.write(FrameKind.EOF)
+            writer.close()
+            path = os.path.join(directory, os.listdir(directory)[0])
+
+            trace = read_trace(path)
+            self.assertEqual("encoding=mulaw&sample_rate=8000", trace.query)
+            self.assertAlmostEqual(time.time(), trace.start_time_s, delta=5)
+            self.assertEqual([FrameKind.AUDIO, FrameKind.AUDIO, FrameKind.EOF], [frame.kind for frame in trace.frames])
+            self.assertEqual(b"\x02" * 240, trace.frames[1].data)
+            self.assertGreaterEqual(trace.frames[1].offset_s - trace.frames[0].offset_s, 0.04)
+
+            # A record cut off by a crash is dropped.
+            with open(path, "r+b") as f:
+                f.truncate(os.path.getsize(path) - 3)
+            self.assertEqual(2, len(read_trace(path).frames))
+
+    def test_capture(self):
+        config = STTConfig.default()
+        rtstt = ThreeLayerRTSTTClient(config, WebRTCClient(config), EnergyVADClient(), MockSTTClient())
+        rtstt.start()
+        with tempfile.TemporaryDirectory() as directory:
+            app = FastAPI()
+            app.include_router(create_router(rtstt, config, capture_dir=directory))
+            silence = base64.b64encode(b"\x00" * 960).decode("utf-8")
+            with TestClient(app).websocket_connect("/rtstt?sample_rate=16000") as websocket:
+                websocket.send_json({"type": "audio chunk", "data": silence})
+                websocket.send_json({"type": "audio chunk", "data": silence})
+                websocket.send_bytes(b"\x00" * 1920)
+                websocket.send_json({"type": "EOF"})
+            rtstt.close()
+
+            names = os.listdir(directory)
+            self.assertEqual(1, len(names))
+            trace = read_trace(os.path.join(directory, names[0]))
+            self.assertEqual("sample_rate=16000", trace.query)
+            self.assertEqual(
+                [FrameKind.AUDIO, FrameKind.AUDIO, FrameKind.BINARY_AUDIO, FrameKind.EOF],
+                [frame.kind for frame in trace.frames],
+            )
+            self.assertEqual(b"\x00" * 960, trace.frames[0].data)
+            self.assertEqual(b"\x00" * 1920, trace.frames[2].data)
+
+    def test_unwritable_capture_dir(self):
+        config = STTConfig.default()
+        rtstt = ThreeLayerRTSTTClient(config, WebRTCClient(config), EnergyVADClient(), MockSTTClient())
+        rtstt.start()
+        with tempfile.TemporaryDirectory() as directory:
+            capture_dir = os.path.join(directory, "traces")
+            app = FastAPI()
+            app.include_router(create_router(rtstt, config, capture_dir=capture_dir))
+            # The directory is gone by the time a connection opens, so its trace cannot be created.
+            shutil.rmtree(capture_dir)
+            with open(capture_dir, "w"):
+                pass
+            before = ACTIVE_CONNECTIONS.labels().get()
+            with TestClient(app).websocket_connect("/rtstt") as websocket:
+                websocket.send_json({"type": "EOF"})
+            self.assertEqual(before, ACTIVE_CONNECTIONS.labels().get())
+            # The connection was released, so another one is admitted.
+            rtstt.connect()
+        rtstt.close()
+
+
+class ReplayerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_run(self):
+        config = STTConfig.default()
+        stt = MockSTTClient()
+        rtstt = ThreeLayerRTSTTClient(config, WebRTCClient(config), EnergyVADClient(), stt)
+        rtstt.start()
+        await stt.append_results(*["text"] * 10)
+        recording = load_corpus(["test/data/7s_i16.pcm"], config)[0]
+        chunks = recording.chunks + [b"\x00" * 960] * 60
+        frames = [Frame(i * 0.03, FrameKind.AUDIO, chunk) for i, chunk in enumerate(chunks)]
+        frames.append(Frame(len(chunks) * 0.03, FrameKind.EOF, b""))
+        # The second trace was captured 10 s after the first and must start 0.5 s later at 20x.
+        traces = [Trace("a", "", 100.0, frames), Trace("b", "", 110.0, frames)]
+
+        async def open_session(trace: Trace):
+            return ConvertingSession.open(rtstt, trace.query, config)
+
+        try:
+            report = await Replayer(open_session, traces, speed=20.0).run()
+        finally:
+            rtstt.close()
+        self.assertEqual([], report["errors"])
+        self.assertEqual(2 * len(chunks), report["frames"])
+        self.assertGreaterEqual(report["events"][TEXT], 2)
+        self.assertGreater(report["wall_seconds"], 10 / 20)
+
+
+if __name__ == '__main__':
+    unittest.main()